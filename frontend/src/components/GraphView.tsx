@@ -1,8 +1,9 @@
 
-import React, { useEffect, useRef } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Card } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { ZoomIn, ZoomOut, Maximize } from 'lucide-react';
+import { apiClient, GraphAdjacency } from '@/lib/api';
 
 interface GraphViewProps {
   onNodeClick: (id: string) => void;
@@ -23,31 +24,50 @@ interface Link {
   target: string;
 }
 
+// Expand the CSR adjacency from /graph into positioned nodes and one link per pair
+const toGraph = (graph: GraphAdjacency): { nodes: Node[]; links: Link[] } => {
+  const nodes = graph.nodes.map(node => ({
+    id: node.id,
+    title: node.label || 'Untitled',
+    x: 100 + Math.random() * 600,
+    y: 100 + Math.random() * 400,
+    vx: 0,
+    vy: 0,
+    tags: node.tags,
+  }));
+
+  const links: Link[] = [];
+  for (let i = 0; i < graph.nodes.length; i++) {
+    for (let k = graph.indptr[i]; k < graph.indptr[i + 1]; k++) {
+      const j = graph.indices[k];
+      // Each link is stored in both rows
+      if (i < j) {
+        links.push({ source: nodes[i].id, target: nodes[j].id });
+      }
+    }
+  }
+  return { nodes, links };
+};
+
 export const GraphView = ({ onNodeClick }: GraphViewProps) => {
   const canvasRef = useRef<HTMLCanvasElement>(null);
   const animationRef = useRef<number>();
-  
-  // Mock graph data
-  const nodes: Node[] = [
-    { id: '1', title: 'React Architecture', x: 300, y: 200, vx: 0, vy: 0, tags: ['React'] },
-    { id: '2', title: 'Knowledge Graphs', x: 500, y: 300, vx: 0, vy: 0, tags: ['AI'] },
-    { id: '3', title: 'Database Design', x: 200, y: 400, vx: 0, vy: 0, tags: ['Database'] },
-    { id: '4', title: 'TypeScript Patterns', x: 600, y: 150, vx: 0, vy: 0, tags: ['TypeScript'] },
-    { id: '5', title: 'API Architecture', x: 400, y: 450, vx: 0, vy: 0, tags: ['Backend'] },
-  ];
-
-  const links: Link[] = [
-    { source: '1', target: '4' },
-    { source: '1', target: '5' },
-    { source: '2', target: '3' },
-    { source: '3', target: '5' },
-    { source: '4', target: '5' },
-  ];
+  const [graph, setGraph] = useState<{ nodes: Node[]; links: Link[] }>({ nodes: [], links: [] });
+
+  // The whole graph arrives in a single request
+  useEffect(() => {
+    apiClient.getGraph()
+      .then(data => setGraph(toGraph(data)))
+      .catch(error => console.error('Failed to load graph:', error));
+  }, []);
 
   useEffect(() => {
     const canvas = canvasRef.current;
     if (!canvas) return;
 
+    const { nodes, links } = graph;
+    const nodesById = new Map(nodes.map(node => [node.id, node]));
+
     const ctx = canvas.getContext('2d');
     if (!ctx) return;
 
@@ -106,8 +126,8 @@ export const GraphView = ({ onNodeClick }: GraphViewProps) => {
 
       // Link forces
       links.forEach(link => {
-        const source = nodes.find(n => n.id === link.source);
-        const target = nodes.find(n => n.id === link.target);
+        const source = nodesById.get(link.source);
+        const target = nodesById.get(link.target);
         if (source && target) {
           const dx = target.x - source.x;
           const dy = target.y - source.y;
@@ -139,8 +159,8 @@ export const GraphView = ({ onNodeClick }: GraphViewProps) => {
       ctx.strokeStyle = '#e5e7eb';
       ctx.lineWidth = 2;
       links.forEach(link => {
-        const source = nodes.find(n => n.id === link.source);
-        const target = nodes.find(n => n.id === link.target);
+        const source = nodesById.get(link.source);
+        const target = nodesById.get(link.target);
         if (source && target) {
           ctx.beginPath();
           ctx.moveTo(source.x, source.y);
@@ -167,7 +187,7 @@ export const GraphView = ({ onNodeClick }: GraphViewProps) => {
         ctx.font = '12px Inter, sans-serif';
         ctx.textAlign = 'center';
         ctx.textBaseline = 'middle';
-        ctx.fillText(node.id, node.x, node.y);
+        ctx.fillText(node.title.charAt(0).toUpperCase(), node.x, node.y);
 
         // Node title
         ctx.fillStyle = '#374151';
@@ -247,7 +267,7 @@ export const GraphView = ({ onNodeClick }: GraphViewProps) => {
       canvas.removeEventListener('mousemove', handleMouseMove);
       canvas.removeEventListener('mouseup', handleMouseUp);
     };
-  }, [onNodeClick]);
+  }, [graph, onNodeClick]);
 
   return (
     <div className="p-6 h-full">
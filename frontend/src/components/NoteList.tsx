@@ -1,5 +1,6 @@
 import React from 'react';
 import { Calendar, Hash, FileText, Loader2 } from 'lucide-react';
+import { Button } from '@/components/ui/button';
 import { Card } from '@/components/ui/card';
 import { useNotes } from '@/hooks/useNotes';
 
@@ -8,7 +9,7 @@ interface NoteListProps {
 }
 
 export const NoteList = ({ onNoteSelect }: NoteListProps) => {
-  const { data: notes, isLoading, error } = useNotes();
+  const { data: notes, isLoading, error, hasNextPage, fetchNextPage, isFetchingNextPage } = useNotes();
 
   if (isLoading) {
     return (
@@ -42,7 +43,7 @@ export const NoteList = ({ onNoteSelect }: NoteListProps) => {
       <div className="mb-6">
         <h2 className="text-2xl font-bold text-gray-900 mb-2">All Notes</h2>
         <p className="text-gray-600">
-          {notes.length} notes in your knowledge base
+          {notes.length}{hasNextPage ? '+' : ''} notes in your knowledge base
         </p>
       </div>
 
@@ -85,6 +86,15 @@ export const NoteList = ({ onNoteSelect }: NoteListProps) => {
           </Card>
         ))}
       </div>
+
+      {hasNextPage && (
+        <div className="mt-6 flex justify-center">
+          <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+            {isFetchingNextPage && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+            Load more
+          </Button>
+        </div>
+      )}
     </div>
   );
 };
\ No newline at end of file
@@ -1,13 +1,21 @@
 import { useState, useEffect } from 'react';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { apiClient, Note, CreateNoteRequest, UpdateNoteRequest } from '@/lib/api';
 import { toast } from '@/components/ui/sonner';
 
+// Notes arrive a page at a time; fetchNextPage follows the X-Next-Cursor header
 export const useNotes = () => {
-  return useQuery({
+  const notesQuery = useInfiniteQuery({
     queryKey: ['notes'],
-    queryFn: () => apiClient.listNotes(),
+    queryFn: ({ pageParam }) => apiClient.listNotes(pageParam),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
   });
+
+  return {
+    ...notesQuery,
+    data: notesQuery.data?.pages.flatMap((page) => page.notes),
+  };
 };
 
 export const useNote = (id: string | null) => {
@@ -6,10 +6,51 @@ export interface Note {
   content: string;
   summary?: string;
   tags: string[];
+  title?: string;
+  isArchived?: boolean;
+  isPinned?: boolean;
   createdAt?: string;
   updatedAt?: string;
 }
 
+// One page of the note list; nextCursor is absent on the last page
+export interface NotesPage {
+  notes: Note[];
+  nextCursor?: string;
+}
+
+export interface SearchResult extends Note {
+  distance?: number;
+  score?: number;
+  // Best matching passage, set by chunk-mode search
+  passage?: string;
+  passageStart?: number;
+  passageEnd?: number;
+}
+
+export interface GraphNode {
+  id: string;
+  label?: string;
+  tags: string[];
+  isPinned?: boolean;
+  updatedAt?: string;
+  depth?: number;
+  degree?: number;
+}
+
+export interface GraphNeighbourhood {
+  nodes: GraphNode[];
+  edges: { source: string; target: string }[];
+}
+
+// CSR adjacency: neighbours of nodes[i] are nodes[indices[indptr[i]..indptr[i + 1]]]
+export interface GraphAdjacency {
+  version?: number;
+  nodes: GraphNode[];
+  indptr: number[];
+  indices: number[];
+}
+
 export interface CreateNoteRequest {
   content: string;
   tags?: string[];
@@ -32,6 +73,14 @@ class ApiClient {
     endpoint: string,
     options: RequestInit = {}
   ): Promise<T> {
+    const response = await this.fetchResponse(endpoint, options);
+    return await response.json();
+  }
+
+  private async fetchResponse(
+    endpoint: string,
+    options: RequestInit = {}
+  ): Promise<Response> {
     const url = `${this.baseUrl}${endpoint}`;
     
     const config: RequestInit = {
@@ -49,7 +98,7 @@ class ApiClient {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       
-      return await response.json();
+      return response;
     } catch (error) {
       console.error('API request failed:', error);
       throw error;
@@ -81,16 +130,24 @@ class ApiClient {
     });
   }
 
-  async listNotes(): Promise<Note[]> {
-    return this.request<Note[]>('/notes/');
+  async listNotes(cursor?: string, limit: number = 50): Promise<NotesPage> {
+    const params = new URLSearchParams({ limit: limit.toString() });
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+    const response = await this.fetchResponse(`/notes/?${params}`);
+    return {
+      notes: await response.json(),
+      nextCursor: response.headers.get('X-Next-Cursor') ?? undefined,
+    };
   }
 
-  async searchNotes(query: string, limit: number = 5): Promise<Note[]> {
+  async searchNotes(query: string, limit: number = 5): Promise<SearchResult[]> {
     const params = new URLSearchParams({
       q: query,
       limit: limit.toString(),
     });
-    return this.request<Note[]>(`/notes/search/?${params}`);
+    return this.request<SearchResult[]>(`/notes/search/?${params}`);
   }
 
   async processNote(id: string): Promise<Note> {
@@ -99,8 +156,8 @@ class ApiClient {
     });
   }
 
-  async getRelatedNotes(id: string): Promise<Note[]> {
-    return this.request<Note[]>(`/notes/${id}/related`);
+  async getRelatedNotes(id: string): Promise<SearchResult[]> {
+    return this.request<SearchResult[]>(`/notes/${id}/related`);
   }
 
   // Links API
@@ -125,6 +182,16 @@ class ApiClient {
       method: 'POST',
     });
   }
+
+  // Graph API
+  async getGraph(): Promise<GraphAdjacency> {
+    return this.request<GraphAdjacency>('/graph/');
+  }
+
+  async getNeighbourhood(id: string, depth: number = 2): Promise<GraphNeighbourhood> {
+    const params = new URLSearchParams({ depth: depth.toString() });
+    return this.request<GraphNeighbourhood>(`/graph/${id}?${params}`);
+  }
 }
 
 export const apiClient = new ApiClient();
\ No newline at end of file
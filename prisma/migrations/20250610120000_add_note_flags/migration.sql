@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE "Note" ADD COLUMN     "title" TEXT,
+ADD COLUMN     "isArchived" BOOLEAN NOT NULL DEFAULT false,
+ADD COLUMN     "isPinned" BOOLEAN NOT NULL DEFAULT false,
+ADD COLUMN     "metadata" JSONB DEFAULT '{}';
@@ -0,0 +1,24 @@
+-- AlterTable
+ALTER TABLE "Note" ADD COLUMN     "embeddingModel" TEXT,
+ADD COLUMN     "embeddingHash" TEXT,
+ADD COLUMN     "embeddedAt" TIMESTAMP(3);
+
+-- Existing vectors were all produced by the original model
+UPDATE "Note" SET "embeddingModel" = 'all-MiniLM-L6-v2' WHERE embedding IS NOT NULL;
+
+-- CreateTable
+CREATE TABLE "NoteEmbedding" (
+    "noteId" TEXT NOT NULL,
+    "model" TEXT NOT NULL,
+    "contentHash" TEXT NOT NULL,
+    "embedding" vector,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "NoteEmbedding_pkey" PRIMARY KEY ("noteId","model")
+);
+
+-- CreateIndex
+CREATE INDEX "NoteEmbedding_model_idx" ON "NoteEmbedding"("model");
+
+-- AddForeignKey
+ALTER TABLE "NoteEmbedding" ADD CONSTRAINT "NoteEmbedding_noteId_fkey" FOREIGN KEY ("noteId") REFERENCES "Note"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,21 @@
+-- CreateTable
+CREATE TABLE "NoteChunk" (
+    "id" TEXT NOT NULL,
+    "noteId" TEXT NOT NULL,
+    "ord" INTEGER NOT NULL,
+    "content" TEXT NOT NULL,
+    "contentHash" TEXT NOT NULL,
+    "startOffset" INTEGER NOT NULL,
+    "endOffset" INTEGER NOT NULL,
+    "embedding" vector(384),
+    "model" TEXT NOT NULL,
+    "updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "NoteChunk_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "NoteChunk_noteId_ord_idx" ON "NoteChunk"("noteId", "ord");
+
+-- AddForeignKey
+ALTER TABLE "NoteChunk" ADD CONSTRAINT "NoteChunk_noteId_fkey" FOREIGN KEY ("noteId") REFERENCES "Note"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,11 @@
+-- AlterTable
+ALTER TABLE "Note" ADD COLUMN     "pagerank" DOUBLE PRECISION,
+ADD COLUMN     "degree" INTEGER,
+ADD COLUMN     "componentId" INTEGER,
+ADD COLUMN     "communityId" INTEGER;
+
+-- CreateIndex
+CREATE INDEX "Note_pagerank_idx" ON "Note"("pagerank" DESC);
+
+-- CreateIndex
+CREATE INDEX "Note_communityId_idx" ON "Note"("communityId");
@@ -0,0 +1,18 @@
+-- CreateTable (partitioned by hand: monthly partitions are created and
+-- dropped by src/services/audit_service.py)
+CREATE TABLE "NoteAuditLog" (
+    "id" TEXT NOT NULL,
+    "noteId" TEXT NOT NULL,
+    "action" TEXT NOT NULL,
+    "changes" JSONB NOT NULL DEFAULT '{}',
+    "userId" TEXT,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "NoteAuditLog_pkey" PRIMARY KEY ("id","createdAt")
+) PARTITION BY RANGE ("createdAt");
+
+-- CreateIndex
+CREATE INDEX "NoteAuditLog_noteId_createdAt_idx" ON "NoteAuditLog"("noteId", "createdAt" DESC);
+
+-- CreateIndex
+CREATE INDEX "NoteAuditLog_createdAt_idx" ON "NoteAuditLog"("createdAt" DESC);
@@ -0,0 +1,4 @@
+-- AlterTable (nullable columns without defaults: no table rewrite)
+ALTER TABLE "Note" ADD COLUMN     "embeddingNext" vector(384),
+ADD COLUMN     "embeddingNextModel" TEXT,
+ADD COLUMN     "embeddingNextHash" TEXT;
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency benchmark for pgvector ANN indexes.
+
+Loads a synthetic corpus of unit-normalised 384-d vectors (clustered, like
+real sentence embeddings) into a scratch table, computes exact top-k with
+NumPy, then builds HNSW and/or IVFFlat indexes and sweeps ef_search / probes.
+
+Run: python scripts/bench_ann.py --rows 1000000 --index hnsw ivfflat
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+import asyncpg
+import numpy as np
+from dotenv import load_dotenv
+from pgvector.asyncpg import register_vector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+TABLE = "ann_bench"
+OPERATORS = {"cosine": ("<=>", "vector_cosine_ops"), "l2": ("<->", "vector_l2_ops")}
+
+
+def make_centroids(dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    return centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+
+def make_vectors(centroids: np.ndarray, count: int, seed: int, spread: float = 0.35) -> np.ndarray:
+    """Sample unit vectors scattered around random centroids"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(centroids), size=count)
+    noise = rng.standard_normal((count, centroids.shape[1])).astype(np.float32) * spread
+    vectors = centroids[picks] + noise / np.sqrt(centroids.shape[1]) * 4
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def corpus_chunks(args, centroids):
+    """Deterministically regenerate the corpus chunk by chunk"""
+    for chunk_index, start in enumerate(range(0, args.rows, args.chunk_size)):
+        count = min(args.chunk_size, args.rows - start)
+        yield start, make_vectors(centroids, count, args.seed + 1 + chunk_index)
+
+
+def exact_top_k(args, centroids, queries: np.ndarray) -> np.ndarray:
+    """Brute-force ground truth, streaming the corpus to bound memory"""
+    best_scores = np.full((len(queries), args.k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), args.k), dtype=np.int64)
+
+    for start, vectors in corpus_chunks(args, centroids):
+        # Vectors are unit length, so the dot product ranks identically for
+        # cosine and L2
+        scores = queries @ vectors.T
+        ids = np.arange(start, start + len(vectors))[None, :].repeat(len(queries), axis=0)
+
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_ids = np.concatenate([best_ids, ids], axis=1)
+        top = np.argpartition(-merged_scores, args.k - 1, axis=1)[:, :args.k]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_ids = np.take_along_axis(merged_ids, top, axis=1)
+
+    return best_ids
+
+
+async def load_corpus(conn, args, centroids):
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(f"CREATE TABLE {TABLE} (id bigint PRIMARY KEY, embedding vector({args.dim}))")
+
+    started = time.perf_counter()
+    for start, vectors in corpus_chunks(args, centroids):
+        await conn.copy_records_to_table(
+            TABLE,
+            records=((start + i, vector) for i, vector in enumerate(vectors)),
+            columns=["id", "embedding"],
+        )
+        logger.info(f"Loaded {start + len(vectors)}/{args.rows} rows")
+    await conn.execute(f"ANALYZE {TABLE}")
+    return time.perf_counter() - started
+
+
+async def build_index(conn, args, index_type: str) -> float:
+    _, opclass = OPERATORS[args.metric]
+    await conn.execute(f"DROP INDEX IF EXISTS {TABLE}_ann_idx")
+    if index_type == "hnsw":
+        options = f"m = {args.hnsw_m}, ef_construction = {args.hnsw_ef_construction}"
+    else:
+        options = f"lists = {args.lists or max(1, args.rows // 1000)}"
+
+    await conn.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+    started = time.perf_counter()
+    await conn.execute(
+        f"CREATE INDEX {TABLE}_ann_idx ON {TABLE} USING {index_type} (embedding {opclass}) WITH ({options})"
+    )
+    return time.perf_counter() - started
+
+
+async def run_queries(conn, args, queries: np.ndarray, truth: np.ndarray, setting: str, value: int) -> dict:
+    operator, _ = OPERATORS[args.metric]
+    sql = f"SELECT id FROM {TABLE} ORDER BY embedding {operator} $1 LIMIT {args.k}"
+    latencies = []
+    hits = 0
+
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL {setting} = {int(value)}")
+        # Warm the index pages before timing
+        for query in queries[: min(10, len(queries))]:
+            await conn.fetch(sql, query)
+
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            rows = await conn.fetch(sql, query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len({row["id"] for row in rows} & set(expected.tolist()))
+
+    latencies = np.array(latencies)
+    return {
+        setting: value,
+        "recall": hits / (len(queries) * args.k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "qps": float(1000 / latencies.mean()),
+    }
+
+
+async def main(args):
+    dsn = args.database_url.split("?")[0]
+    conn = await asyncpg.connect(dsn)
+    await register_vector(conn)
+
+    centroids = make_centroids(args.dim, args.clusters, args.seed)
+    queries = make_vectors(centroids, args.queries, args.seed + 10_000_000)
+
+    results = {"rows": args.rows, "dim": args.dim, "k": args.k, "metric": args.metric, "runs": []}
+    try:
+        if not args.skip_load:
+            results["load_seconds"] = await load_corpus(conn, args, centroids)
+
+        logger.info("Computing exact ground truth...")
+        truth = exact_top_k(args, centroids, queries)
+
+        for index_type in args.index:
+            build_seconds = await build_index(conn, args, index_type)
+            logger.info(f"Built {index_type} index in {build_seconds:.1f}s")
+
+            setting, values = (
+                ("hnsw.ef_search", args.ef_search) if index_type == "hnsw" else ("ivfflat.probes", args.probes)
+            )
+            for value in values:
+                run = await run_queries(conn, args, queries, truth, setting, value)
+                run.update({"index": index_type, "build_seconds": build_seconds})
+                logger.info(json.dumps(run))
+                results["runs"].append(run)
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.close()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--metric", choices=OPERATORS, default="cosine")
+    parser.add_argument("--index", nargs="+", choices=["hnsw", "ivfflat"], default=["hnsw", "ivfflat"])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 5, 10, 20, 50])
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=None, help="IVFFlat lists (default rows / 1000)")
+    parser.add_argument("--maintenance-work-mem", default="2GB")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-load", action="store_true", help="Reuse an existing ann_bench table")
+    parser.add_argument("--keep", action="store_true", help="Keep the ann_bench table afterwards")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Synthetic corpus generator for load tests (scripts/bench_load.py).
+
+Writes --notes notes with about --links-per-note links each straight into
+Postgres with COPY. Notes belong to topics, each with its own vocabulary
+and embedding centroid, so keyword search, vector search, related notes
+and link communities all see clustered data rather than uniform noise:
+
+  content   log-normal number of sentences (mostly short notes, a long
+            tail of several paragraphs), mixing topic and common words
+  tags      two or three of the topic's tags
+  vectors   unit vectors scattered around the topic centroid, cheap enough
+            for 1M notes; --embed encodes the text with the serving model
+            instead, so search results are meaningful
+  links     mostly within a topic, some across topics, no duplicates
+  dates     creation times spread over --days, so listings page through
+            history
+
+Everything derives from --seed: the same arguments give the same corpus.
+Notes are left unenriched (no summary), so the worker has real work when
+their enrichment is queued. For large corpora, load before building the
+ANN index (scripts/migrate.py creates it) rather than into an indexed table.
+
+Run: python scripts/bench_corpus.py --notes 100k [--links-per-note 4] [--truncate] [--embed]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import settings
+from src.core.hashing import content_hash
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COMMON_WORDS = (
+    "graph note idea link memory search index query summary project meeting research "
+    "paper draft review design system cache model database worker queue reading writing "
+    "question answer insight pattern habit goal plan archive inbox outline chapter source "
+    "because while after before during about between through against without within"
+).split()
+SYLLABLES = "ka lo mi ren sa tor vel qua dri no pex ul zan fi mor the ban cul sio tra".split()
+TOPIC_SHARE = 0.6  # fraction of each note's words drawn from its topic's vocabulary
+CROSS_TOPIC_LINKS = 0.15
+
+
+def parse_count(value: str) -> int:
+    """Accept 10000, 10k or 1m"""
+    value = value.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+
+def topic_vocabularies(topics: int, seed: int, size: int = 12) -> list[list[str]]:
+    """Made-up words per topic, so topics never share keywords by accident"""
+    rng = random.Random(seed)
+    vocabularies, seen = [], set()
+    for _ in range(topics):
+        words = []
+        while len(words) < size:
+            word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        vocabularies.append(words)
+    return vocabularies
+
+
+def note_text(rng: random.Random, vocabulary: list[str]) -> tuple[str, str, list[str]]:
+    """Title, content and tags of one note"""
+    def word():
+        return rng.choice(vocabulary) if rng.random() < TOPIC_SHARE else rng.choice(COMMON_WORDS)
+
+    sentences = max(1, int(rng.lognormvariate(1.2, 0.9)))
+    content = " ".join(
+        " ".join(word() for _ in range(rng.randint(6, 18))).capitalize() + "."
+        for _ in range(sentences)
+    )
+    title = " ".join(rng.choice(vocabulary) for _ in range(3)).title()
+    tags = rng.sample(vocabulary[:6], rng.randint(2, 3))
+    return title, content, tags
+
+
+def make_centroids(topics: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((topics, dim)).astype(np.float32)
+    return centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+
+def make_vectors(centroids: np.ndarray, picks: np.ndarray, seed: int, spread: float = 1.4) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal((len(picks), centroids.shape[1])).astype(np.float32)
+    vectors = centroids[picks] + noise * spread / np.sqrt(centroids.shape[1])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def note_ids(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(count)]
+
+
+def link_pairs(topic_of: np.ndarray, links_per_note: float, seed: int) -> np.ndarray:
+    """Unique undirected (a, b) index pairs, a < b, averaging `links_per_note` per note"""
+    rng = np.random.default_rng(seed)
+    count = len(topic_of)
+    # Each edge touches two notes, so half as many edges as links per note
+    sources = np.repeat(np.arange(count), rng.poisson(links_per_note / 2, size=count))
+
+    # Same-topic targets: a random member of the source's topic
+    order = np.argsort(topic_of, kind="stable")
+    starts = np.searchsorted(topic_of[order], np.arange(topic_of.max() + 1))
+    sizes = np.bincount(topic_of, minlength=len(starts))
+    source_topics = topic_of[sources]
+    offsets = (rng.random(len(sources)) * sizes[source_topics]).astype(np.int64)
+    targets = order[starts[source_topics] + offsets]
+
+    cross = rng.random(len(sources)) < CROSS_TOPIC_LINKS
+    targets[cross] = rng.integers(0, count, size=int(cross.sum()))
+
+    pairs = np.stack([np.minimum(sources, targets), np.maximum(sources, targets)], axis=1)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.unique(pairs, axis=0)
+
+
+async def load_notes(conn, args, ids: list[str], topic_of: np.ndarray) -> float:
+    vocabularies = topic_vocabularies(args.topics, args.seed)
+    centroids = make_centroids(args.topics, args.dim, args.seed)
+    encoder = None
+    if args.embed:
+        from src.services import vector_services
+        encoder = vector_services.load_encoder(args.model)
+
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    for chunk_index, start in enumerate(range(0, len(ids), args.chunk_size)):
+        chunk = range(start, min(start + args.chunk_size, len(ids)))
+        rng = random.Random(args.seed + 1 + chunk_index)
+        texts = [note_text(rng, vocabularies[topic_of[i]]) for i in chunk]
+        contents = [content for _, content, _ in texts]
+        if encoder is not None:
+            vectors = np.asarray(encoder.encode(contents, batch_size=64), dtype=np.float32)
+        else:
+            vectors = make_vectors(centroids, topic_of[chunk.start:chunk.stop], args.seed + 1 + chunk_index)
+
+        records = []
+        for offset, i in enumerate(chunk):
+            title, content, tags = texts[offset]
+            created = now - timedelta(days=rng.random() * args.days)
+            updated = min(now, created + timedelta(hours=rng.expovariate(1 / 24)))
+            records.append((
+                ids[i], content, tags, title, vectors[offset],
+                args.model, content_hash(content), updated,
+                rng.random() < 0.02, rng.random() < 0.01, created, updated,
+            ))
+        await conn.copy_records_to_table(
+            "Note",
+            records=records,
+            columns=[
+                "id", "content", "tags", "title", "embedding",
+                "embeddingModel", "embeddingHash", "embeddedAt",
+                "isArchived", "isPinned", "createdAt", "updatedAt",
+            ],
+        )
+        logger.info(f"Loaded {chunk.stop}/{len(ids)} notes")
+    return time.perf_counter() - started
+
+
+async def load_links(conn, args, ids: list[str], pairs: np.ndarray) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(pairs), args.chunk_size * 4):
+        chunk = pairs[start:start + args.chunk_size * 4]
+        await conn.copy_records_to_table(
+            "_NoteLinks",
+            records=[(ids[a], ids[b]) for a, b in chunk.tolist()],
+            columns=["A", "B"],
+        )
+    logger.info(f"Loaded {len(pairs)} links")
+    return time.perf_counter() - started
+
+
+async def main(args):
+    conn = await asyncpg.connect(args.database_url.split("?")[0])
+    await register_vector(conn)
+    try:
+        if args.truncate:
+            logger.info("Truncating notes, links, chunks and staged embeddings")
+            await conn.execute('TRUNCATE "Note" CASCADE')
+
+        ids = note_ids(args.notes, args.seed)
+        topic_of = np.random.default_rng(args.seed).integers(0, args.topics, size=args.notes)
+        pairs = link_pairs(topic_of, args.links_per_note, args.seed)
+
+        notes_seconds = await load_notes(conn, args, ids, topic_of)
+        links_seconds = await load_links(conn, args, ids, pairs)
+        await conn.execute('ANALYZE "Note"')
+        await conn.execute('ANALYZE "_NoteLinks"')
+    finally:
+        await conn.close()
+
+    # Adjacency cached by the API predates the new links
+    from src.services import graph_service
+    await graph_service.invalidate()
+
+    results = {
+        "notes": args.notes,
+        "links": len(pairs),
+        "topics": args.topics,
+        "seed": args.seed,
+        "vectors": f"model:{args.model}" if args.embed else "synthetic",
+        "notes_s": round(notes_seconds, 1),
+        "notes_per_s": round(args.notes / notes_seconds, 1),
+        "links_s": round(links_seconds, 1),
+    }
+    print(json.dumps(results, indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=parse_count, default=parse_count("10k"), help="e.g. 10k, 100k, 1m")
+    parser.add_argument("--links-per-note", type=float, default=4.0, help="Average links per note")
+    parser.add_argument("--topics", type=int, default=None, help="Default: about one per 200 notes")
+    parser.add_argument("--days", type=float, default=365.0, help="Spread of creation times")
+    parser.add_argument("--dim", type=int, default=384, help="Must match the Note.embedding column")
+    parser.add_argument("--embed", action="store_true", help="Encode with the serving model instead of synthetic vectors")
+    parser.add_argument("--model", default=settings.embedding_model, help="Recorded as embeddingModel")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--truncate", action="store_true", help="Delete every existing note first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=settings.database_url)
+    args = parser.parse_args()
+    args.topics = args.topics or max(1, args.notes // 200)
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
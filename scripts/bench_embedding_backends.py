@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark: embedding backends against the torch reference.
+
+Embeds a fixed corpus with each backend and reports:
+  throughput      texts/s for the whole corpus (after one warm-up batch)
+  cosine          per-text cosine between the backend's and torch's vectors
+                  (mean, p1, min)
+  neighbour_recall fraction of each text's top-k neighbours (by torch
+                  vectors) the backend's vectors also rank in its top-k,
+                  which is what search quality depends on
+
+The corpus is a file with one text per line (--corpus) or, by default, a
+seeded synthetic corpus with a realistic spread of note lengths, so runs
+are comparable across machines and commits.
+
+Run: python scripts/bench_embedding_backends.py [--backends torch onnx onnx-int8] [--texts 2000] [--threads 4]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import settings
+
+WORDS = (
+    "graph note idea link memory search vector index query cluster summary tag project "
+    "meeting research paper draft review design system cache latency throughput model "
+    "embedding database worker queue retry budget community centrality reading writing "
+    "question answer insight pattern habit goal plan archive inbox outline chapter source"
+).split()
+
+
+def synthetic_corpus(count: int, seed: int) -> list[str]:
+    """Notes from a few words to several paragraphs, lengths skewed short like real notes"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        sentences = max(1, int(rng.lognormvariate(1.2, 0.9)))
+        texts.append(" ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 18))).capitalize() + "."
+            for _ in range(sentences)
+        ))
+    return texts
+
+
+def load_corpus(args) -> list[str]:
+    if args.corpus:
+        with open(args.corpus) as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return texts[:args.texts] if args.texts else texts
+    return synthetic_corpus(args.texts, args.seed)
+
+
+def embed(backend, texts: list[str], batch_size: int) -> tuple[np.ndarray, float]:
+    backend.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    started = time.perf_counter()
+    vectors = backend.encode(texts, batch_size=batch_size)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - started
+
+
+def normalise(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(vectors: np.ndarray, k: int) -> np.ndarray:
+    similarities = vectors @ vectors.T
+    np.fill_diagonal(similarities, -np.inf)
+    return np.argpartition(-similarities, k, axis=1)[:, :k]
+
+
+def agreement(reference: np.ndarray, candidate: np.ndarray, k: int) -> dict:
+    reference, candidate = normalise(reference), normalise(candidate)
+    cosines = np.sum(reference * candidate, axis=1)
+    expected, found = top_k(reference, k), top_k(candidate, k)
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(expected, found)])
+    return {
+        "cosine_mean": round(float(cosines.mean()), 5),
+        "cosine_p1": round(float(np.percentile(cosines, 1)), 5),
+        "cosine_min": round(float(cosines.min()), 5),
+        f"neighbour_recall@{k}": round(float(recall), 4),
+    }
+
+
+def main(args):
+    settings.embedding_intra_op_threads = args.threads
+    settings.embedding_inference_batch_size = args.batch_size
+    from src.services.embedding_backends import load_backend
+
+    texts = load_corpus(args)
+    results = {
+        "model": args.model,
+        "texts": len(texts),
+        "mean_chars": round(sum(map(len, texts)) / len(texts), 1),
+        "threads": args.threads or "default",
+        "batch_size": args.batch_size,
+        "backends": [],
+    }
+
+    reference = None
+    for name in ["torch"] + [b for b in args.backends if b != "torch"]:
+        started = time.perf_counter()
+        backend = load_backend(args.model, name)
+        load_seconds = time.perf_counter() - started
+        vectors, seconds = embed(backend, texts, args.batch_size)
+
+        run = {
+            "backend": name,
+            "load_s": round(load_seconds, 2),
+            "embed_s": round(seconds, 3),
+            "texts_per_s": round(len(texts) / seconds, 1),
+        }
+        if reference is None:
+            reference = vectors
+        else:
+            run.update(agreement(reference, vectors, args.k))
+            run["speedup_vs_torch"] = round(results["backends"][0]["embed_s"] / seconds, 2)
+        results["backends"].append(run)
+        print(json.dumps(run), file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.embedding_model)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"],
+                        choices=["torch", "onnx", "onnx-int8"], help="torch always runs, as the reference")
+    parser.add_argument("--corpus", help="File with one text per line (default: synthetic corpus)")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (0 = runtime default)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
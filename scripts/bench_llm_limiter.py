@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the shared LLM rate limiter.
+
+Runs several processes, each with many concurrent callers, against the fake
+LLM (LLM_PROVIDER=fake is forced). All of them go through the
+Redis-coordinated limiter. Reports achieved request rate vs the configured
+budget, throttles and deferrals.
+
+Run: python scripts/bench_llm_limiter.py --processes 4 --concurrency 16 --duration 60 --rpm 120
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def configure(args):
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.rpm)
+    os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.tpm)
+    os.environ["LLM_MAX_WAIT"] = str(args.max_wait)
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+
+
+async def caller(deadline: float, text: str, stats: dict):
+    from src.services import gemini_service
+    from src.services.rate_limiter import RateLimited
+
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            await gemini_service.enrich_text(text)
+            stats["ok"] += 1
+            stats["latencies"].append(time.monotonic() - started)
+        except RateLimited as e:
+            # A worker would defer the task; model that as sleeping it off
+            stats["deferred"] += 1
+            await asyncio.sleep(min(e.retry_after, max(0.0, deadline - time.monotonic())))
+        except Exception:
+            stats["errors"] += 1
+
+
+async def run_process(args, result_queue):
+    configure(args)
+    from src.services import gemini_service
+
+    stats = {"ok": 0, "deferred": 0, "errors": 0, "latencies": []}
+    text = "Zettelkasten notes link atomic ideas into a growing knowledge graph. " * args.text_repeat
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(*(caller(deadline, text, stats) for _ in range(args.concurrency)))
+
+    stats["provider_calls"] = gemini_service.get_model().calls
+    stats["provider_throttles"] = gemini_service.get_model().errors
+    result_queue.put(stats)
+
+
+def process_main(args, result_queue):
+    asyncio.run(run_process(args, result_queue))
+
+
+async def reset_limiter(args):
+    configure(args)
+    from src.services import redis_service
+    keys = [key async for key in redis_service.redis.scan_iter("ratelimit:llm:*")]
+    if keys:
+        await redis_service.redis.delete(*keys)
+
+
+def main(args):
+    asyncio.run(reset_limiter(args))
+
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    processes = [context.Process(target=process_main, args=(args, result_queue)) for _ in range(args.processes)]
+    started = time.monotonic()
+    for process in processes:
+        process.start()
+    results = [result_queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(latency for r in results for latency in r["latencies"])
+    ok = sum(r["ok"] for r in results)
+    calls = sum(r["provider_calls"] for r in results)
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else None
+
+    report = {
+        "processes": args.processes,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "budget_rpm": args.rpm,
+        "achieved_rpm": round(calls / args.duration * 60, 1),
+        "completed": ok,
+        "provider_calls": calls,
+        "provider_throttles": sum(r["provider_throttles"] for r in results),
+        "deferred": sum(r["deferred"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+        "p50_s": percentile(0.50),
+        "p95_s": percentile(0.95),
+        "p99_s": percentile(0.99),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent callers per process")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--rpm", type=int, default=120)
+    parser.add_argument("--tpm", type=int, default=1_000_000)
+    parser.add_argument("--max-wait", type=float, default=10.0)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls answering 429")
+    parser.add_argument("--text-repeat", type=int, default=20, help="Prompt size multiplier")
+    main(parser.parse_args())
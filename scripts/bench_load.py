@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+End-to-end load benchmark: the API and the worker under concurrent clients.
+
+Starts the API (uvicorn src.main:app) against the configured Postgres and
+Redis, or targets a running one with --url, and drives each scenario with
+--concurrency clients for --duration seconds:
+
+  create          POST /notes/ with synthetic notes
+  list            GET /notes/, following X-Next-Cursor a few pages deep
+  search_<mode>   GET /notes/search/ in semantic, keyword and hybrid mode,
+                  with queries built from the tags and titles of sampled notes
+  related         GET /notes/{id}/related
+  auto_link       POST /notes/{id}/auto-link
+  drain           enqueue enrichment for --drain-tasks sampled notes, start
+                  `worker.py`, and time until the queue is empty
+
+Each HTTP scenario reports p50/p95/p99/max latency (ms), throughput and
+errors, excluding a short warm-up. The API runs with EMBEDDED_WORKER=false,
+so the worker is only measured in the drain scenario, and both run with the
+fake LLM (LLM_PROVIDER=fake) so no API key or quota is involved.
+
+Use the disposable stack in docker-compose.bench.yml and a corpus from
+scripts/bench_corpus.py. Results go to JSON with the commit, corpus size and
+settings; --compare prints the change against an earlier results file.
+
+Run: python scripts/bench_load.py [--concurrency 16] [--duration 30] [--scenarios create search_semantic drain] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_corpus import topic_vocabularies, note_text
+from src.core.config import settings
+
+SEARCH_MODES = ("semantic", "keyword", "hybrid")
+SCENARIOS = ("create", "list", *(f"search_{mode}" for mode in SEARCH_MODES), "related", "auto_link", "drain")
+LIST_PAGES = 5
+
+
+def bench_environment(args) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "EMBEDDED_WORKER": "false",
+        # Several processes on one host cannot share the exporter port
+        "METRICS_WORKER_PORT": "0",
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def percentiles(latencies: list[float]) -> dict:
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2),
+        "mean_ms": round(float(values.mean()), 2),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Workload:
+    """Request generators for each scenario, sharing the sampled notes"""
+
+    def __init__(self, notes: list[dict], seed: int):
+        self.notes = notes
+        self.ids = [note["id"] for note in notes]
+        self.queries = self._queries(seed)
+        self.vocabularies = topic_vocabularies(50, seed + 1)
+
+    def _queries(self, seed: int) -> list[str]:
+        rng = random.Random(seed)
+        queries = []
+        for note in self.notes:
+            words = list(note.get("tags") or []) + (note.get("title") or "").split()
+            if words:
+                queries.append(" ".join(rng.sample(words, min(3, len(words)))))
+        return queries or ["knowledge graph"]
+
+    async def create(self, client, rng, state):
+        title, content, tags = note_text(rng, rng.choice(self.vocabularies))
+        return await client.post("/notes/", json={"content": content, "tags": tags, "title": title})
+
+    async def list_page(self, client, rng, state):
+        params = {"limit": 50}
+        if state.get("cursor") and state.get("page", 0) < LIST_PAGES:
+            params["cursor"] = state["cursor"]
+            state["page"] = state.get("page", 0) + 1
+        else:
+            state["page"] = 0
+        response = await client.get("/notes/", params=params)
+        state["cursor"] = response.headers.get("X-Next-Cursor")
+        return response
+
+    def search(self, mode: str):
+        async def request(client, rng, state):
+            return await client.get("/notes/search/", params={"q": rng.choice(self.queries), "limit": 10, "mode": mode})
+        return request
+
+    async def related(self, client, rng, state):
+        return await client.get(f"/notes/{rng.choice(self.ids)}/related", params={"limit": 10})
+
+    async def auto_link(self, client, rng, state):
+        return await client.post(f"/notes/{rng.choice(self.ids)}/auto-link", params={"threshold": 0.7})
+
+
+async def run_scenario(name: str, request, client, args) -> dict:
+    latencies, statuses = [], {}
+    errors = 0
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    deadline = measure_from + args.duration
+
+    async def client_loop(index: int):
+        nonlocal errors
+        rng = random.Random(f"{args.seed}-{name}-{index}")
+        state = {}
+        while time.perf_counter() < deadline:
+            sent = time.perf_counter()
+            try:
+                response = await request(client, rng, state)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if sent < measure_from:
+                continue
+            latencies.append(time.perf_counter() - sent)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if not isinstance(status, int) or status >= 400:
+                errors += 1
+
+    await asyncio.gather(*(client_loop(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - measure_from
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **percentiles(latencies),
+        "statuses": statuses,
+    }
+    print(json.dumps({name: result}), file=sys.stderr)
+    return result
+
+
+async def pending_tasks(client) -> tuple[int, dict]:
+    stats = (await client.get("/stats/queue")).json()
+    return stats["queued"] + stats["in_progress"] + stats["delayed"], stats
+
+
+async def run_drain(workload: Workload, client, args) -> dict:
+    """Time `worker.py` emptying a backlog of enrichment tasks"""
+    from src.services import redis_service
+
+    ids = workload.ids[:args.drain_tasks]
+    await redis_service.enqueue_tasks(redis_service.TASK_PROCESS_NOTE, [{"note_id": note_id} for note_id in ids])
+    # The backlog also holds whatever earlier scenarios queued (enrichment of
+    # created notes, related-list refreshes)
+    backlog, before = await pending_tasks(client)
+    remaining, after = backlog, before
+
+    worker = subprocess.Popen(
+        [sys.executable, "worker.py", "--processes", str(args.worker_processes)],
+        cwd=ROOT, env=bench_environment(args),
+    )
+    started = time.perf_counter()
+    try:
+        while remaining and time.perf_counter() - started < args.drain_timeout:
+            await asyncio.sleep(0.5)
+            remaining, after = await pending_tasks(client)
+        elapsed = time.perf_counter() - started
+    finally:
+        worker.send_signal(signal.SIGTERM)
+        worker.wait(timeout=60)
+
+    result = {
+        "tasks": backlog,
+        "remaining": remaining,
+        "seconds": round(elapsed, 2),
+        # Includes loading the model: a cold worker is what a deploy gets
+        "tasks_per_s": round((backlog - remaining) / elapsed, 1),
+        "dead_lettered": after["dead"] - before["dead"],
+        "worker_processes": args.worker_processes,
+    }
+    print(json.dumps({"drain": result}), file=sys.stderr)
+    return result
+
+
+async def sample_notes(client, count: int) -> list[dict]:
+    notes, cursor = [], None
+    while len(notes) < count:
+        params = {"limit": min(500, count - len(notes))}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/notes/", params=params)
+        response.raise_for_status()
+        notes.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    return notes
+
+
+async def corpus_size() -> dict:
+    import asyncpg
+
+    conn = await asyncpg.connect(settings.database_url.split("?")[0])
+    try:
+        return {
+            "notes": await conn.fetchval('SELECT count(*) FROM "Note"'),
+            "links": await conn.fetchval('SELECT count(*) FROM "_NoteLinks"'),
+        }
+    finally:
+        await conn.close()
+
+
+async def wait_ready(client, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(1)
+    raise SystemExit(f"API not ready after {timeout}s")
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client, args.ready_timeout)
+        notes = await sample_notes(client, args.sample_notes)
+        if not notes:
+            raise SystemExit("No notes to benchmark against, load a corpus with scripts/bench_corpus.py first")
+        workload = Workload(notes, args.seed)
+
+        results = {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "label": args.label,
+            "corpus": await corpus_size(),
+            "config": {
+                "concurrency": args.concurrency,
+                "duration_s": args.duration,
+                "api_workers": args.api_workers if args.start_api else "external",
+                "embedding_backend": settings.embedding_backend,
+                "vector_index_type": settings.vector_index_type,
+                "llm_latency_ms": args.llm_latency_ms,
+            },
+            "scenarios": {},
+        }
+
+        requests = {
+            "create": workload.create,
+            "list": workload.list_page,
+            "related": workload.related,
+            "auto_link": workload.auto_link,
+            **{f"search_{mode}": workload.search(mode) for mode in SEARCH_MODES},
+        }
+        for name in args.scenarios:
+            if name == "drain":
+                results["scenarios"]["drain"] = await run_drain(workload, client, args)
+            else:
+                results["scenarios"][name] = await run_scenario(name, requests[name], client, args)
+        return results
+
+
+def compare(results: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["scenarios"]
+    for name, current in results["scenarios"].items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for key in ("p95_ms", "p99_ms", "throughput_rps", "tasks_per_s"):
+            if current.get(key) and previous.get(key):
+                change = (current[key] - previous[key]) / previous[key] * 100
+                print(f"{name:18} {key:15} {previous[key]:>10} -> {current[key]:>10} ({change:+.1f}%)", file=sys.stderr)
+
+
+def main(args):
+    api = None
+    if args.start_api:
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(args.port),
+             "--workers", str(args.api_workers), "--log-level", "warning"],
+            cwd=ROOT, env=bench_environment(args),
+        )
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if api is not None:
+            api.send_signal(signal.SIGTERM)
+            api.wait(timeout=60)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Benchmark a running API instead of starting one")
+    parser.add_argument("--port", type=int, default=8100, help="Port for the API started by the benchmark")
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients per scenario")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout")
+    parser.add_argument("--ready-timeout", type=float, default=300.0, help="Wait this long for /ready")
+    parser.add_argument("--sample-notes", type=int, default=2000, help="Notes sampled for ids and queries")
+    parser.add_argument("--drain-tasks", type=int, default=1000)
+    parser.add_argument("--drain-timeout", type=float, default=600.0)
+    parser.add_argument("--worker-processes", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Fake LLM response time")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", help="Free-form tag stored with the results")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--compare", help="Earlier results JSON to print changes against")
+    args = parser.parse_args()
+    args.start_api = args.url is None
+    args.url = args.url or f"http://127.0.0.1:{args.port}"
+    return args
+
+
+if __name__ == "__main__":
+    main(parse_args())
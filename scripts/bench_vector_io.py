@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: text-literal vs binary vector I/O.
+
+Compares, on a scratch table, the three ways vectors can reach Postgres:
+  prisma-literal  '[0.1,0.2,…]' string through Prisma raw SQL (old path)
+  asyncpg-literal the same string through asyncpg (isolates the encoding)
+  asyncpg-binary  float32 arrays through pgvector's binary codec (new path)
+for single-row writes, batched writes and top-k queries.
+
+Run: python scripts/bench_vector_io.py [--rows 2000] [--dim 384]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import settings
+from src.core.database import asyncpg_dsn, prisma
+from src.services.vector_services import to_vector_literal
+
+TABLE = "vector_io_bench"
+
+
+def report(name: str, seconds: float, count: int) -> dict:
+    return {"case": name, "total_s": round(seconds, 4), "per_op_us": round(seconds / count * 1e6, 1), "ops_per_s": round(count / seconds, 1)}
+
+
+async def timed(coro_factory, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        await coro_factory(i)
+    return time.perf_counter() - started
+
+
+async def main(args):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.rows, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(uuid.uuid4()) for _ in range(args.rows)]
+
+    conn = await asyncpg.connect(asyncpg_dsn(settings.database_url))
+    binary = await asyncpg.connect(asyncpg_dsn(settings.database_url))
+    await register_vector(binary)
+    await prisma.connect()
+
+    results = []
+    try:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.execute(f"CREATE TABLE {TABLE} (id text PRIMARY KEY, embedding vector({args.dim}))")
+        await conn.executemany(f"INSERT INTO {TABLE} (id) VALUES ($1)", [(i,) for i in ids])
+
+        # Python-side encoding cost alone
+        started = time.perf_counter()
+        for vector in vectors:
+            to_vector_literal(vector)
+        results.append(report("encode-literal (python only)", time.perf_counter() - started, args.rows))
+
+        # Single-row writes
+        sql = f"UPDATE {TABLE} SET embedding = $1::vector WHERE id = $2"
+        results.append(report("write prisma-literal", await timed(
+            lambda i: prisma.execute_raw(sql, to_vector_literal(vectors[i]), ids[i]), args.rows), args.rows))
+        results.append(report("write asyncpg-literal", await timed(
+            lambda i: conn.execute(sql, to_vector_literal(vectors[i]), ids[i]), args.rows), args.rows))
+        results.append(report("write asyncpg-binary", await timed(
+            lambda i: binary.execute(sql, vectors[i], ids[i]), args.rows), args.rows))
+
+        # One batched write of every row
+        started = time.perf_counter()
+        await prisma.execute_raw(
+            f"""UPDATE {TABLE} t SET embedding = v.embedding::vector
+                FROM jsonb_to_recordset($1::jsonb) AS v(id text, embedding text) WHERE t.id = v.id""",
+            json.dumps([{"id": i, "embedding": to_vector_literal(v)} for i, v in zip(ids, vectors)]),
+        )
+        results.append(report("batch-write prisma-literal (jsonb)", time.perf_counter() - started, args.rows))
+
+        started = time.perf_counter()
+        async with binary.transaction():
+            await binary.execute("CREATE TEMP TABLE batch (id text, embedding vector) ON COMMIT DROP")
+            await binary.copy_records_to_table("batch", records=zip(ids, vectors), columns=["id", "embedding"])
+            await binary.execute(f"UPDATE {TABLE} t SET embedding = b.embedding FROM batch b WHERE t.id = b.id")
+        results.append(report("batch-write asyncpg-binary (COPY)", time.perf_counter() - started, args.rows))
+
+        # Top-k queries (sequential scan; measures parameter and result transfer)
+        queries = vectors[: args.queries]
+        sql = f"SELECT id, embedding <=> $1::vector AS distance FROM {TABLE} ORDER BY distance LIMIT {args.k}"
+        results.append(report("query prisma-literal", await timed(
+            lambda i: prisma.query_raw(sql, to_vector_literal(queries[i])), len(queries)), len(queries)))
+        results.append(report("query asyncpg-literal", await timed(
+            lambda i: conn.fetch(sql, to_vector_literal(queries[i])), len(queries)), len(queries)))
+        results.append(report("query asyncpg-binary", await timed(
+            lambda i: binary.fetch(sql, queries[i]), len(queries)), len(queries)))
+    finally:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.close()
+        await binary.close()
+        await prisma.disconnect()
+
+    print(json.dumps({"rows": args.rows, "dim": args.dim, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Queue AI enrichment for every note whose content changed since it was last
+summarised (or that was never summarised). Workers pack short notes several
+to a Gemini request.
+
+Run: python scripts/enrich_backlog.py [--batch-size 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import database
+from src.core.database import prisma
+from src.services import redis_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def run(batch_size: int):
+    await database.connect_db()
+    queued_notes = 0
+    queued_tasks = 0
+    last_id = ""
+    try:
+        while True:
+            rows = await prisma.query_raw(
+                """
+                SELECT id FROM "Note"
+                WHERE id > $1
+                  AND "enrichmentHash" IS DISTINCT FROM encode(sha256(convert_to(content, 'UTF8')), 'hex')
+                ORDER BY id
+                LIMIT $2
+                """,
+                last_id,
+                batch_size,
+            )
+            if not rows:
+                break
+            note_ids = [row["id"] for row in rows]
+            last_id = note_ids[-1]
+            await redis_service.enqueue_task(
+                redis_service.TASK_ENRICH_BATCH, {"note_ids": note_ids}
+            )
+            queued_notes += len(note_ids)
+            queued_tasks += 1
+    finally:
+        await database.disconnect_db()
+
+    logger.info(f"Queued {queued_notes} notes in {queued_tasks} enrichment tasks")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=50, help="Notes per queued task")
+    asyncio.run(run(parser.parse_args().batch_size))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Bulk-import notes from Markdown files/directories and JSONL files.
+
+Markdown: one note per .md file. The first "# heading" (or the file name)
+becomes the title and a "tags: a, b" line in YAML front matter sets tags.
+JSONL: one {"content": ..., "tags": [...], "title": ...} object per line.
+
+Files are streamed and imported in batches: one multi-row INSERT, one
+batched embedding pass and one vector UPDATE per batch, and a single Redis
+pipeline to queue enrichment.
+
+Run: python scripts/import_notes.py ~/vault notes.jsonl [--batch-size 1000] [--no-enrich]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import database
+from src.schemas.note import NoteCreate
+from src.services import note_services, redis_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_markdown(path: Path) -> NoteCreate:
+    text = path.read_text(encoding="utf-8")
+    tags = []
+
+    # Minimal front matter support: only the tags line is read
+    if text.startswith("---\n"):
+        end = text.find("\n---", 4)
+        if end != -1:
+            for line in text[4:end].splitlines():
+                key, _, value = line.partition(":")
+                if key.strip() == "tags":
+                    value = value.strip().strip("[]")
+                    tags = [tag.strip().strip("'\"") for tag in value.split(",") if tag.strip()]
+            text = text[end + 4:].lstrip("\n")
+
+    title = path.stem
+    for line in text.splitlines():
+        if line.startswith("# "):
+            title = line[2:].strip()
+            break
+
+    return NoteCreate(content=text, tags=tags, title=title)
+
+
+def iter_notes(paths: list[str]) -> Iterator[NoteCreate]:
+    for raw_path in paths:
+        path = Path(raw_path).expanduser()
+        files = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for file in files:
+            if file.suffix == ".md":
+                note = parse_markdown(file)
+                if note.content.strip():
+                    yield note
+            elif file.suffix in (".jsonl", ".ndjson"):
+                with file.open(encoding="utf-8") as lines:
+                    for line_number, line in enumerate(lines, start=1):
+                        if not line.strip():
+                            continue
+                        try:
+                            yield NoteCreate(**json.loads(line))
+                        except Exception as e:
+                            logger.warning(f"Skipping {file}:{line_number}: {e}")
+
+
+def batched(notes: Iterator[NoteCreate], size: int) -> Iterator[list[NoteCreate]]:
+    batch = []
+    for note in notes:
+        batch.append(note)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def run(args):
+    await database.connect_db()
+    imported = 0
+    started = time.monotonic()
+    try:
+        for batch in batched(iter_notes(args.paths), args.batch_size):
+            ids = await note_services.bulk_create_notes(batch, embed=not args.no_embed)
+            if not args.no_enrich:
+                await redis_service.enqueue_tasks(
+                    redis_service.TASK_PROCESS_NOTE, [{"note_id": note_id} for note_id in ids]
+                )
+            imported += len(ids)
+            elapsed = time.monotonic() - started
+            logger.info(f"Imported {imported} notes ({imported / elapsed:.0f} notes/s)")
+    finally:
+        await database.disconnect_db()
+
+    logger.info(f"Done: {imported} notes in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Markdown files/directories or JSONL files")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--no-embed", action="store_true", help="Skip embeddings (backfill later)")
+    parser.add_argument("--no-enrich", action="store_true", help="Do not queue AI processing")
+    asyncio.run(run(parser.parse_args()))
@@ -12,6 +12,61 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# ANN index settings, matching src.core.config.Settings
+VECTOR_METRIC = os.getenv("VECTOR_METRIC", "cosine")
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = int(os.getenv("IVFFLAT_LISTS", "100"))
+
+OPERATOR_CLASSES = {"cosine": "vector_cosine_ops", "l2": "vector_l2_ops"}
+# Tables with an embedding column: note-level vectors and per-chunk vectors
+VECTOR_TABLES = ("Note", "NoteChunk")
+
+
+def vector_index_names(table: str) -> dict:
+    return {"hnsw": f"{table}_embedding_hnsw_idx", "ivfflat": f"{table}_embedding_ivfflat_idx"}
+
+
+async def create_vector_index(prisma: Prisma, table: str = "Note"):
+    """Create the ANN index on <table>.embedding, replacing any other index type"""
+    index_names = vector_index_names(table)
+    if VECTOR_METRIC not in OPERATOR_CLASSES:
+        raise ValueError(f"Unsupported VECTOR_METRIC: {VECTOR_METRIC}")
+    if VECTOR_INDEX_TYPE not in (*index_names, "none"):
+        raise ValueError(f"Unsupported VECTOR_INDEX_TYPE: {VECTOR_INDEX_TYPE}")
+
+    opclass = OPERATOR_CLASSES[VECTOR_METRIC]
+
+    # Drop indexes of the other type, or built for another metric
+    for index_type, index_name in index_names.items():
+        existing = await prisma.query_raw(
+            "SELECT indexdef FROM pg_indexes WHERE indexname = $1",
+            index_name,
+        )
+        if existing and (index_type != VECTOR_INDEX_TYPE or opclass not in existing[0]["indexdef"]):
+            await prisma.execute_raw(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"')
+            logger.info(f"Dropped vector index {index_name}")
+
+    if VECTOR_INDEX_TYPE == "none":
+        return
+
+    index_name = index_names[VECTOR_INDEX_TYPE]
+    if VECTOR_INDEX_TYPE == "hnsw":
+        options = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    else:
+        # IVFFlat trains its centroids on existing rows, so build it after
+        # the corpus is loaded (rule of thumb: lists = rows / 1000)
+        options = f"lists = {IVFFLAT_LISTS}"
+
+    await prisma.execute_raw(f"""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name}"
+        ON "{table}" USING {VECTOR_INDEX_TYPE} (embedding {opclass})
+        WITH ({options});
+    """)
+    logger.info(f"Vector index {index_name} ready ({VECTOR_INDEX_TYPE}, {VECTOR_METRIC})")
+
+
 async def run_migration():
     """Run database migrations"""
     prisma = Prisma()
@@ -21,50 +76,42 @@ async def run_migration():
         await prisma.connect()
         logger.info("Connected to database")
         
-        # Create audit log table if it doesn't exist
+        # Add new columns to the Note table (mirrors prisma/schema.prisma)
         await prisma.execute_raw("""
-            CREATE TABLE IF NOT EXISTS note_audit_logs (
-                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                note_id UUID NOT NULL,
-                action VARCHAR(50) NOT NULL,
-                changes JSONB,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                user_id UUID,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE CASCADE
-            );
+            ALTER TABLE "Note"
+            ADD COLUMN IF NOT EXISTS "title" TEXT,
+            ADD COLUMN IF NOT EXISTS "isArchived" BOOLEAN NOT NULL DEFAULT FALSE,
+            ADD COLUMN IF NOT EXISTS "isPinned" BOOLEAN NOT NULL DEFAULT FALSE,
+            ADD COLUMN IF NOT EXISTS "metadata" JSONB DEFAULT '{}'::jsonb;
         """)
         
-        # Create indexes
-        await prisma.execute_raw("""
-            CREATE INDEX IF NOT EXISTS note_audit_logs_note_id_idx ON note_audit_logs(note_id);
-            CREATE INDEX IF NOT EXISTS note_audit_logs_action_idx ON note_audit_logs(action);
-            CREATE INDEX IF NOT EXISTS note_audit_logs_created_at_idx ON note_audit_logs(created_at);
-        """)
+        # Create listing indexes. Prepared statements cannot hold several
+        # commands, so each index is created separately
+        listing_indexes = [
+            'CREATE INDEX IF NOT EXISTS "Note_createdAt_idx" ON "Note"("createdAt")',
+            # Keyset pagination in list_notes orders by (updatedAt, id)
+            'CREATE INDEX IF NOT EXISTS "Note_updatedAt_id_idx" ON "Note"("updatedAt" DESC, id DESC)',
+            'CREATE INDEX IF NOT EXISTS "Note_isArchived_idx" ON "Note"("isArchived")',
+            'CREATE INDEX IF NOT EXISTS "Note_isPinned_idx" ON "Note"("isPinned")',
+            # Serves tag filters (tags @> ARRAY[...])
+            'CREATE INDEX IF NOT EXISTS "Note_tags_gin_idx" ON "Note" USING gin(tags)',
+        ]
+        for statement in listing_indexes:
+            await prisma.execute_raw(statement)
         
-        # Add new columns to notes table
+        # Create full-text search index. The expression must stay identical
+        # to FULL_TEXT_DOCUMENT in note_services for queries to use it
         await prisma.execute_raw("""
-            ALTER TABLE notes
-            ADD COLUMN IF NOT EXISTS title VARCHAR(255),
-            ADD COLUMN IF NOT EXISTS is_archived BOOLEAN DEFAULT FALSE,
-            ADD COLUMN IF NOT EXISTS is_pinned BOOLEAN DEFAULT FALSE,
-            ADD COLUMN IF NOT EXISTS metadata JSONB DEFAULT '{}'::jsonb;
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS "Note_title_content_summary_fts_idx"
+            ON "Note" USING gin((setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                                 setweight(to_tsvector('english', coalesce(content, '') || ' ' || coalesce(summary, '')), 'B')));
         """)
+        # Superseded by the index above, which also covers the title
+        await prisma.execute_raw('DROP INDEX CONCURRENTLY IF EXISTS "Note_content_summary_fts_idx"')
         
-        # Create additional indexes
-        await prisma.execute_raw("""
-            CREATE INDEX IF NOT EXISTS notes_created_at_idx ON notes(created_at);
-            CREATE INDEX IF NOT EXISTS notes_updated_at_idx ON notes(updated_at);
-            CREATE INDEX IF NOT EXISTS notes_is_archived_idx ON notes(is_archived);
-            CREATE INDEX IF NOT EXISTS notes_is_pinned_idx ON notes(is_pinned);
-        """)
-        
-        # Create full-text search index
-        await prisma.execute_raw("""
-            CREATE INDEX IF NOT EXISTS notes_content_summary_title_idx 
-            ON notes USING gin(to_tsvector('english', coalesce(content, '') || ' ' || 
-                                         coalesce(summary, '') || ' ' || 
-                                         coalesce(title, '')));
-        """)
+        # Create approximate nearest-neighbour indexes for semantic search
+        for table in VECTOR_TABLES:
+            await create_vector_index(prisma, table)
         
         logger.info("Migration completed successfully")
         
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,7 +6,110 @@ class Settings(BaseSettings):
     redis_url: str
     gemini_api_key: str
 
+    # Embedding engine
+    embedding_model: str = "all-MiniLM-L6-v2"
+    # Model being backfilled into NoteEmbedding ahead of a switch, if any
+    embedding_target_model: Optional[str] = None
+    embedding_backfill_batch_size: int = 256
+    embedding_max_batch_size: int = 32
+    embedding_max_wait_ms: float = 5.0
+    embedding_workers: int = 1
+    # Inference backend: "torch", "onnx" or "onnx-int8" (see embedding_backends)
+    embedding_backend: str = "torch"
+    embedding_intra_op_threads: int = 0  # 0 lets the runtime decide
+    embedding_inference_batch_size: int = 16  # length-sorted sub-batches (ONNX)
+    embedding_onnx_dir: str = ".cache/onnx"
+    # Model loading: by default each process loads it in the background after
+    # startup (/ready reports when it is done). EMBEDDING_PRELOAD loads it at
+    # import, for servers that fork workers after importing the app (gunicorn
+    # --preload) so the weights are shared copy-on-write. With
+    # EMBEDDING_SERVER_SOCKET set, processes send texts to one embedding
+    # server (python -m src.services.embedding_server) instead.
+    embedding_warmup: bool = True
+    embedding_preload: bool = False
+    embedding_server_socket: Optional[str] = None
+
+    # Chunk-level embeddings (long notes are searched passage by passage)
+    chunk_embeddings: bool = True
+    chunk_max_chars: int = 800  # MiniLM reads ~256 word pieces, about 1000 chars
+    chunk_overlap_chars: int = 150
+    chunk_search_candidates: int = 5  # chunk hits fetched per requested note
+
+    # Embedding cache
+    embedding_cache_size: int = 10000
+    embedding_cache_redis: bool = True
+    embedding_cache_ttl: int = 7 * 24 * 3600
+
+    # Note read cache (Redis tier; the per-request identity map is always on)
+    note_cache_redis: bool = True
+    note_cache_ttl: int = 300
+
+    # Precomputed related-note lists (refreshed by the worker)
+    related_list_size: int = 20
+    related_max_age: float = 3600.0  # older lists are recomputed on read
+
+    # Vector index (pgvector)
+    vector_metric: str = "cosine"  # "cosine" or "l2"
+    vector_index_type: str = "hnsw"  # "hnsw", "ivfflat" or "none"
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    ivfflat_lists: int = 100
+    vector_binary_io: bool = True  # asyncpg + pgvector binary codec for vector I/O
+    vector_pool_size: int = 10
+
+    # Auto-linking (similar notes are linked by a corpus-wide job)
+    auto_link_k: int = 5
+    auto_link_threshold: float = 0.7
+    auto_link_batch_size: int = 500
+
+    # Graph analytics (PageRank, components, communities), recomputed by the worker
+    graph_analytics_interval: float = 900.0  # seconds between scheduled runs, 0 disables
+
+    # Audit log (events queued in Redis, written in batches by the worker)
+    audit_log: bool = True
+    audit_flush_batch_size: int = 500
+    audit_flush_interval: float = 5.0  # seconds an event may wait for a full batch
+    audit_retention_days: int = 365  # whole monthly partitions are dropped, 0 keeps all
+
+    # Observability (prometheus_client and opentelemetry are optional)
+    metrics_enabled: bool = True
+    metrics_worker_port: int = 9100  # worker process i listens on port + i, 0 disables
+    otel_enabled: bool = False
+
+    # Task worker
+    worker_concurrency: int = 8
+    worker_batch_size: int = 16
+    worker_drain_timeout: float = 30.0
+    embedded_worker: bool = True  # also consume tasks inside the API process
+    # Tasks of a worker that stopped heartbeating for this long are retried
+    task_visibility_timeout: float = 300.0
+    task_max_attempts: int = 5
+    task_retry_base_delay: float = 2.0
+    task_retry_max_delay: float = 600.0
+    task_dedupe_ttl: int = 3600
+
+    # Edit debouncing: a note's re-embedding and enrichment run once its
+    # edits pause this long (0 queues them at once)
+    embedding_debounce: float = 2.0
+    enrichment_debounce: float = 10.0
+    debounce_max_wait: float = 60.0  # a note edited non-stop is still processed this often
+
+    # Gemini enrichment
+    enrichment_mode: str = "combined"  # "combined" (one call) or "split"
+    bulk_enrichment_max_note_chars: int = 2000
+    bulk_enrichment_max_batch_chars: int = 12000
+
+    # LLM provider and client-side rate limiting (shared through Redis)
+    llm_provider: str = "gemini"  # "gemini" or "fake" for offline load tests
+    llm_requests_per_minute: int = 60
+    llm_tokens_per_minute: int = 1_000_000
+    llm_max_wait: float = 10.0  # longer waits defer the task instead
+    llm_backoff_base: float = 2.0
+    llm_backoff_max: float = 120.0
+    fake_llm_latency_ms: float = 300.0
+    fake_llm_error_rate: float = 0.0
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -1,12 +1,42 @@
+import logging
+import asyncpg
+from pgvector.asyncpg import register_vector
 from prisma import Prisma
 from src.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 prisma = Prisma(datasource={'url': settings.database_url})
 
+# Direct asyncpg pool for vector reads/writes: pgvector's binary codec sends
+# float32 arrays as-is instead of '[0.1,0.2,…]' text literals. None when
+# disabled or unavailable, in which case callers fall back to Prisma raw SQL.
+pg_pool: asyncpg.Pool | None = None
+
+def asyncpg_dsn(url: str) -> str:
+    """Strip Prisma-only query parameters (e.g. ?schema=public) from the URL"""
+    return url.split("?", 1)[0]
+
 async def connect_db():
+    global pg_pool
     await prisma.connect()
 
+    if settings.vector_binary_io and pg_pool is None:
+        try:
+            pg_pool = await asyncpg.create_pool(
+                asyncpg_dsn(settings.database_url),
+                min_size=1,
+                max_size=settings.vector_pool_size,
+                init=register_vector,
+            )
+        except Exception as e:
+            logger.warning(f"Binary vector pool unavailable, using Prisma raw queries: {str(e)}")
+            pg_pool = None
+
 async def disconnect_db():
+    global pg_pool
+    if pg_pool is not None:
+        await pg_pool.close()
+        pg_pool = None
     await prisma.disconnect()
 
-
@@ -0,0 +1,5 @@
+import hashlib
+
+def content_hash(text: str) -> str:
+    """sha256 hex digest of a note's text, used to detect unchanged content"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,21 @@
+import hashlib
+import json
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+
+def etag_response(request: Request, content) -> Response:
+    """JSON response carrying an ETag of its body.
+
+    Answers 304 Not Modified with no body when the client already holds
+    this version (If-None-Match), so unchanged notes are not re-sent.
+    """
+    body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+    etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,156 @@
+"""Prometheus metrics for the API, the worker and the services they call.
+
+prometheus_client is optional: without it (or with METRICS_ENABLED=false)
+every metric below is a shared no-op, so instrumented code pays one method
+call and nothing is exported. The API serves /metrics; worker processes
+expose their own registry on METRICS_WORKER_PORT (one port per process). With
+PROMETHEUS_MULTIPROC_DIR set, /metrics aggregates every process writing
+to that directory instead (uvicorn/gunicorn with several workers).
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+except ImportError:  # pragma: no cover - optional dependency
+    prometheus_client = None
+
+ENABLED = settings.metrics_enabled and prometheus_client is not None
+
+# Seconds; spans sub-millisecond cache hits to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+_NOOP = _NoopMetric()
+
+
+def _histogram(name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+    if not ENABLED:
+        return _NOOP
+    return prometheus_client.Histogram(name, documentation, labels, buckets=buckets)
+
+
+def _counter(name, documentation, labels=()):
+    if not ENABLED:
+        return _NOOP
+    return prometheus_client.Counter(name, documentation, labels)
+
+
+def _gauge(name, documentation, labels=()):
+    if not ENABLED:
+        return _NOOP
+    # Queue gauges are sampled by whichever process runs maintenance
+    return prometheus_client.Gauge(name, documentation, labels, multiprocess_mode="mostrecent")
+
+
+# HTTP
+HTTP_REQUEST_SECONDS = _histogram(
+    "pkos_http_request_seconds", "API request latency by route template", ("method", "route", "status"))
+
+# Embeddings
+EMBEDDING_SECONDS = _histogram(
+    "pkos_embedding_encode_seconds", "Time for one encoder forward pass", ("model",))
+EMBEDDING_BATCH_SIZE = _histogram(
+    "pkos_embedding_batch_size", "Texts per encoder forward pass", ("model",), buckets=BATCH_BUCKETS)
+
+# Postgres vector queries
+VECTOR_QUERY_SECONDS = _histogram(
+    "pkos_vector_query_seconds", "pgvector query latency", ("operation",))
+
+# LLM
+LLM_CALL_SECONDS = _histogram(
+    "pkos_llm_call_seconds", "LLM provider call latency (rate-limiter waits excluded)", ("prompt", "outcome"))
+LLM_TOKENS = _counter(
+    "pkos_llm_prompt_tokens_total", "Estimated prompt tokens sent to the LLM", ("prompt",))
+LLM_ERRORS = _counter(
+    "pkos_llm_errors_total", "Failed LLM calls", ("prompt", "kind"))
+
+# Task queue
+TASKS = _counter("pkos_tasks_total", "Tasks finished by outcome", ("type", "outcome"))
+TASK_SECONDS = _histogram("pkos_task_seconds", "Task run time", ("type",))
+QUEUE_DEPTH = _gauge("pkos_queue_depth", "Tasks in the queue by state", ("state",))
+QUEUE_OLDEST_AGE = _gauge("pkos_queue_oldest_age_seconds", "Age of the oldest unfinished task")
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of the enclosed block"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+
+def render() -> tuple[bytes, str]:
+    """The exposition text for /metrics and its content type"""
+    if not ENABLED:
+        return b"# metrics disabled\n", "text/plain; charset=utf-8"
+    registry = prometheus_client.REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def start_exporter(port: int):
+    """Serve this process's metrics on their own port (worker processes)"""
+    if not ENABLED or not port:
+        return
+    prometheus_client.start_http_server(port)
+    logger.info(f"Metrics exporter listening on :{port}")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template (not per URL)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            ).observe(time.perf_counter() - started)
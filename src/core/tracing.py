@@ -0,0 +1,46 @@
+"""Optional OpenTelemetry spans around hot-path stages.
+
+With OTEL_ENABLED=false (the default) or without the opentelemetry packages,
+span() returns one shared no-op context manager: no tracer lookup and no
+span objects are created. When enabled, spans go to the
+OTLP exporter configured by the standard OTEL_EXPORTER_OTLP_* variables.
+"""
+
+import contextlib
+import logging
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_NOOP = contextlib.nullcontext()
+_tracer = None
+
+
+def setup(service_name: str):
+    """Install the tracer provider for this process; call once at startup"""
+    global _tracer
+    if not settings.otel_enabled:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        logger.warning(f"OTEL_ENABLED is set but OpenTelemetry is not installed: {str(e)}")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("pkos")
+    logger.info(f"OpenTelemetry tracing enabled for {service_name}")
+
+
+def span(name: str, **attributes):
+    """Context manager timing one stage, a no-op unless tracing is set up"""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes)
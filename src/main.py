@@ -1,19 +1,34 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from src.core import database
-from src.routers import notes, links
-from src.services import redis_service
+from src.core import database, metrics, tracing
+from src.core.config import settings
+from src.routers import notes, links, embeddings, graph
+from src.services import note_cache, redis_service, vector_services
+
+if settings.embedding_preload:
+    # Load before the server forks its workers so they share the weights
+    vector_services.preload()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
+    tracing.setup("pkos-api")
     await database.connect_db()
+    # Load the embedding model in the background: /health answers at once,
+    # /ready once the model is in
+    warm_up = asyncio.create_task(vector_services.warm_up()) if settings.embedding_warmup else None
     # Start background worker for processing tasks
     await redis_service.start_background_worker()
     yield
     # Shutdown logic
+    if warm_up is not None:
+        await warm_up
+    await redis_service.stop_background_worker()
     await database.disconnect_db()
+    vector_services.shutdown()
 
 app = FastAPI(title="Personal Knowledge OS", lifespan=lifespan)
 
@@ -24,10 +39,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# Per-request identity map for note reads
+app.add_middleware(note_cache.RequestScopeMiddleware)
+# Latency per route template
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(notes.router, prefix="/notes", tags=["notes"])
 app.include_router(links.router, prefix="/notes", tags=["links"])
+app.include_router(embeddings.router, prefix="/embeddings", tags=["embeddings"])
+app.include_router(graph.router, prefix="/graph", tags=["graph"])
 
 @app.get("/")
 async def root():
@@ -35,4 +57,40 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    """Liveness: the process is up and serving"""
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: database and Redis reachable, embedding model loaded"""
+    checks = {}
+    try:
+        await database.prisma.query_raw("SELECT 1")
+        checks["database"] = True
+    except Exception:
+        checks["database"] = False
+    try:
+        checks["redis"] = bool(await redis_service.redis.ping())
+    except Exception:
+        checks["redis"] = False
+    checks["embedding_model"] = vector_services.is_ready()
+
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks},
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape target"""
+    content, content_type = metrics.render()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/stats/embedding-cache")
+async def embedding_cache_stats():
+    return vector_services.cache_stats()
+
+@app.get("/stats/queue")
+async def queue_stats():
+    return await redis_service.queue_stats()
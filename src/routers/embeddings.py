@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from src.services import embedding_backfill
+
+router = APIRouter()
+
+@router.post("/backfill")
+async def start_backfill(model: Optional[str] = Query(None, description="Model to backfill (default EMBEDDING_TARGET_MODEL, else the serving model)"),
+                         restart: bool = Query(False, description="Ignore the saved checkpoint")):
+    """Queue re-embedding of every note whose vector is missing or stale"""
+    try:
+        return await embedding_backfill.start_backfill(model, restart=restart)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/backfill")
+async def backfill_status(model: Optional[str] = None):
+    """Progress of a model's backfill"""
+    return await embedding_backfill.backfill_status(model)
+
+@router.post("/promote")
+async def promote_model(model: str = Query(..., description="Fully backfilled model to start serving")):
+    """Queue switching search and writes over to a backfilled model (resumes an interrupted promotion)"""
+    try:
+        return await embedding_backfill.promote_model(model)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/promote")
+async def promotion_status(model: str):
+    """Phase of a model's promotion"""
+    return await embedding_backfill.promotion_status(model)
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+
+from src.schemas.graph import GraphAdjacency, GraphCommunity, GraphNeighbourhood, GraphNode
+from src.services import graph_analytics, graph_service, redis_service
+
+router = APIRouter()
+
+@router.get("/", response_model=GraphAdjacency)
+async def get_graph():
+    """Every note and link, as a compact adjacency structure"""
+    return await graph_service.get_graph()
+
+@router.post("/analytics")
+async def run_analytics(force: bool = Query(False, description="Recompute even if no link changed")):
+    """Queue a PageRank / components / communities recompute"""
+    queued = await redis_service.enqueue_task(
+        redis_service.TASK_GRAPH_ANALYTICS, {"force": force}, task_id="graph_analytics"
+    )
+    return {"queued": queued, "last_run": await graph_analytics.analytics_status()}
+
+@router.get("/analytics")
+async def analytics_status():
+    """Stats of the last analytics run"""
+    return await graph_analytics.analytics_status()
+
+@router.get("/hubs", response_model=List[GraphNode])
+async def get_hubs(limit: int = Query(20, ge=1, le=500),
+                   community: Optional[int] = Query(None, description="Only notes in this community")):
+    """Most central notes by PageRank"""
+    return await graph_analytics.top_notes(limit, community_id=community)
+
+@router.get("/communities", response_model=List[GraphCommunity])
+async def get_communities(limit: int = Query(50, ge=1, le=500),
+                          min_size: int = Query(2, ge=1, description="Smallest community returned")):
+    """Largest topic clusters, each with its most central note"""
+    return await graph_analytics.list_communities(limit, min_size=min_size)
+
+@router.get("/{note_id}", response_model=GraphNeighbourhood)
+async def get_neighbourhood(note_id: str,
+                            depth: int = Query(2, ge=0, le=4, description="Maximum number of hops"),
+                            fan_out: int = Query(25, ge=1, le=200, description="Links followed per note"),
+                            max_nodes: int = Query(200, ge=1, le=2000, description="Maximum notes returned")):
+    """Notes within `depth` links of a note, with the links between them"""
+    graph = await graph_service.get_neighbourhood(note_id, depth=depth, fan_out=fan_out, max_nodes=max_nodes)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return graph
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import List, Optional
 
+from src.core.http_cache import etag_response
 from src.schemas.note import NoteResponse
 from src.services import note_services, linking_service
 
@@ -34,21 +35,35 @@ async def remove_link(source_id: str, target_id: str):
     return {"message": "Link removed successfully"}
 
 @router.get("/{note_id}/links", response_model=List[NoteResponse])
-async def get_linked_notes(note_id: str):
+async def get_linked_notes(note_id: str, request: Request):
     """Get all notes linked to this note"""
     note = await note_services.get_note(note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
     linked_notes = await linking_service.get_linked_notes(note_id)
-    return linked_notes
+    return etag_response(request, [NoteResponse(**linked.dict()) for linked in linked_notes])
+
+@router.post("/auto-link")
+async def auto_link_corpus(incremental: bool = Query(True, description="Only notes embedded since the last run"),
+                           k: Optional[int] = Query(None, ge=1, le=50, description="Neighbours considered per note"),
+                           threshold: Optional[float] = Query(None, ge=-1.0, le=1.0, description="Minimum similarity to link")):
+    """Queue a corpus-wide auto-link run, or resume the one in progress"""
+    started = await linking_service.start_auto_link(k=k, similarity_threshold=threshold, incremental=incremental)
+    return {**started, "last_run": await linking_service.auto_link_status()}
+
+@router.get("/auto-link/status")
+async def auto_link_status():
+    """Stats of the last corpus-wide auto-link run"""
+    return await linking_service.auto_link_status()
 
 @router.post("/{note_id}/auto-link", response_model=List[NoteResponse])
-async def auto_link_notes(note_id: str):
+async def auto_link_notes(note_id: str,
+                          threshold: float = Query(0.7, ge=-1.0, le=1.0, description="Minimum similarity to link")):
     """Automatically link similar notes"""
     note = await note_services.get_note(note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    linked_notes = await linking_service.auto_link_notes(note_id)
+    linked_notes = await linking_service.auto_link_notes(note_id, similarity_threshold=threshold)
     return linked_notes
\ No newline at end of file
@@ -1,29 +1,57 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks,Query
-from typing import List
+from fastapi import APIRouter, HTTPException, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import json
 
-from src.schemas.note import NoteCreate, NoteResponse, NoteUpdate
-from src.services import note_services, gemini_service, redis_service
+from src.core.http_cache import etag_response
+from src.schemas.note import NoteCreate, NoteResponse, NoteUpdate, NoteSearchResult, NoteListItem, NoteBulkCreateResponse
+from src.services import note_services, gemini_service, redis_service, related_service
+from src.services.rate_limiter import RateLimited
 
 router = APIRouter()
 
+MAX_BULK_NOTES = 5000
+
 @router.post("/", response_model=NoteResponse)
-async def create_note(note: NoteCreate, background_tasks: BackgroundTasks):
+async def create_note(note: NoteCreate):
+    # Embedding and AI processing are queued (debounced) by the service
     new_note = await note_services.create_note(note)
-    # Queue AI processing in Redis instead of using background tasks
-    await redis_service.enqueue_task(
-        redis_service.TASK_PROCESS_NOTE, 
-        {"note_id": new_note.id}
-    )
-    # background_tasks.add_task(gemini_service.process_note, new_note.id)
-
     return new_note
 
+@router.post("/bulk", response_model=NoteBulkCreateResponse)
+async def bulk_create_notes(notes: List[NoteCreate] = Body(...),
+                            enrich: bool = Query(True, description="Queue AI processing for the new notes")):
+    """Import many notes at once: batched inserts, embeddings and queueing"""
+    if len(notes) > MAX_BULK_NOTES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_NOTES} notes per request")
+    ids = await note_services.bulk_create_notes(notes)
+    if enrich:
+        await redis_service.enqueue_tasks(
+            redis_service.TASK_PROCESS_NOTE,
+            [{"note_id": note_id} for note_id in ids]
+        )
+    return {"created": len(ids), "ids": ids}
+
+@router.get("/export")
+async def export_notes(fields: str = Query("full", regex="^(full|summary)$"),
+                       tag: Optional[str] = None,
+                       archived: Optional[bool] = None,
+                       pinned: Optional[bool] = None):
+    """Stream every matching note as newline-delimited JSON"""
+    async def rows():
+        async for row in note_services.iter_notes(
+            fields=fields, tag=tag, archived=archived, pinned=pinned
+        ):
+            yield json.dumps(row, default=str) + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
 @router.get("/{note_id}", response_model=NoteResponse)
-async def get_note(note_id: str):
+async def get_note(note_id: str, request: Request):
     note = await note_services.get_note(note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
-    return note
+    return etag_response(request, NoteResponse(**note.dict()))
 
 @router.put("/{note_id}", response_model=NoteResponse)
 async def update_note(note_id: str, note_data: NoteUpdate):
@@ -43,15 +71,36 @@ async def delete_note(note_id: str):
     await note_services.delete_note(note_id)
     return {"message": "Note deleted successfully"}
 
-@router.get("/", response_model=List[NoteResponse])
-async def list_notes():
-    return await note_services.list_notes()
+@router.get("/", response_model=List[NoteListItem])
+async def list_notes(response: Response,
+                     limit: int = Query(50, ge=1, le=500, description="Page size"),
+                     cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
+                     fields: str = Query("full", regex="^(full|summary)$", description="summary skips note content"),
+                     tag: Optional[str] = Query(None, description="Only notes carrying this tag"),
+                     archived: Optional[bool] = None,
+                     pinned: Optional[bool] = None):
+    try:
+        notes, next_cursor = await note_services.list_notes(
+            limit=limit, cursor=cursor, fields=fields,
+            tag=tag, archived=archived, pinned=pinned
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return notes
 
 
-@router.get("/search/", response_model=List[NoteResponse])
+@router.get("/search/", response_model=List[NoteSearchResult])
 async def search_notes(q: str = Query(..., description="Search query"), 
-                       limit: int = Query(5, description="Maximum number of results")):
-    return await note_services.search_notes(q, limit)
+                       limit: int = Query(5, description="Maximum number of results"),
+                       mode: str = Query("semantic", regex="^(semantic|keyword|hybrid|chunk)$", description="semantic (vector), keyword (full-text, no encoder), hybrid (rank fusion of both) or chunk (passage-level vectors)"),
+                       aggregate: str = Query("max", regex="^(max|mean)$", description="How chunk mode scores a note: best passage (max) or average of matching passages (mean)"),
+                       ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
+                       probes: Optional[int] = Query(None, ge=1, le=1000, description="IVFFlat lists to probe (recall vs latency)"),
+                       centrality: float = Query(0.0, ge=0.0, le=1.0, description="Weight of graph centrality (PageRank) in the ranking")):
+    return await note_services.search_notes(q, limit, mode=mode, ef_search=ef_search, probes=probes, aggregate=aggregate, centrality=centrality)
 
 
 
@@ -62,14 +111,26 @@ async def process_note(note_id: str):
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    processed_note = await gemini_service.process_note(note_id)
+    try:
+        processed_note = await gemini_service.process_note(note_id)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="AI processing is rate limited, try again later",
+            headers={"Retry-After": str(int(e.retry_after) + 1)},
+        )
+    if processed_note is None:
+        raise HTTPException(status_code=409, detail="Note changed while it was being processed, try again")
     return processed_note
 
-@router.get("/{note_id}/related", response_model=List[NoteResponse])
-async def get_related_notes(note_id: str):
+@router.get("/{note_id}/related", response_model=List[NoteSearchResult])
+async def get_related_notes(note_id: str, request: Request,
+                            limit: int = Query(5, ge=1, le=20, description="Maximum number of results"),
+                            fresh: bool = Query(False, description="Recompute now instead of serving the precomputed list")):
     """Get notes related to this note"""
     note = await note_services.get_note(note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    return await gemini_service.suggest_links(note_id)
\ No newline at end of file
+    related = await related_service.get_related_notes(note_id, limit=limit, fresh=fresh)
+    return etag_response(request, related)
\ No newline at end of file
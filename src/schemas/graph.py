@@ -0,0 +1,38 @@
+from typing import List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+class GraphNode(BaseModel):
+    id: str
+    # Title, else the start of the summary or content
+    label: Optional[str] = None
+    tags: List[str] = []
+    isPinned: bool = False
+    updatedAt: Optional[datetime] = None
+    depth: Optional[int] = None
+    degree: Optional[int] = None
+    # Set once graph analytics have run
+    pagerank: Optional[float] = None
+    componentId: Optional[int] = None
+    communityId: Optional[int] = None
+
+class GraphEdge(BaseModel):
+    source: str
+    target: str
+
+class GraphNeighbourhood(BaseModel):
+    nodes: List[GraphNode]
+    edges: List[GraphEdge]
+
+class GraphAdjacency(BaseModel):
+    version: Optional[int] = None
+    nodes: List[GraphNode]
+    # CSR layout: neighbours of nodes[i] are nodes[indices[indptr[i]:indptr[i + 1]]]
+    indptr: List[int]
+    indices: List[int]
+
+class GraphCommunity(BaseModel):
+    communityId: int
+    size: int
+    topNoteId: str
+    topNoteLabel: Optional[str] = None
@@ -6,16 +6,39 @@ from datetime import datetime
 class NoteCreate(BaseModel):
     content: str
     tags: List[str] = []
+    title: Optional[str] = None
 
 class NoteUpdate(BaseModel):
     content: Optional[str] = None
     summary: Optional[str] = None
     tags: Optional[List[str]] = None
+    title: Optional[str] = None
+    isArchived: Optional[bool] = None
+    isPinned: Optional[bool] = None
 
 class NoteResponse(BaseModel):
     id: str
     content: str
     summary: Optional[str] = None
     tags: List[str]
+    title: Optional[str] = None
+    isArchived: bool = False
+    isPinned: bool = False
     createdAt: Optional[datetime]= None
-    updatedAt: Optional[datetime]= None
\ No newline at end of file
+    updatedAt: Optional[datetime]= None
+
+class NoteListItem(NoteResponse):
+    # Left empty when the listing is projected to summaries only
+    content: Optional[str] = None
+
+class NoteSearchResult(NoteResponse):
+    distance: Optional[float] = None
+    score: Optional[float] = None
+    # Best matching passage and its offsets in content (chunk search only)
+    passage: Optional[str] = None
+    passageStart: Optional[int] = None
+    passageEnd: Optional[int] = None
+
+class NoteBulkCreateResponse(BaseModel):
+    created: int
+    ids: List[str]
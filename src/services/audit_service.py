@@ -1,10 +1,127 @@
-from src.core.database import prisma
+"""Note audit log.
+
+Writers never touch Postgres: log_note_change appends the event to a Redis
+stream (one XADD) and returns. Workers drain the stream through a consumer
+group in their maintenance step, writing each batch with one multi-row
+INSERT once `audit_flush_batch_size` events are waiting or the oldest has
+waited `audit_flush_interval` seconds. Events are acknowledged only after
+the INSERT commits, and rows are keyed by the event id (ON CONFLICT DO
+NOTHING), so a worker dying mid-flush leads to a replay, never a loss or a
+duplicate.
+
+"NoteAuditLog" is range-partitioned by month on createdAt. Partitions are
+created on demand before a batch is written, and whole partitions older than
+`audit_retention_days` are dropped, which keeps both pruning and the
+newest-first history queries cheap however long the log grows.
+
+Updates store field-level diffs: short fields as [old, new], long text as
+line-level patches (see diff_fields / apply_patch).
+"""
+
+import difflib
+import json
 import logging
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional, Dict, Any
-from datetime import datetime
+
+from redis.exceptions import ResponseError
+from src.core.config import settings
+from src.core.database import prisma
 
 logger = logging.getLogger(__name__)
 
+STREAM_KEY = "audit:stream"
+GROUP_NAME = "audit-writers"
+PRUNE_SCHEDULE_KEY = "audit:prune:scheduled"
+TABLE = "NoteAuditLog"
+
+# Note fields recorded in create snapshots and update diffs
+AUDITED_FIELDS = ("title", "content", "summary", "tags", "isArchived", "isPinned", "metadata")
+# Text longer than this is diffed line by line instead of stored twice
+PATCH_MIN_CHARS = 200
+
+_INSERT_SQL = f"""
+    INSERT INTO "{TABLE}" (id, "noteId", action, changes, "userId", "createdAt")
+    SELECT r.id, r."noteId", r.action, coalesce(r.changes, '{{}}'::jsonb), r."userId", r."createdAt"
+    FROM jsonb_to_recordset($1::jsonb)
+        AS r(id text, "noteId" text, action text, changes jsonb, "userId" text, "createdAt" timestamp)
+    ON CONFLICT (id, "createdAt") DO NOTHING
+"""
+
+# Months whose partition this process has already created or seen
+_partitions: set[date] = set()
+_group_ready = False
+_last_flush = time.monotonic()
+
+
+def _redis_service():
+    # Imported lazily: redis_service imports services that import this module
+    from src.services import redis_service
+    return redis_service
+
+
+# Diffs
+
+def diff_fields(before: dict, after: dict, fields=AUDITED_FIELDS) -> dict:
+    """Changed fields only: {field: [old, new]}, or {field: {"patch": ...}} for long text"""
+    changes = {}
+    for field in fields:
+        old, new = before.get(field), after.get(field)
+        if old == new:
+            continue
+        if isinstance(old, str) and isinstance(new, str) and max(len(old), len(new)) > PATCH_MIN_CHARS:
+            changes[field] = {"patch": _line_patch(old, new)}
+        else:
+            changes[field] = [old, new]
+    return changes
+
+
+def _line_patch(old: str, new: str) -> list:
+    """Replaced line ranges of `old` as [start, end, replacement] (applied in order)"""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        [i1, i2, "".join(new_lines[j1:j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_patch(old: str, patch: list) -> str:
+    """Rebuild the new text from the old one and a patch from diff_fields"""
+    lines = old.splitlines(keepends=True)
+    parts = []
+    position = 0
+    for start, end, replacement in patch:
+        parts.extend(lines[position:start])
+        parts.append(replacement)
+        position = end
+    parts.extend(lines[position:])
+    return "".join(parts)
+
+
+def snapshot(note: Any) -> dict:
+    """Audited fields of a note (model or dict), skipping empty ones"""
+    values = note if isinstance(note, dict) else note.dict()
+    return {field: values[field] for field in AUDITED_FIELDS if values.get(field) not in (None, "", [], {})}
+
+
+# Writing
+
+def make_event(note_id: str, action: str, changes: Optional[Dict[str, Any]], user_id: Optional[str]) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "noteId": note_id,
+        "action": action,
+        "changes": changes or {},
+        "userId": user_id,
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+    }
+
+
 async def log_note_change(
     note_id: str,
     action: str,
@@ -12,23 +129,201 @@ async def log_note_change(
     user_id: Optional[str] = None
 ) -> None:
     """Log a change to a note in the audit log"""
+    await log_note_changes([make_event(note_id, action, changes, user_id)])
+
+
+async def log_note_changes(events: list[dict]) -> None:
+    """Queue audit events (from make_event) with one pipelined round trip.
+
+    If Redis is unreachable the events are written straight to Postgres
+    instead. Errors are logged, not raised: audit logging must never block
+    the write it records.
+    """
+    if not settings.audit_log or not events:
+        return
     try:
-        await prisma.noteauditlog.create(
-            data={
-                "noteId": note_id,
-                "action": action,
-                "changes": changes or {},
-                "userId": user_id,
-                "createdAt": datetime.utcnow()
-            }
-        )
-        logger.info(f"Logged {action} action for note {note_id}")
+        async with _redis_service().redis.pipeline(transaction=False) as pipe:
+            for event in events:
+                # No MAXLEN: trimming would drop events that are not written yet
+                pipe.xadd(STREAM_KEY, {"event": json.dumps(event, default=str)})
+            await pipe.execute()
     except Exception as e:
-        logger.error(f"Error logging note change: {str(e)}")
-        # Don't raise the error as audit logging should not block the main operation
+        logger.warning(f"Audit stream unavailable, writing {len(events)} event(s) directly: {str(e)}")
+        try:
+            await _insert(events)
+        except Exception as insert_error:
+            logger.error(f"Error logging note change: {str(insert_error)}")
+
+
+def _month(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+async def ensure_partitions(months) -> None:
+    """Create the monthly partitions the given months fall in, if missing"""
+    for month in sorted({_month(m) for m in months} - _partitions):
+        try:
+            await prisma.execute_raw(
+                f"""
+                CREATE TABLE IF NOT EXISTS "{_partition_name(month)}"
+                PARTITION OF "{TABLE}"
+                FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')
+                """
+            )
+        except Exception as e:
+            # Another worker created it between IF NOT EXISTS and the CREATE
+            if "already exists" not in str(e):
+                raise
+        _partitions.add(month)
+
+
+async def _insert(events: list[dict]) -> None:
+    months = {datetime.fromisoformat(event["createdAt"]).date() for event in events}
+    # Also prepare next month's partition so writes around the boundary never wait on DDL
+    await ensure_partitions(months | {_next_month(_month(datetime.now(timezone.utc).date()))})
+    await prisma.execute_raw(_INSERT_SQL, json.dumps(events, default=str))
+
+
+# Flushing (runs in the worker maintenance step)
+
+async def _ensure_group():
+    global _group_ready
+    if _group_ready:
+        return
+    try:
+        await _redis_service().redis.xgroup_create(STREAM_KEY, GROUP_NAME, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+    _group_ready = True
+
+
+async def _read_batch(count: int) -> list:
+    """Events left pending by a dead worker first, then new ones"""
+    redis_service = _redis_service()
+    redis = redis_service.redis
+    _, messages, *_ = await redis.xautoclaim(
+        STREAM_KEY,
+        GROUP_NAME,
+        redis_service.CONSUMER_NAME,
+        min_idle_time=int(settings.task_visibility_timeout * 1000),
+        start_id="0-0",
+        count=count,
+    )
+    messages = [(message_id, fields) for message_id, fields in messages if fields]
+    if len(messages) < count:
+        response = await redis.xreadgroup(
+            GROUP_NAME, redis_service.CONSUMER_NAME, {STREAM_KEY: ">"}, count=count - len(messages)
+        )
+        if response:
+            messages += response[0][1]
+    return messages
+
+
+async def flush(max_batches: int = 10) -> int:
+    """Write queued events to Postgres in batches; returns the number written"""
+    global _last_flush
+    await _ensure_group()
+    redis = _redis_service().redis
+    batch_size = settings.audit_flush_batch_size
+    written = 0
+
+    for _ in range(max_batches):
+        messages = await _read_batch(batch_size)
+        if not messages:
+            break
+        events = [json.loads(fields.get(b"event") or fields.get("event")) for _, fields in messages]
+        await _insert(events)
+
+        message_ids = [message_id for message_id, _ in messages]
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.xack(STREAM_KEY, GROUP_NAME, *message_ids)
+            pipe.xdel(STREAM_KEY, *message_ids)
+            await pipe.execute()
+        written += len(events)
+        if len(messages) < batch_size:
+            break
+
+    _last_flush = time.monotonic()
+    if written:
+        logger.debug(f"Flushed {written} audit event(s)")
+    return written
+
+
+async def flush_due() -> int:
+    """Flush when a full batch is waiting or the flush interval has passed"""
+    if not settings.audit_log:
+        return 0
+    waiting = await _redis_service().redis.xlen(STREAM_KEY)
+    if not waiting:
+        return 0
+    if waiting < settings.audit_flush_batch_size and time.monotonic() - _last_flush < settings.audit_flush_interval:
+        return 0
+    return await flush()
+
+
+# Retention
+
+async def list_partitions() -> list[str]:
+    rows = await prisma.query_raw(
+        """
+        SELECT child.relname AS name
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = $1
+        ORDER BY child.relname
+        """,
+        TABLE
+    )
+    return [row["name"] for row in rows]
+
+
+async def prune(retention_days: int = None) -> list[str]:
+    """Drop monthly partitions lying entirely before the retention window"""
+    retention_days = settings.audit_retention_days if retention_days is None else retention_days
+    if retention_days <= 0:
+        return []
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+
+    dropped = []
+    for name in await list_partitions():
+        try:
+            year, month = name[len(TABLE) + 1:].split("_")
+            start = date(int(year), int(month), 1)
+        except ValueError:
+            continue
+        if _next_month(start) <= cutoff:
+            await prisma.execute_raw(f'DROP TABLE IF EXISTS "{name}"')
+            _partitions.discard(start)
+            dropped.append(name)
+    if dropped:
+        logger.info(f"Dropped audit partitions past retention: {', '.join(dropped)}")
+    return dropped
+
+
+async def prune_due() -> list[str]:
+    """Prune at most once a day across all workers"""
+    if not settings.audit_log or settings.audit_retention_days <= 0:
+        return []
+    due = await _redis_service().redis.set(PRUNE_SCHEDULE_KEY, 1, nx=True, ex=24 * 3600)
+    if not due:
+        return []
+    return await prune()
+
+
+# Reading
 
 async def get_note_history(note_id: str, limit: int = 10) -> list:
-    """Get the audit history for a note"""
+    """Get the audit history for a note (events still queued are not included)"""
     try:
         return await prisma.noteauditlog.find_many(
             where={"noteId": note_id},
@@ -40,13 +335,16 @@ async def get_note_history(note_id: str, limit: int = 10) -> list:
         return []
 
 async def get_recent_changes(limit: int = 20) -> list:
-    """Get recent changes across all notes"""
+    """Get recent changes across all notes.
+
+    Served from the createdAt index of the newest partitions; the log keeps
+    no foreign key to Note so history outlives deleted notes.
+    """
     try:
         return await prisma.noteauditlog.find_many(
             order_by={"createdAt": "desc"},
-            take=limit,
-            include={"note": True}
+            take=limit
         )
     except Exception as e:
         logger.error(f"Error getting recent changes: {str(e)}")
-        return [] 
\ No newline at end of file
+        return []
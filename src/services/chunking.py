@@ -0,0 +1,116 @@
+"""Split note content into passages small enough for the embedding model.
+
+MiniLM only reads the first 256 word pieces of its input (roughly 1000
+characters of English), so long notes are embedded passage by passage.
+Chunks follow the note's structure: a Markdown heading always starts a new
+chunk, paragraphs are packed together up to `max_chars`, and paragraphs that
+are too long on their own are cut at sentence (or word) boundaries. Each chunk
+after the first in a section repeats the tail of the previous one so a
+passage split across a boundary is still matched as a whole.
+"""
+
+import re
+from typing import NamedTuple
+
+from src.core.hashing import content_hash
+
+HEADING = re.compile(r"^#{1,6}\s", re.MULTILINE)
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+WHITESPACE = re.compile(r"\s+")
+
+
+class Chunk(NamedTuple):
+    ord: int
+    text: str
+    start: int
+    end: int
+
+    @property
+    def hash(self) -> str:
+        return content_hash(self.text)
+
+
+def _strip(text: str, start: int, end: int) -> tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _blocks(text: str) -> list[tuple[int, int, bool]]:
+    """Paragraph spans as (start, end, starts_with_heading)"""
+    bounds = [0]
+    for match in PARAGRAPH_BREAK.finditer(text):
+        bounds += [match.start(), match.end()]
+    bounds.append(len(text))
+
+    blocks = []
+    for start, end in zip(bounds[::2], bounds[1::2]):
+        # A heading directly under a paragraph (no blank line) still splits it
+        cuts = [start] + [m.start() for m in HEADING.finditer(text, start, end) if m.start() > start] + [end]
+        for cut_start, cut_end in zip(cuts, cuts[1:]):
+            cut_start, cut_end = _strip(text, cut_start, cut_end)
+            if cut_start < cut_end:
+                blocks.append((cut_start, cut_end, bool(HEADING.match(text, cut_start))))
+    return blocks
+
+
+def _split_long(text: str, start: int, end: int, max_chars: int) -> list[tuple[int, int]]:
+    """Cut an oversized span at the last sentence end, else word break, before max_chars"""
+    pieces = []
+    while end - start > max_chars:
+        limit = start + max_chars
+        cut = None
+        for match in SENTENCE_END.finditer(text, start, limit):
+            cut = match.end()
+        if cut is None or cut - start < max_chars // 2:
+            breaks = [m.start() for m in WHITESPACE.finditer(text, start + max_chars // 2, limit)]
+            cut = breaks[-1] if breaks else limit
+        piece = _strip(text, start, cut)
+        if piece[0] < piece[1]:
+            pieces.append(piece)
+        start, _ = _strip(text, cut, end)
+    if start < end:
+        pieces.append((start, end))
+    return pieces
+
+
+def _overlap_start(text: str, previous_start: int, previous_end: int, overlap_chars: int) -> int:
+    """Start of the previous chunk's last `overlap_chars` (at most half of it), moved forward to a word boundary"""
+    start = max(previous_start + (previous_end - previous_start) // 2, previous_end - overlap_chars)
+    if start > previous_start and not text[start - 1].isspace():
+        match = WHITESPACE.search(text, start, previous_end)
+        start = match.end() if match else previous_end
+    return start
+
+
+def chunk_text(text: str, max_chars: int = 1000, overlap_chars: int = 200) -> list[Chunk]:
+    """Split text into ordered, overlapping chunks (offsets index into `text`)"""
+    overlap_chars = max(0, min(overlap_chars, max_chars // 2))
+    pieces = [
+        (piece_start, piece_end, heading and piece_start == block_start)
+        for block_start, block_end, heading in _blocks(text)
+        for piece_start, piece_end in _split_long(text, block_start, block_end, max_chars)
+    ]
+
+    spans = []
+    current = None  # [start, end, body_start] of the chunk being packed
+    for start, end, heading in pieces:
+        if current is not None and (heading or end - current[2] > max_chars):
+            spans.append((current[0], current[1]))
+            previous = current
+            current = None
+            if not heading and overlap_chars:
+                overlap = _overlap_start(text, previous[0], previous[1], overlap_chars)
+                current = [overlap if overlap < previous[1] else start, end, start]
+                continue
+        if current is None:
+            current = [start, end, start]
+        else:
+            current[1] = end
+    if current is not None:
+        spans.append((current[0], current[1]))
+
+    return [Chunk(ord, text[start:end], start, end) for ord, (start, end) in enumerate(spans)]
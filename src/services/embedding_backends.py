@@ -0,0 +1,235 @@
+"""Embedding inference backends.
+
+Every backend exposes the slice of the SentenceTransformer API the engine
+uses: `encode(texts, batch_size=...)` returning float32 rows, and
+`get_sentence_embedding_dimension()`. EMBEDDING_BACKEND picks one:
+
+  torch       SentenceTransformer in fp32 (the reference)
+  onnx        the same transformer exported to ONNX, run by ONNX Runtime
+  onnx-int8   the ONNX graph with dynamically quantized int8 weights
+
+The ONNX backends tokenise with the model's fast tokenizer, sort texts by
+token count and pad each batch only to its own longest text, then apply the
+model's pooling and normalisation in NumPy. They need torch only once, to
+export the model into EMBEDDING_ONNX_DIR; later processes load the exported
+graph, tokenizer and pooling config without it.
+
+scripts/bench_embedding_backends.py measures throughput and agreement with
+the torch backend before switching.
+"""
+
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class EmbeddingBackend(ABC):
+    """Interface: texts in, float32 embeddings out"""
+
+    @abstractmethod
+    def encode(self, texts: list[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def get_sentence_embedding_dimension(self) -> int:
+        ...
+
+
+class TorchBackend(EmbeddingBackend):
+    def __init__(self, model_name: str, intra_op_threads: int = 0):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: list[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        # SentenceTransformer already sorts by length and pads per batch
+        vectors = self.model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+def _export_dir(model_name: str) -> str:
+    return os.path.join(settings.embedding_onnx_dir, model_name.replace("/", "__"))
+
+
+def _pooling_mode(config: dict) -> str:
+    # Older sentence-transformers releases store one flag per mode
+    mode = config.get("pooling_mode") or next(
+        (key.removeprefix("pooling_mode_").removesuffix("_tokens").removesuffix("_token")
+         for key, enabled in config.items() if key.startswith("pooling_mode_") and enabled),
+        "mean",
+    )
+    if mode not in ("mean", "cls"):
+        raise ValueError(f"Pooling mode {mode!r} is not supported by the ONNX backend")
+    return mode
+
+
+def _hidden_states_module(model, input_names: list[str]):
+    """Wrap a Hugging Face model so positional export inputs are passed by name"""
+    import torch
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    return HiddenStates()
+
+
+def export_onnx(model_name: str, quantize: bool = False) -> str:
+    """Export a sentence-transformers model to ONNX (once) and return the graph path.
+
+    Writes model.onnx, the tokenizer and pooling.json (pooling mode, maximum
+    sequence length, normalisation) to the model's export directory, plus
+    model.int8.onnx when `quantize` is set.
+    """
+    directory = _export_dir(model_name)
+    fp32_path = os.path.join(directory, "model.onnx")
+    int8_path = os.path.join(directory, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize, Pooling
+
+        logger.info(f"Exporting {model_name} to ONNX in {directory}")
+        os.makedirs(directory, exist_ok=True)
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0]
+        pooling = next((module for module in st_model if isinstance(module, Pooling)), None)
+        mode = _pooling_mode(pooling.get_config_dict()) if pooling is not None else "mean"
+        pooling_config = {
+            "mode": mode,
+            "max_seq_length": st_model.max_seq_length,
+            "normalize": any(isinstance(module, Normalize) for module in st_model),
+        }
+
+        transformer.tokenizer.save_pretrained(directory)
+        sample = transformer.tokenizer(["export"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                _hidden_states_module(transformer.auto_model.eval(), input_names),
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                # TorchScript exporter: handles dynamic axes without onnxscript
+                dynamo=False,
+            )
+        with open(os.path.join(directory, "pooling.json"), "w") as f:
+            json.dump(pooling_config, f)
+
+    if quantize and not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"Quantizing {fp32_path} to int8")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    return int8_path if quantize else fp32_path
+
+
+class OnnxBackend(EmbeddingBackend):
+    def __init__(self, model_name: str, quantize: bool = False, intra_op_threads: int = 0,
+                 batch_size: int = 16):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        path = export_onnx(model_name, quantize=quantize)
+        directory = os.path.dirname(path)
+        with open(os.path.join(directory, "pooling.json")) as f:
+            self.pooling = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length=self.pooling["max_seq_length"])
+        self.batch_size = max(1, batch_size)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        # Batches run one at a time; parallelism comes from the intra-op pool
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {item.name for item in self.session.get_inputs()}
+        self._dimension = self.session.get_outputs()[0].shape[-1]
+
+    def _run(self, encodings: list) -> np.ndarray:
+        """Pad one batch to its own longest text, run it and pool"""
+        length = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(encodings), length), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, inputs)[0]
+
+        if self.pooling["mode"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, np.newaxis].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.pooling["normalize"]:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def encode(self, texts: list[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self._dimension), dtype=np.float32)
+        encodings = self.tokenizer.encode_batch(list(texts))
+        # Length-sorted batches: texts of similar length share the padding
+        order = np.argsort([len(encoding.ids) for encoding in encodings], kind="stable")
+        size = min(batch_size, self.batch_size)
+
+        vectors = np.empty((len(texts), self._dimension), dtype=np.float32)
+        for start in range(0, len(order), size):
+            rows = order[start:start + size]
+            vectors[rows] = self._run([encodings[i] for i in rows])
+        return vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+
+def load_backend(model_name: str, backend: str = None) -> EmbeddingBackend:
+    """Backend for a model (default EMBEDDING_BACKEND)"""
+    backend = backend or settings.embedding_backend
+    threads = settings.embedding_intra_op_threads
+    logger.info(f"Loading embedding model {model_name} ({backend})")
+    if backend == "torch":
+        return TorchBackend(model_name, intra_op_threads=threads)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxBackend(
+            model_name,
+            quantize=backend == "onnx-int8",
+            intra_op_threads=threads,
+            batch_size=settings.embedding_inference_batch_size,
+        )
+    raise ValueError(f"Unsupported EMBEDDING_BACKEND: {backend} (expected one of {', '.join(BACKENDS)})")
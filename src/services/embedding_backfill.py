@@ -0,0 +1,390 @@
+import time
+import asyncio
+import logging
+from datetime import timedelta
+from src.core.config import settings
+from src.core.database import prisma
+from src.services import vector_services
+
+logger = logging.getLogger(__name__)
+
+# Same digest as src.core.hashing.content_hash, computed in Postgres
+SQL_CONTENT_HASH = "encode(sha256(convert_to(n.content, 'UTF8')), 'hex')"
+
+def _checkpoint_key(model_name: str) -> str:
+    return f"embedding:backfill:{model_name}:checkpoint"
+
+def _status_key(model_name: str) -> str:
+    return f"embedding:backfill:{model_name}:status"
+
+def _promotion_key(model_name: str) -> str:
+    return f"embedding:promotion:{model_name}"
+
+async def _redis():
+    # Imported lazily: redis_service dispatches backfill tasks to this module
+    from src.services import redis_service
+    return redis_service
+
+async def find_stale_notes(model_name: str, after_id: str, limit: int, serving: bool) -> list:
+    """Notes whose vector for `model_name` is missing or was computed from older content"""
+    if serving:
+        return await prisma.query_raw(
+            f"""
+            SELECT n.id, n.content, {SQL_CONTENT_HASH} AS hash
+            FROM "Note" n
+            WHERE n.id > $1
+              AND (n.embedding IS NULL
+                   OR n."embeddingModel" IS DISTINCT FROM $2
+                   OR n."embeddingHash" IS DISTINCT FROM {SQL_CONTENT_HASH})
+            ORDER BY n.id
+            LIMIT $3
+            """,
+            after_id, model_name, limit
+        )
+
+    return await prisma.query_raw(
+        f"""
+        SELECT n.id, n.content, {SQL_CONTENT_HASH} AS hash
+        FROM "Note" n
+        LEFT JOIN "NoteEmbedding" e ON e."noteId" = n.id AND e.model = $2
+        WHERE n.id > $1
+          AND e."contentHash" IS DISTINCT FROM {SQL_CONTENT_HASH}
+        ORDER BY n.id
+        LIMIT $3
+        """,
+        after_id, model_name, limit
+    )
+
+async def backfill_batch(model_name: str, batch_size: int = None) -> dict:
+    """Re-embed the next batch of stale notes for a model and advance its checkpoint.
+
+    Vectors for the serving model go straight into Note.embedding; any
+    other model is staged in NoteEmbedding until it is promoted. Either way
+    the notes' chunks are re-embedded for the model too.
+    """
+    batch_size = batch_size or settings.embedding_backfill_batch_size
+    redis_service = await _redis()
+    redis = redis_service.redis
+
+    checkpoint = await redis.get(_checkpoint_key(model_name))
+    after_id = checkpoint.decode() if checkpoint else ""
+    serving = model_name == await vector_services.active_model()
+
+    rows = await find_stale_notes(model_name, after_id, batch_size, serving)
+    if rows:
+        note_ids = [row["id"] for row in rows]
+        hashes = [row["hash"] for row in rows]
+        embeddings = await vector_services.create_embeddings([row["content"] for row in rows], model_name)
+        if serving:
+            await vector_services.update_note_embeddings(note_ids, embeddings, hashes, model_name)
+        else:
+            await vector_services.write_staged_embeddings(note_ids, embeddings, hashes, model_name)
+        if settings.chunk_embeddings:
+            await vector_services.update_note_chunks(note_ids, [row["content"] for row in rows], model_name)
+
+    done = len(rows) < batch_size
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hincrby(_status_key(model_name), "processed", len(rows))
+        if done:
+            pipe.delete(_checkpoint_key(model_name))
+            pipe.hset(_status_key(model_name), mapping={"state": "complete", "completed_at": time.time()})
+        else:
+            pipe.set(_checkpoint_key(model_name), rows[-1]["id"])
+        await pipe.execute()
+
+    return {"processed": len(rows), "done": done}
+
+async def column_dimension(column: str = "embedding") -> int:
+    rows = await prisma.query_raw(
+        """
+        SELECT atttypmod AS dimension FROM pg_attribute
+        WHERE attrelid = '"Note"'::regclass AND attname = $1
+        """,
+        column
+    )
+    return rows[0]["dimension"] if rows else None
+
+async def check_dimension(model_name: str):
+    """Raise ValueError if the model's vectors do not fit Note.embedding.
+
+    NoteChunk.embedding and the promotion's shadow column have the same type.
+    """
+    dimension = vector_services.get_engine(model_name).dimension
+    expected = await column_dimension()
+    if dimension != expected:
+        raise ValueError(
+            f"{model_name} produces {dimension}-dimensional vectors but Note.embedding is "
+            f"vector({expected}); changing the dimension needs a schema migration"
+        )
+
+async def start_backfill(model_name: str = None, restart: bool = False) -> dict:
+    """Queue a backfill for a model, resuming from its checkpoint unless `restart`"""
+    model_name = model_name or settings.embedding_target_model or settings.embedding_model
+    await check_dimension(model_name)
+    redis_service = await _redis()
+    redis = redis_service.redis
+
+    if restart:
+        await redis.delete(_checkpoint_key(model_name), _status_key(model_name))
+    await redis.hset(_status_key(model_name), mapping={"state": "running", "started_at": time.time()})
+    await redis_service.enqueue_task(
+        redis_service.TASK_EMBEDDING_BACKFILL,
+        {"model": model_name},
+        task_id=f"backfill:{model_name}",
+    )
+    return await backfill_status(model_name)
+
+async def run_backfill_task(model_name: str):
+    """Worker entry point: one batch per task, then queue the next"""
+    result = await backfill_batch(model_name)
+    if not result["done"]:
+        redis_service = await _redis()
+        await redis_service.enqueue_task(
+            redis_service.TASK_EMBEDDING_BACKFILL,
+            {"model": model_name},
+            task_id=f"backfill:{model_name}",
+        )
+    else:
+        logger.info(f"Embedding backfill for {model_name} complete")
+
+async def backfill_status(model_name: str = None) -> dict:
+    model_name = model_name or settings.embedding_target_model or settings.embedding_model
+    redis_service = await _redis()
+    status = await redis_service.redis.hgetall(_status_key(model_name))
+    checkpoint = await redis_service.redis.get(_checkpoint_key(model_name))
+    status = {key.decode(): value.decode() for key, value in status.items()}
+    return {
+        "model": model_name,
+        "active_model": await vector_services.active_model(),
+        "state": status.get("state", "not_started"),
+        "processed": int(status.get("processed", 0)),
+        "checkpoint": checkpoint.decode() if checkpoint else None,
+        "started_at": float(status["started_at"]) if "started_at" in status else None,
+        "completed_at": float(status["completed_at"]) if "completed_at" in status else None,
+    }
+
+# Promotion
+#
+# Nothing here holds a long lock on "Note": the staged vectors are copied in
+# small batches into the shadow columns (embeddingNext*, same vector type as
+# `embedding`), their ANN index is built CONCURRENTLY, and a short
+# transaction then renames the shadow columns and index into place. Chunks
+# need no swap: the backfill stored the new model's next to the old ones,
+# which are deleted once nothing reads them. Each step is one queued task,
+# resumable from the phase saved in Redis.
+
+PROMOTION_COPY_BATCH = 2000
+# The swap waits this long for its ACCESS EXCLUSIVE lock, then fails and is
+# retried, rather than queueing every other query behind it
+PROMOTION_LOCK_TIMEOUT = "5s"
+
+# Columns promotion renames into each other
+SHADOW_COLUMNS = {
+    "embedding": "embeddingNext",
+    "embeddingModel": "embeddingNextModel",
+    "embeddingHash": "embeddingNextHash",
+}
+
+def _index_names(column: str) -> dict:
+    """ANN index names on a Note column; the serving ones match scripts/migrate.py"""
+    return {index_type: f"Note_{column}_{index_type}_idx" for index_type in ("hnsw", "ivfflat")}
+
+async def _set_phase(model_name: str, phase: str, **fields):
+    redis = (await _redis()).redis
+    await redis.hset(_promotion_key(model_name), mapping={"phase": phase, "updated_at": time.time(), **fields})
+
+async def _catch_up(model_name: str, state: dict) -> str:
+    # Notes written since the backfill completed
+    result = await backfill_batch(model_name)
+    return "copy" if result["done"] else "catch_up"
+
+async def _copy(model_name: str, state: dict) -> str:
+    rows = await prisma.query_raw(
+        """
+        WITH batch AS (
+            SELECT "noteId", model, "contentHash", embedding
+            FROM "NoteEmbedding"
+            WHERE model = $1 AND "noteId" > $2
+            ORDER BY "noteId"
+            LIMIT $3
+        )
+        UPDATE "Note" n
+        SET "embeddingNext" = b.embedding,
+            "embeddingNextModel" = b.model,
+            "embeddingNextHash" = b."contentHash"
+        FROM batch b
+        WHERE n.id = b."noteId"
+        RETURNING n.id
+        """,
+        model_name, state.get("checkpoint", ""), PROMOTION_COPY_BATCH
+    )
+    if len(rows) < PROMOTION_COPY_BATCH:
+        return "index"
+    await _set_phase(model_name, "copy", checkpoint=max(row["id"] for row in rows))
+    return "copy"
+
+# A build of the shadow index, by this or another (possibly dead) worker
+SQL_SHADOW_INDEX = """
+    SELECT c.relname AS name, i.indisvalid AS valid, pg_get_indexdef(c.oid) AS definition,
+           EXISTS (SELECT 1 FROM pg_stat_progress_create_index p WHERE p.index_relid = c.oid) AS building
+    FROM pg_class c
+    JOIN pg_index i ON i.indexrelid = c.oid
+    WHERE c.relname = ANY($1::text[])
+"""
+INDEX_BUILD_POLL = 10.0
+
+async def _build_index(model_name: str, state: dict) -> str:
+    # The task heartbeats while the build runs, however long it takes, so
+    # this only finds an earlier build if its worker died. A build still in
+    # progress is waited for; a valid index with the configured settings is
+    # kept (Postgres maintained it as the copy wrote the column); an invalid
+    # one, left by an interrupted build, is dropped and rebuilt
+    index_type = settings.vector_index_type
+    opclass = vector_services.OPERATOR_CLASSES[settings.vector_metric]
+    wanted = _index_names("embeddingNext").get(index_type)
+    while True:
+        existing = await prisma.query_raw(SQL_SHADOW_INDEX, list(_index_names("embeddingNext").values()))
+        if not any(index["building"] for index in existing):
+            break
+        await asyncio.sleep(INDEX_BUILD_POLL)
+
+    ready = False
+    for index in existing:
+        if index["name"] == wanted and index["valid"] and opclass in index["definition"]:
+            ready = True
+        else:
+            await prisma.execute_raw(f'DROP INDEX CONCURRENTLY IF EXISTS "{index["name"]}"')
+    if ready or index_type == "none":
+        return "swap"
+
+    if index_type == "hnsw":
+        options = f"m = {settings.hnsw_m}, ef_construction = {settings.hnsw_ef_construction}"
+    else:
+        options = f"lists = {settings.ivfflat_lists}"
+    await prisma.execute_raw(f"""
+        CREATE INDEX CONCURRENTLY "{wanted}"
+        ON "Note" USING {index_type} ("embeddingNext" {opclass})
+        WITH ({options})
+    """)
+    return "swap"
+
+async def _swap(model_name: str, state: dict) -> str:
+    async with prisma.tx(timeout=timedelta(seconds=30)) as tx:
+        await tx.execute_raw(f"SET LOCAL lock_timeout = '{PROMOTION_LOCK_TIMEOUT}'")
+        current = await tx.query_raw(f"SELECT {vector_services.SQL_COLUMN_MODEL} AS model")
+        # Already swapped by an attempt that died before saving its phase
+        if current[0]["model"] != model_name:
+            for serving, shadow in SHADOW_COLUMNS.items():
+                await tx.execute_raw(f'ALTER TABLE "Note" RENAME COLUMN "{serving}" TO "{serving}Swap"')
+                await tx.execute_raw(f'ALTER TABLE "Note" RENAME COLUMN "{shadow}" TO "{serving}"')
+                await tx.execute_raw(f'ALTER TABLE "Note" RENAME COLUMN "{serving}Swap" TO "{shadow}"')
+            serving_indexes, shadow_indexes = _index_names("embedding"), _index_names("embeddingNext")
+            for index_type, serving in serving_indexes.items():
+                await tx.execute_raw(f'ALTER INDEX IF EXISTS "{serving}" RENAME TO "{serving}_swap"')
+                await tx.execute_raw(f'ALTER INDEX IF EXISTS "{shadow_indexes[index_type]}" RENAME TO "{serving}"')
+                await tx.execute_raw(f'ALTER INDEX IF EXISTS "{serving}_swap" RENAME TO "{shadow_indexes[index_type]}"')
+            literal = model_name.replace("'", "''")
+            await tx.execute_raw(f"""COMMENT ON COLUMN "Note".embedding IS '{literal}'""")
+
+    redis_service = await _redis()
+    await redis_service.redis.set(vector_services.ACTIVE_MODEL_KEY, model_name)
+    vector_services.set_active_model(model_name)
+    logger.info(f"Promoted {model_name} to the serving embedding model")
+
+    # The previous model's vectors are now the shadow column; its index is
+    # no longer read by anything
+    for index_name in _index_names("embeddingNext").values():
+        await prisma.execute_raw(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"')
+    await prisma.execute_raw('DELETE FROM "NoteEmbedding" WHERE model = $1', model_name)
+
+    await _set_phase(model_name, "repair", published_at=time.time())
+    return "repair"
+
+async def _repair(model_name: str, state: dict) -> str:
+    # Other processes switch models within ACTIVE_MODEL_TTL of the publish;
+    # re-embed what was written in between (notes created or edited after
+    # the copy, or by a process still on the old model)
+    wait = float(state.get("published_at", 0)) + vector_services.ACTIVE_MODEL_TTL - time.time()
+    if wait > 0:
+        await asyncio.sleep(wait)
+    result = await backfill_batch(model_name)
+    return "cleanup" if result["done"] else "repair"
+
+async def _cleanup(model_name: str, state: dict) -> str:
+    # Chunks of earlier models; chunk search only reads the serving model's
+    deleted = await prisma.execute_raw(
+        """
+        DELETE FROM "NoteChunk" WHERE id IN (
+            SELECT id FROM "NoteChunk" WHERE model <> $1 LIMIT $2
+        )
+        """,
+        model_name, PROMOTION_COPY_BATCH
+    )
+    return "complete" if deleted < PROMOTION_COPY_BATCH else "cleanup"
+
+PROMOTION_STEPS = {
+    "catch_up": _catch_up,
+    "copy": _copy,
+    "index": _build_index,
+    "swap": _swap,
+    "repair": _repair,
+    "cleanup": _cleanup,
+}
+
+async def promote_model(model_name: str) -> dict:
+    """Start making a fully backfilled model the serving one.
+
+    Search keeps reading the old vectors until the swap, and every process
+    switches over within ACTIVE_MODEL_TTL of it. Calling this again resumes
+    an interrupted promotion. Raises ValueError if the backfill has not
+    completed or the model's dimension differs from Note.embedding.
+    """
+    state = await promotion_status(model_name)
+    if state["phase"] in (None, "complete"):
+        status = await backfill_status(model_name)
+        if status["state"] != "complete":
+            raise ValueError(f"Backfill for {model_name} is {status['state']}, not complete")
+        if status["active_model"] == model_name:
+            raise ValueError(f"{model_name} is already serving")
+        await check_dimension(model_name)
+        await (await _redis()).redis.delete(_promotion_key(model_name))
+        await _set_phase(model_name, "catch_up", started_at=time.time())
+
+    await _enqueue_promotion(model_name)
+    return await promotion_status(model_name)
+
+async def _enqueue_promotion(model_name: str):
+    redis_service = await _redis()
+    await redis_service.enqueue_task(
+        redis_service.TASK_PROMOTE_MODEL,
+        {"model": model_name},
+        task_id=f"promote:{model_name}",
+    )
+
+async def run_promotion_task(model_name: str):
+    """Worker entry point: one promotion step per task, then queue the next"""
+    redis = (await _redis()).redis
+    state = {key.decode(): value.decode() for key, value in (await redis.hgetall(_promotion_key(model_name))).items()}
+    phase = state.get("phase")
+    if phase not in PROMOTION_STEPS:
+        return
+
+    next_phase = await PROMOTION_STEPS[phase](model_name, state)
+    if next_phase != phase:
+        await redis.hdel(_promotion_key(model_name), "checkpoint")
+        await _set_phase(model_name, next_phase)
+        logger.info(f"Promotion of {model_name}: {phase} done, next {next_phase}")
+    if next_phase != "complete":
+        await _enqueue_promotion(model_name)
+
+async def promotion_status(model_name: str) -> dict:
+    redis = (await _redis()).redis
+    state = {key.decode(): value.decode() for key, value in (await redis.hgetall(_promotion_key(model_name))).items()}
+    return {
+        "model": model_name,
+        "active_model": await vector_services.active_model(),
+        "phase": state.get("phase"),
+        "checkpoint": state.get("checkpoint"),
+        "started_at": float(state["started_at"]) if "started_at" in state else None,
+        "updated_at": float(state["updated_at"]) if "updated_at" in state else None,
+    }
@@ -0,0 +1,171 @@
+"""Embedding model served to other processes over a Unix socket.
+
+With EMBEDDING_SERVER_SOCKET set, API and worker processes do not load the
+model: their engines encode through RemoteEncoder, and one server process
+holds the weights. Single-text requests from every client go through the
+server's coalescing engine, so concurrent embeds across processes still
+share forward passes.
+
+Wire format, both directions: a 4-byte big-endian length and a JSON header,
+then (responses only) the float32 payload of shape header["shape"].
+Requests are {"model": str, "texts": [str]}; an empty text list only asks
+for the dimension. Errors come back as {"error": str}.
+
+Run: python -m src.services.embedding_server [--socket /tmp/embeddings.sock]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import threading
+
+import numpy as np
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct(">I")
+
+
+def _frame(header: dict, payload: bytes = b"") -> bytes:
+    encoded = json.dumps(header).encode()
+    return HEADER.pack(len(encoded)) + encoded + payload
+
+
+class RemoteEncoder:
+    """Blocking client with the slice of the SentenceTransformer API the engine uses.
+
+    Called from the engine's worker threads, so each thread keeps its own
+    connection.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        self.path = path
+        self.model_name = model_name
+        self._local = threading.local()
+        self._dimension = None
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def _read_exact(self, conn: socket.socket, size: int) -> bytes:
+        buffer = bytearray()
+        while len(buffer) < size:
+            chunk = conn.recv(size - len(buffer))
+            if not chunk:
+                raise ConnectionError("Embedding server closed the connection")
+            buffer += chunk
+        return bytes(buffer)
+
+    def _request(self, texts: list[str]) -> np.ndarray:
+        conn = self._connection()
+        conn.sendall(_frame({"model": self.model_name, "texts": texts}))
+        (size,) = HEADER.unpack(self._read_exact(conn, HEADER.size))
+        header = json.loads(self._read_exact(conn, size))
+        if "error" in header:
+            raise RuntimeError(f"Embedding server error: {header['error']}")
+        rows, dimension = header["shape"]
+        self._dimension = dimension
+        payload = self._read_exact(conn, rows * dimension * 4)
+        return np.frombuffer(payload, dtype=np.float32).reshape(rows, dimension)
+
+    def _call(self, texts: list[str]) -> np.ndarray:
+        try:
+            return self._request(texts)
+        except (ConnectionError, OSError):
+            # The server restarted: reconnect once
+            self.close()
+            return self._request(texts)
+
+    def encode(self, texts: list[str], **kwargs) -> np.ndarray:
+        return self._call(list(texts))
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            self._call([])
+        return self._dimension
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    from src.services import vector_services
+
+    try:
+        while True:
+            try:
+                (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                request = json.loads(await reader.readexactly(size))
+            except asyncio.IncompleteReadError:
+                break
+
+            try:
+                engine = vector_services.get_engine(request.get("model"))
+                texts = request["texts"]
+                if len(texts) == 1:
+                    vectors = (await engine.embed(texts[0]))[np.newaxis, :]
+                elif texts:
+                    vectors = await engine.embed_many(texts)
+                else:
+                    vectors = np.empty((0, await asyncio.to_thread(lambda: engine.dimension)), dtype=np.float32)
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                writer.write(_frame({"shape": list(vectors.shape)}, vectors.tobytes()))
+            except Exception as e:
+                logger.exception("Embedding request failed")
+                writer.write(_frame({"error": str(e)}))
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(path: str, preload: bool = True):
+    # Encode in this process, whatever the environment says
+    settings.embedding_server_socket = None
+    from src.services import vector_services
+
+    if preload:
+        await asyncio.to_thread(vector_services.preload)
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server = await asyncio.start_unix_server(_handle, path=path)
+    logger.info(f"Embedding server listening on {path} ({settings.embedding_model})")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    async with server:
+        await stop_event.wait()
+    vector_services.shutdown()
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the embedding model over a Unix socket")
+    parser.add_argument("--socket", default=settings.embedding_server_socket or "/tmp/embeddings.sock",
+                        help="Socket path (default EMBEDDING_SERVER_SOCKET)")
+    parser.add_argument("--lazy", action="store_true", help="Load the model on the first request")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    asyncio.run(serve(args.socket, preload=not args.lazy))
@@ -0,0 +1,77 @@
+"""Offline stand-in for the Gemini chat model.
+
+Answers the enrichment prompts with deterministic, well-formed output after a
+configurable latency, and fails a configurable fraction of calls with a
+429-style error, so the rate limiter and worker throughput can be load-tested
+without network access or API spend.
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class FakeRateLimitError(Exception):
+    """Mimics the provider's quota error"""
+
+    def __init__(self):
+        super().__init__("429 Resource has been exhausted (e.g. check quota).")
+
+
+def _keywords(text: str, count: int = 3) -> list[str]:
+    words = re.findall(r"[a-zA-Z]{5,}", text.lower())
+    seen = list(dict.fromkeys(words))
+    return seen[:count] or ["note"]
+
+
+def fake_reply(prompt: str) -> str:
+    """Produce an answer shaped like what each enrichment prompt asks for"""
+    body = prompt.split("\n\n", 1)[-1]
+    if "JSON array" in prompt:
+        try:
+            notes = json.loads(body)
+        except ValueError:
+            notes = []
+        return json.dumps([
+            {"id": note.get("id"), "summary": note.get("text", "")[:120], "tags": _keywords(note.get("text", ""))}
+            for note in notes
+        ])
+    if "JSON object" in prompt:
+        return json.dumps({"summary": body[:120], "tags": _keywords(body)})
+    if "comma-separated" in prompt:
+        return ", ".join(_keywords(body))
+    return body[:120]
+
+
+class FakeChatModel(BaseChatModel):
+    latency_ms: float = 300.0
+    error_rate: float = 0.0
+    calls: int = 0
+    errors: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        self.calls += 1
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            raise FakeRateLimitError()
+        prompt = "\n".join(str(message.content) for message in messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=fake_reply(prompt)))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._reply(messages)
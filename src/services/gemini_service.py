@@ -1,68 +1,217 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import asyncio
+import json
+import logging
+import time
+from functools import lru_cache
+from src.core import metrics, tracing
 from src.core.config import settings
+from src.core.hashing import content_hash
+from src.services.rate_limiter import RateLimited, llm_limiter
 from src.services import note_services,vector_services
 from src.core.database import prisma
 from src.schemas.note import NoteUpdate  # Add this import line
 
+logger = logging.getLogger(__name__)
 
-# Initialize the Gemini model via LangChain
-model = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    google_api_key=settings.gemini_api_key
-)
+@lru_cache(maxsize=None)
+def get_model():
+    """The chat model, built on first use.
 
-# Output parser
-output_parser = StrOutputParser()
+    LangChain and the Google client are imported here rather than at module
+    level: they take seconds to import and only enrichment needs them.
+    Retries are left to the shared rate limiter and the task queue rather
+    than the client's own loop.
+    """
+    if settings.llm_provider == "fake":
+        from src.services.fake_llm import FakeChatModel
+        return FakeChatModel(
+            latency_ms=settings.fake_llm_latency_ms,
+            error_rate=settings.fake_llm_error_rate,
+        )
 
-async def generate_summary(text: str) -> str:
-    """Generate a summary for the given text using Gemini through LangChain."""
-    prompt = ChatPromptTemplate.from_template(
-        "Please summarize the following text in a concise paragraph:\n\n{text}"
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        google_api_key=settings.gemini_api_key,
+        max_retries=1,
     )
-    chain = prompt | model | output_parser
-    try:
-        summary = await chain.ainvoke({"text": text})
-        return summary.strip()
-    except Exception as e:
-        print(f"Error generating summary: {e}")
-        return "Summary generation failed."
 
-async def extract_tags(text: str) -> list[str]:
-    """Extract relevant tags from the text using Gemini through LangChain."""
-    prompt = ChatPromptTemplate.from_template(
-        "Extract 3-5 relevant keywords or tags from this text as a comma-separated list (no explanations):\n\n{text}"
-    )
-    chain = prompt | model | output_parser
-    try:
-        raw_tags = await chain.ainvoke({"text": text})
-        tags = [tag.strip().lower().replace(' ', '_') for tag in raw_tags.split(',') if tag.strip()]
-        return tags[:5]
-    except Exception as e:
-        print(f"Error extracting tags: {e}")
-        return []
+PROMPTS = {
+    "summary": "Please summarize the following text in a concise paragraph:\n\n{text}",
+    "tags": "Extract 3-5 relevant keywords or tags from this text as a comma-separated list (no explanations):\n\n{text}",
+    "enrich": (
+        "Summarize the following text in a concise paragraph and extract 3-5 relevant "
+        "keywords or tags from it. Respond with only a JSON object of the form "
+        '{{"summary": "...", "tags": ["...", "..."]}}.\n\n{text}'
+    ),
+    "bulk_enrich": (
+        "For each note in the JSON array below, write a concise one-paragraph summary "
+        "and extract 3-5 relevant keywords or tags. Respond with only a JSON array with "
+        'one object per note, in the same order: [{{"id": "...", "summary": "...", "tags": ["..."]}}].'
+        "\n\n{notes}"
+    ),
+}
+# Prompts answered with JSON; the others are plain text
+JSON_PROMPTS = {"enrich", "bulk_enrich"}
+
+@lru_cache(maxsize=None)
+def get_chain(name: str):
+    """Prompt | model | parser chain, built once per process on first use"""
+    from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    parser = JsonOutputParser() if name in JSON_PROMPTS else StrOutputParser()
+    return ChatPromptTemplate.from_template(PROMPTS[name]) | get_model() | parser
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """True for provider quota (429) and overload (503) errors"""
+    message = f"{type(error).__name__} {error}"
+    return any(marker in message for marker in (
+        "429", "503", "ResourceExhausted", "RESOURCE_EXHAUSTED",
+        "ServiceUnavailable", "UNAVAILABLE", "Too Many Requests",
+    ))
+
+async def call_llm(prompt: str, inputs: dict):
+    """Invoke a prompt's chain through the shared rate limiter.
+
+    Raises RateLimited when the budget is exhausted or the provider throttles
+    us, so callers can defer the work instead of storing a failure.
+    """
+    prompt_chars = sum(len(str(value)) for value in inputs.values())
+    tokens = llm_limiter.estimate_tokens(prompt_chars)
+    with tracing.span("llm.call", prompt=prompt, tokens=tokens):
+        await llm_limiter.acquire(tokens)
+        metrics.LLM_TOKENS.labels(prompt=prompt).inc(tokens)
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            result = await get_chain(prompt).ainvoke(inputs)
+        except Exception as e:
+            outcome = "throttled" if is_throttle_error(e) else "error"
+            metrics.LLM_ERRORS.labels(prompt=prompt, kind=outcome).inc()
+            if outcome == "throttled":
+                raise RateLimited(await llm_limiter.throttled()) from e
+            raise
+        finally:
+            metrics.LLM_CALL_SECONDS.labels(prompt=prompt, outcome=outcome).observe(time.perf_counter() - started)
+    await llm_limiter.succeeded()
+    return result
+
+def normalize_tags(raw_tags) -> list[str]:
+    """Lower-case, snake_case and cap tags at five"""
+    if isinstance(raw_tags, str):
+        raw_tags = raw_tags.split(',')
+    tags = [str(tag).strip().lower().replace(' ', '_') for tag in raw_tags if str(tag).strip()]
+    return tags[:5]
+
+async def enrich_text(text: str) -> tuple[str, list[str]]:
+    """Generate summary and tags, in one structured call unless configured otherwise.
+
+    Errors propagate (RateLimited for throttling) so nothing is persisted
+    for a failed call; queued tasks are deferred or retried instead.
+    """
+    if settings.enrichment_mode == "split":
+        summary, raw_tags = await asyncio.gather(
+            call_llm("summary", {"text": text}),
+            call_llm("tags", {"text": text}),
+        )
+        return summary.strip(), normalize_tags(raw_tags)
+
+    result = await call_llm("enrich", {"text": text})
+    return str(result["summary"]).strip(), normalize_tags(result.get("tags", []))
 
 async def process_note(note_id: str):
-    """Process a note with Gemini to generate summary and tags."""
+    """Process a note with Gemini to generate summary and tags.
+
+    Returns None when the note was edited during the call: the result is
+    dropped rather than stored against newer content.
+    """
     note = await note_services.get_note(note_id)
     if not note:
         return None
 
-    summary = await generate_summary(note.content)
-    tags = await extract_tags(note.content)
+    # Nothing to do if this exact content has already been enriched
+    text_hash = content_hash(note.content)
+    if note.enrichmentHash == text_hash:
+        return note
+
+    summary, tags = await enrich_text(note.content)
 
     return await note_services.update_note(
         note_id,
-        {"summary": summary, "tags": tags}
+        {"summary": summary, "tags": tags, "enrichmentHash": text_hash},
+        if_content=note.content,
     )
 
+def pack_notes(notes: list) -> list[list]:
+    """Group short notes into batches that fit one bulk prompt; long notes go alone"""
+    batches, current, current_chars = [], [], 0
+    for note in notes:
+        size = len(note.content)
+        if size > settings.bulk_enrichment_max_note_chars:
+            batches.append([note])
+            continue
+        if current and current_chars + size > settings.bulk_enrichment_max_batch_chars:
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(note)
+        current_chars += size
+    if current:
+        batches.append(current)
+    return batches
+
+async def _enrich_batch(notes: list) -> list:
+    if len(notes) == 1:
+        return [await process_note(notes[0].id)]
+
+    try:
+        results = await call_llm("bulk_enrich", {
+            "notes": json.dumps([{"id": note.id, "text": note.content} for note in notes])
+        })
+        by_id = {str(result["id"]): result for result in results}
+    except RateLimited:
+        # Falling back to one call per note would only make throttling worse
+        raise
+    except Exception as e:
+        logger.error(f"Error bulk enriching notes: {e}")
+        by_id = {}
+
+    updated = []
+    for note in notes:
+        result = by_id.get(note.id)
+        if result is None:
+            # The model dropped or mangled this note, enrich it on its own
+            updated.append(await process_note(note.id))
+            continue
+        updated.append(await note_services.update_note(
+            note.id,
+            {
+                "summary": str(result.get("summary", "")).strip(),
+                "tags": normalize_tags(result.get("tags", [])),
+                "enrichmentHash": content_hash(note.content),
+            },
+            if_content=note.content,
+        ))
+    return updated
+
+async def process_notes_bulk(note_ids: list[str]) -> list:
+    """Enrich a backlog of notes, packing short ones several to a request.
+
+    Notes whose content is unchanged since their last enrichment are skipped.
+    """
+    notes = await prisma.note.find_many(where={"id": {"in": note_ids}})
+    stale = [note for note in notes if note.enrichmentHash != content_hash(note.content)]
+
+    updated = []
+    for batch in pack_notes(stale):
+        updated.extend(await _enrich_batch(batch))
+    return [note for note in updated if note is not None]
+
 async def suggest_links(note_id: str) -> list:
     """Suggest related notes based on content similarity."""
     note = await note_services.get_note(note_id)
     if not note:
         return []
 
-    similar_notes = await note_services.search_notes(note.content, limit=5)
-
-    return [n for n in similar_notes if n.id != note_id]
+    return await note_services.find_related_notes(note_id, limit=5)
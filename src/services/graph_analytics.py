@@ -0,0 +1,397 @@
+"""Centrality and clustering over the note-link graph.
+
+The graph is loaded as integer pairs (ids are numbered in SQL), turned into
+a symmetric SciPy CSR matrix and analysed with vectorised sparse iterations:
+PageRank by power iteration, connected components, and communities by
+label propagation. Results are written back onto Note. Runs warm-start from
+the stored PageRank and community ids, so a recompute after a few link
+changes converges in a handful of iterations and keeps community ids stable.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+from src.core import database
+from src.core.config import settings
+from src.core.database import prisma
+from src.services import graph_service
+
+# SciPy is imported where it is used: it adds ~0.3s to every process's
+# startup and only the analytics job needs it
+if TYPE_CHECKING:
+    from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+STATUS_KEY = "graph:analytics:status"
+# Held for the scheduling interval so only one process queues each run
+SCHEDULE_KEY = "graph:analytics:scheduled"
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-8
+PAGERANK_MAX_ITERATIONS = 100
+LABEL_PROPAGATION_MAX_ITERATIONS = 30
+LABEL_PROPAGATION_SETTLED = 0.001  # fraction of notes still changing that counts as converged
+
+# Rows per UPDATE when writing scores without the asyncpg pool
+WRITE_BATCH = 5000
+
+async def _redis():
+    # Imported lazily: redis_service dispatches analytics tasks to this module
+    from src.services import redis_service
+    return redis_service
+
+NOTES_SQL = 'SELECT id, pagerank, degree, "componentId", "communityId" FROM "Note" ORDER BY id'
+# Numbers the notes in SQL so only integer pairs cross the wire; the
+# numbering matches NOTES_SQL when both run on the same snapshot
+NUMBERED_LINKS_SQL = """
+    WITH ids AS (SELECT id, (row_number() OVER (ORDER BY id) - 1)::int AS i FROM "Note")
+    SELECT s.i AS source, t.i AS target
+    FROM "_NoteLinks" l
+    JOIN ids s ON s.id = l."A"
+    JOIN ids t ON t.id = l."B"
+"""
+
+async def _fetch_graph() -> tuple[list, list]:
+    """Notes in id order and their links as (source, target) note indices"""
+    if database.pg_pool is not None:
+        async with database.pg_pool.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                notes = await conn.fetch(NOTES_SQL)
+                links = await conn.fetch(NUMBERED_LINKS_SQL)
+        return notes, links
+
+    # Two separate reads: number the links here, skipping links to notes
+    # created between them
+    notes = await prisma.query_raw(NOTES_SQL)
+    raw_links = await prisma.query_raw('SELECT "A" AS source, "B" AS target FROM "_NoteLinks"')
+    index = {note["id"]: i for i, note in enumerate(notes)}
+    links = [
+        {"source": index[link["source"]], "target": index[link["target"]]}
+        for link in raw_links
+        if link["source"] in index and link["target"] in index
+    ]
+    return notes, links
+
+async def load_graph() -> tuple[list[str], "sparse.csr_matrix", dict]:
+    """Note ids, the symmetric adjacency matrix and the previously stored scores"""
+    from scipy import sparse
+
+    notes, links = await _fetch_graph()
+
+    size = len(notes)
+    sources = np.fromiter((link["source"] for link in links), dtype=np.int32, count=len(links))
+    targets = np.fromiter((link["target"] for link in links), dtype=np.int32, count=len(links))
+    rows = np.concatenate([sources, targets])
+    cols = np.concatenate([targets, sources])
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=(size, size)
+    )
+    # A link stored in both directions would otherwise count twice
+    adjacency.data[:] = 1.0
+
+    previous = {
+        "pagerank": np.array([note["pagerank"] or 0.0 for note in notes], dtype=np.float64),
+        "degree": np.array([-1 if note["degree"] is None else note["degree"] for note in notes], dtype=np.int64),
+        "component": np.array(
+            [-1 if note["componentId"] is None else note["componentId"] for note in notes], dtype=np.int64
+        ),
+        "community": np.array(
+            [-1 if note["communityId"] is None else note["communityId"] for note in notes], dtype=np.int64
+        ),
+    }
+    return [note["id"] for note in notes], adjacency, previous
+
+def pagerank(adjacency: "sparse.csr_matrix", start: np.ndarray = None,
+             damping: float = PAGERANK_DAMPING, tolerance: float = PAGERANK_TOLERANCE,
+             max_iterations: int = PAGERANK_MAX_ITERATIONS) -> tuple[np.ndarray, int]:
+    """Power-iteration PageRank; returns the scores (summing to 1) and iterations used"""
+    size = adjacency.shape[0]
+    if size == 0:
+        return np.zeros(0), 0
+
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = degree == 0
+    inverse_degree = np.divide(1.0, degree, out=np.zeros_like(degree), where=~dangling)
+    transition = adjacency.T.tocsr()
+
+    if start is not None and start.sum() > 0:
+        scores = start / start.sum()
+    else:
+        scores = np.full(size, 1.0 / size)
+
+    for iteration in range(1, max_iterations + 1):
+        # Notes without links spread their rank evenly over the whole graph
+        spread = damping * scores[dangling].sum() / size
+        updated = damping * transition.dot(scores * inverse_degree) + spread + (1.0 - damping) / size
+        delta = np.abs(updated - scores).sum()
+        scores = updated
+        if delta < tolerance * size:
+            break
+    return scores, iteration
+
+def label_propagation(adjacency: "sparse.csr_matrix", start: np.ndarray,
+                      max_iterations: int = LABEL_PROPAGATION_MAX_ITERATIONS, seed: int = 0) -> tuple[np.ndarray, int]:
+    """Communities by label propagation: each note takes its neighbours' most common label.
+
+    `start` holds an initial label per note; labels are only ever copied,
+    so the result reuses them. Updates are semi-synchronous (a random half
+    of the notes per round) to avoid the oscillation of fully synchronous
+    rounds, and a note keeps its label when it is tied for most common.
+    """
+    size = adjacency.shape[0]
+    values, labels = np.unique(start, return_inverse=True)
+    labels = labels.astype(np.int64)
+    if size == 0 or adjacency.nnz == 0:
+        return values[labels], 0
+
+    rng = np.random.default_rng(seed)
+    coo = adjacency.tocoo()
+    rows = coo.row.astype(np.int64)
+    cols = coo.col.astype(np.int64)
+    has_neighbours = np.diff(adjacency.indptr) > 0
+    label_count = len(values)
+    # Stop once fewer notes than this still prefer another label
+    settled = max(1, int(size * LABEL_PROPAGATION_SETTLED))
+
+    for iteration in range(1, max_iterations + 1):
+        # Count (note, neighbour label) pairs by sorting encoded keys, which
+        # stays vectorised where a per-row argmax would not. Keys arrive
+        # grouped by note, so a stable (merge) sort is close to linear
+        keys = np.sort(rows * label_count + labels[cols], kind="stable")
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+        keys = keys[starts]
+        key_rows = keys // label_count
+
+        # Per note, the most common label (smallest on ties)
+        row_starts = np.flatnonzero(np.r_[True, key_rows[1:] != key_rows[:-1]])
+        row_max = np.maximum.reduceat(counts, row_starts)
+        candidates = np.flatnonzero(counts == np.repeat(row_max, np.diff(np.r_[row_starts, len(keys)])))
+        first = candidates[np.r_[True, key_rows[candidates][1:] != key_rows[candidates][:-1]]]
+        best = labels.copy()
+        best_count = np.zeros(size, dtype=np.int64)
+        best[key_rows[first]] = keys[first] % label_count
+        best_count[key_rows[first]] = counts[first]
+
+        current_keys = np.arange(size, dtype=np.int64) * label_count + labels
+        position = np.minimum(np.searchsorted(keys, current_keys), len(keys) - 1)
+        current_count = np.where(keys[position] == current_keys, counts[position], 0)
+
+        unsettled = has_neighbours & (current_count < best_count)
+        if unsettled.sum() < settled:
+            break
+        change = unsettled & (rng.random(size) < 0.5)
+        labels[change] = best[change]
+    return values[labels], iteration
+
+def compute(adjacency: "sparse.csr_matrix", previous: dict) -> dict:
+    """Every score for a loaded graph, warm-started from the previous run"""
+    from scipy.sparse import csgraph
+
+    scores, pagerank_iterations = pagerank(adjacency, start=previous["pagerank"])
+    component_count, components = csgraph.connected_components(adjacency, directed=False)
+
+    # Start from the stored communities; new notes get fresh ids
+    start = previous["community"].copy()
+    fresh = start < 0
+    start[fresh] = start.max(initial=-1) + 1 + np.arange(fresh.sum())
+    communities, propagation_iterations = label_propagation(adjacency, start)
+
+    return {
+        "degrees": np.diff(adjacency.indptr),
+        "pagerank": scores,
+        "pagerank_iterations": pagerank_iterations,
+        "components": components,
+        "component_count": int(component_count),
+        "communities": communities,
+        "propagation_iterations": propagation_iterations,
+        "fresh": fresh,
+    }
+
+async def write_scores(ids: list[str], pagerank_scores: np.ndarray, degrees: np.ndarray,
+                       components: np.ndarray, communities: np.ndarray, changed: np.ndarray) -> int:
+    """Write the rows flagged in `changed` back onto Note"""
+    indices = np.flatnonzero(changed)
+    if len(indices) == 0:
+        return 0
+
+    records = [
+        (ids[i], float(pagerank_scores[i]), int(degrees[i]), int(components[i]), int(communities[i]))
+        for i in indices
+    ]
+    if database.pg_pool is not None:
+        async with database.pg_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """
+                    CREATE TEMP TABLE note_analytics_batch (
+                        id text, pagerank float8, degree int, "componentId" int, "communityId" int
+                    ) ON COMMIT DROP
+                    """
+                )
+                await conn.copy_records_to_table(
+                    "note_analytics_batch",
+                    records=records,
+                    columns=["id", "pagerank", "degree", "componentId", "communityId"],
+                )
+                await conn.execute(
+                    """
+                    UPDATE "Note" n
+                    SET pagerank = v.pagerank, degree = v.degree,
+                        "componentId" = v."componentId", "communityId" = v."communityId"
+                    FROM note_analytics_batch v
+                    WHERE n.id = v.id
+                    """
+                )
+        return len(records)
+
+    for start in range(0, len(records), WRITE_BATCH):
+        rows = [
+            {"id": id, "pagerank": score, "degree": degree, "componentId": component, "communityId": community}
+            for id, score, degree, component, community in records[start:start + WRITE_BATCH]
+        ]
+        await prisma.execute_raw(
+            """
+            UPDATE "Note" n
+            SET pagerank = v.pagerank, degree = v.degree,
+                "componentId" = v."componentId", "communityId" = v."communityId"
+            FROM jsonb_to_recordset($1::jsonb)
+                 AS v(id text, pagerank float8, degree int, "componentId" int, "communityId" int)
+            WHERE n.id = v.id
+            """,
+            json.dumps(rows)
+        )
+    return len(records)
+
+async def graph_version() -> int:
+    redis_service = await _redis()
+    return int(await redis_service.redis.get(graph_service.GRAPH_VERSION_KEY) or 0)
+
+async def run_analytics(force: bool = False) -> dict:
+    """Recompute every score, unless the graph has not changed since the last run"""
+    redis_service = await _redis()
+    version = await graph_version()
+    status = await analytics_status()
+    if not force and status.get("graph_version") == version:
+        logger.info("Graph unchanged since the last analytics run, skipping")
+        return status
+
+    started = time.monotonic()
+    ids, adjacency, previous = await load_graph()
+    loaded = time.monotonic()
+
+    # Several seconds of CPU on large graphs; keep the worker's loop free
+    result = await asyncio.to_thread(compute, adjacency, previous)
+    degrees, scores, components, communities, fresh = (
+        result["degrees"], result["pagerank"], result["components"], result["communities"], result["fresh"]
+    )
+    computed = time.monotonic()
+
+    # Only rewrite notes whose values moved
+    changed = (
+        fresh
+        | ~np.isclose(scores, previous["pagerank"], rtol=1e-4, atol=0.0)
+        | (degrees != previous["degree"])
+        | (components != previous["component"])
+        | (communities != previous["community"])
+    )
+    written = await write_scores(ids, scores, degrees, components, communities, changed)
+
+    status = {
+        "graph_version": version,
+        "notes": len(ids),
+        "links": adjacency.nnz // 2,
+        "components": result["component_count"],
+        "communities": int(len(np.unique(communities))) if len(ids) else 0,
+        "max_pagerank": float(scores.max()) if len(ids) else 0.0,
+        "pagerank_iterations": result["pagerank_iterations"],
+        "propagation_iterations": result["propagation_iterations"],
+        "rows_written": written,
+        "load_s": round(loaded - started, 3),
+        "compute_s": round(computed - loaded, 3),
+        "total_s": round(time.monotonic() - started, 3),
+        "completed_at": time.time(),
+    }
+    await redis_service.redis.set(STATUS_KEY, json.dumps(status))
+    logger.info(
+        f"Graph analytics: {status['notes']} notes, {status['links']} links, "
+        f"{status['communities']} communities in {status['total_s']}s"
+    )
+    return status
+
+async def analytics_status() -> dict:
+    redis_service = await _redis()
+    stored = await redis_service.redis.get(STATUS_KEY)
+    return json.loads(stored) if stored else {}
+
+async def schedule_analytics() -> bool:
+    """Queue a run once per `graph_analytics_interval` across all workers"""
+    if settings.graph_analytics_interval <= 0:
+        return False
+    redis_service = await _redis()
+    due = await redis_service.redis.set(
+        SCHEDULE_KEY, 1, nx=True, ex=max(1, int(settings.graph_analytics_interval))
+    )
+    if not due:
+        return False
+    return await redis_service.enqueue_task(
+        redis_service.TASK_GRAPH_ANALYTICS, {"force": False}, task_id="graph_analytics"
+    )
+
+async def top_notes(limit: int = 20, community_id: int = None) -> list:
+    """Most central notes by PageRank, optionally within one community"""
+    return await prisma.query_raw(
+        f"""
+        SELECT {graph_service.NODE_PROJECTION}, n.pagerank, n.degree, n."componentId", n."communityId"
+        FROM "Note" n
+        WHERE n.pagerank IS NOT NULL {'AND n."communityId" = $2' if community_id is not None else ''}
+        ORDER BY n.pagerank DESC
+        LIMIT $1
+        """,
+        *([limit, community_id] if community_id is not None else [limit])
+    )
+
+async def list_communities(limit: int = 50, min_size: int = 2) -> list:
+    """Largest communities with their size and most central note"""
+    return await prisma.query_raw(
+        """
+        SELECT * FROM (
+            SELECT DISTINCT ON (sizes."communityId")
+                   sizes."communityId", sizes.size, n.id AS "topNoteId",
+                   coalesce(n.title, substr(n.summary, 1, 80), substr(n.content, 1, 80)) AS "topNoteLabel"
+            FROM (
+                SELECT "communityId", count(*)::int AS size
+                FROM "Note"
+                WHERE "communityId" IS NOT NULL
+                GROUP BY "communityId"
+                HAVING count(*) >= $2
+                ORDER BY size DESC
+                LIMIT $1
+            ) sizes
+            JOIN "Note" n ON n."communityId" = sizes."communityId"
+            ORDER BY sizes."communityId", n.pagerank DESC NULLS LAST
+        ) communities
+        ORDER BY size DESC, "communityId"
+        """,
+        limit, min_size
+    )
+
+async def centrality(note_ids: list[str]) -> dict:
+    """PageRank of each note relative to the most central one, in [0, 1]"""
+    status = await analytics_status()
+    max_pagerank = status.get("max_pagerank") or 0.0
+    if not note_ids or max_pagerank <= 0:
+        return {}
+    rows = await prisma.query_raw(
+        """
+        SELECT id, pagerank FROM "Note"
+        WHERE id IN (SELECT jsonb_array_elements_text($1::jsonb)) AND pagerank IS NOT NULL
+        """,
+        json.dumps(note_ids)
+    )
+    return {row["id"]: min(1.0, row["pagerank"] / max_pagerank) for row in rows}
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+
+import numpy as np
+from src.core.database import prisma
+
+logger = logging.getLogger(__name__)
+
+# Bumped when links change and when notes are created or deleted; each process
+# rebuilds its adjacency cache when the version it built from is stale
+GRAPH_VERSION_KEY = "graph:version"
+
+# Lightweight node projection: never reads more than the first characters of
+# content (substr allows Postgres to detoast only a slice)
+NODE_PROJECTION = """
+    n.id,
+    coalesce(n.title, substr(n.summary, 1, 80), substr(n.content, 1, 80)) AS label,
+    n.tags,
+    n."isPinned",
+    n."updatedAt"
+"""
+
+async def _redis():
+    # Imported lazily: redis_service imports linking_service, which imports this module
+    from src.services import redis_service
+    return redis_service.redis
+
+async def invalidate():
+    """Mark cached adjacency stale in every process"""
+    try:
+        await (await _redis()).incr(GRAPH_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Could not invalidate graph cache: {str(e)}")
+
+# Next ring of a breadth-first walk: up to `fan_out` links of each frontier
+# note, in both directions, to notes not visited yet. Rows are bounded by
+# the frontier size times the fan-out, however densely the notes are linked.
+SQL_NEXT_HOP = """
+    SELECT DISTINCT e.neighbour AS id
+    FROM jsonb_array_elements_text($1::jsonb) f(id)
+    CROSS JOIN LATERAL (
+        SELECT l."B" AS neighbour FROM "_NoteLinks" l WHERE l."A" = f.id
+        UNION ALL
+        SELECT l."A" FROM "_NoteLinks" l WHERE l."B" = f.id
+        LIMIT $2
+    ) e
+    WHERE e.neighbour NOT IN (SELECT jsonb_array_elements_text($3::jsonb))
+    ORDER BY id
+    LIMIT $4
+"""
+
+async def get_neighbourhood(note_id: str, depth: int = 2, fan_out: int = 25, max_nodes: int = 200) -> dict:
+    """N-hop neighbourhood of a note as nodes and edges.
+
+    Links are followed in both directions, one query per hop. Each note
+    expands at most `fan_out` of its links and is visited once, at its
+    shortest distance; the walk stops at `depth` hops or once `max_nodes`
+    notes are reached. Returns None if the note does not exist.
+    """
+    depths = {note_id: 0}
+    frontier = [note_id]
+    for hop in range(1, depth + 1):
+        if not frontier or len(depths) >= max_nodes:
+            break
+        reached = await prisma.query_raw(
+            SQL_NEXT_HOP,
+            json.dumps(frontier), fan_out, json.dumps(list(depths)), max_nodes - len(depths)
+        )
+        frontier = [row["id"] for row in reached]
+        depths.update((neighbour, hop) for neighbour in frontier)
+
+    nodes = await prisma.query_raw(
+        f"""
+        SELECT {NODE_PROJECTION}
+        FROM "Note" n
+        WHERE n.id IN (SELECT jsonb_array_elements_text($1::jsonb))
+        """,
+        json.dumps(list(depths))
+    )
+    if not any(node["id"] == note_id for node in nodes):
+        return None
+    for node in nodes:
+        node["depth"] = depths[node["id"]]
+    nodes.sort(key=lambda node: (node["depth"], node["id"]))
+
+    edges = await prisma.query_raw(
+        """
+        SELECT l."A" AS source, l."B" AS target
+        FROM "_NoteLinks" l
+        WHERE l."A" IN (SELECT jsonb_array_elements_text($1::jsonb))
+          AND l."B" IN (SELECT jsonb_array_elements_text($1::jsonb))
+        """,
+        json.dumps([node["id"] for node in nodes])
+    )
+    return {"nodes": nodes, "edges": edges}
+
+
+class AdjacencyCache:
+    """Whole link graph as integer-indexed CSR arrays.
+
+    Notes are numbered 0..N-1 in `ids` order; the neighbours of note i are
+    `indices[indptr[i]:indptr[i + 1]]`. Links are undirected, so each one
+    appears in both rows. Built in one pass over _NoteLinks and reused
+    until the graph version in Redis changes.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.ids: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.nodes: list[dict] = []
+        self.indptr = np.zeros(1, dtype=np.int32)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self._lock = asyncio.Lock()
+
+    async def _current_version(self) -> int:
+        try:
+            return int(await (await _redis()).get(GRAPH_VERSION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"Could not read graph version: {str(e)}")
+            return None
+
+    async def _build(self):
+        nodes = await prisma.query_raw(f'SELECT {NODE_PROJECTION} FROM "Note" n ORDER BY n.id')
+        links = await prisma.query_raw('SELECT "A" AS source, "B" AS target FROM "_NoteLinks"')
+
+        index = {node["id"]: i for i, node in enumerate(nodes)}
+        # Skip links to notes created between the two reads
+        links = [link for link in links if link["source"] in index and link["target"] in index]
+        sources = np.fromiter((index[link["source"]] for link in links), dtype=np.int32, count=len(links))
+        targets = np.fromiter((index[link["target"]] for link in links), dtype=np.int32, count=len(links))
+
+        # Symmetrise, then sort by row to lay the neighbour lists out contiguously
+        rows = np.concatenate([sources, targets])
+        cols = np.concatenate([targets, sources])
+        order = np.argsort(rows, kind="stable")
+        counts = np.bincount(rows, minlength=len(nodes))
+
+        self.ids = [node["id"] for node in nodes]
+        self.positions = index
+        self.nodes = nodes
+        self.indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+        self.indices = cols[order].astype(np.int32)
+
+    async def get(self) -> "AdjacencyCache":
+        """The cache, rebuilt first if links or notes changed since it was built"""
+        version = await self._current_version()
+        if self.version is not None and version is not None and version == self.version:
+            return self
+
+        async with self._lock:
+            if self.version is None or version is None or version != self.version:
+                await self._build()
+                self.version = version
+                logger.info(f"Built adjacency cache: {len(self.ids)} notes, {len(self.indices) // 2} links")
+        return self
+
+    def neighbours(self, note_id: str) -> list[str]:
+        i = self.positions[note_id]
+        return [self.ids[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def to_dict(self) -> dict:
+        degrees = np.diff(self.indptr)
+        return {
+            "version": self.version,
+            "nodes": [{**node, "degree": int(degree)} for node, degree in zip(self.nodes, degrees)],
+            "indptr": self.indptr.tolist(),
+            "indices": self.indices.tolist(),
+        }
+
+
+adjacency = AdjacencyCache()
+
+async def get_graph() -> dict:
+    """Whole-graph view in CSR form"""
+    return (await adjacency.get()).to_dict()
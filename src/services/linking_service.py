@@ -1,70 +1,238 @@
+import json
+import logging
+import time
+from src.core import tracing
+from src.core.config import settings
 from src.core.database import prisma
-from src.services import vector_services
+from src.services import graph_service, note_cache, vector_services
+
+logger = logging.getLogger(__name__)
+
+# Time (database clock) the last corpus-wide auto-link run started, and its stats
+AUTO_LINK_SINCE_KEY = "links:auto:since"
+AUTO_LINK_STATUS_KEY = "links:auto:status"
+# Parameters and checkpoint of the run in progress, if any
+AUTO_LINK_RUN_KEY = "links:auto:run"
+
+def _redis_service():
+    # Imported lazily: redis_service dispatches auto-link tasks to this module
+    from src.services import redis_service
+    return redis_service
 
 async def create_link(source_note_id: str, target_note_id: str):
     """Create a link between two notes"""
-    # Check if notes exist
-    source = await prisma.note.find_unique(where={"id": source_note_id})
-    target = await prisma.note.find_unique(where={"id": target_note_id})
-    
-    if not source or not target:
-        return None
-    
-    # Check if link already exists to avoid duplicates
-    existing_links = await prisma.note.find_unique(
-        where={"id": source_note_id},
-        include={"links": {"where": {"id": target_note_id}}}
-    )
-    
-    if existing_links and len(existing_links.links) > 0:
-        return existing_links  # Link already exists
-    
-    # Add the link
-    return await prisma.note.update(
-        where={"id": source_note_id},
-        data={"links": {"connect": [{"id": target_note_id}]}},
-        include={"links": True}
-    )
+    with tracing.span("links.create"):
+        # Check if notes exist (served from the note cache, usually already
+        # loaded by the router in this request)
+        notes = await note_cache.get_notes([source_note_id, target_note_id])
+        if source_note_id not in notes or target_note_id not in notes:
+            return None
+        
+        # Skips links that already exist in either direction
+        await upsert_links([(source_note_id, target_note_id)])
+        return notes[source_note_id]
 
 async def remove_link(source_note_id: str, target_note_id: str):
     """Remove a link between two notes"""
-    return await prisma.note.update(
-        where={"id": source_note_id},
-        data={"links": {"disconnect": [{"id": target_note_id}]}},
-        include={"links": True}
+    # Links are undirected, so remove whichever way round it was stored
+    removed = await prisma.execute_raw(
+        """
+        DELETE FROM "_NoteLinks"
+        WHERE ("A" = $1 AND "B" = $2) OR ("A" = $2 AND "B" = $1)
+        """,
+        source_note_id, target_note_id
     )
+    if removed:
+        await note_cache.invalidate_links(source_note_id, target_note_id)
+        await graph_service.invalidate()
+    return removed
 
 async def get_linked_notes(note_id: str):
     """Get all notes linked to this note"""
-    note = await prisma.note.find_unique(
-        where={"id": note_id},
-        include={"links": True, "linkedTo": True}
+    # Both directions of links, as cached ids hydrated through the note cache
+    with tracing.span("links.get"):
+        link_ids = await note_cache.get_link_ids(note_id)
+        notes = await note_cache.get_notes(link_ids)
+    return [notes[link_id] for link_id in link_ids if link_id in notes]
+
+async def upsert_links(pairs: list[tuple[str, str]]) -> int:
+    """Insert many links in one statement, skipping ones that already exist.
+
+    Links are read in both directions (see get_linked_notes), so a pair is
+    skipped if it is already linked either way. Returns the number created.
+    """
+    unique = {}
+    for source, target in pairs:
+        if source != target:
+            unique.setdefault(frozenset((source, target)), (source, target))
+    if not unique:
+        return 0
+
+    created = await prisma.execute_raw(
+        """
+        INSERT INTO "_NoteLinks" ("A", "B")
+        SELECT v.source, v.target
+        FROM jsonb_to_recordset($1::jsonb) AS v(source text, target text)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM "_NoteLinks" l WHERE l."A" = v.target AND l."B" = v.source
+        )
+        ON CONFLICT ("A", "B") DO NOTHING
+        """,
+        json.dumps([{"source": source, "target": target} for source, target in unique.values()])
     )
-    
-    if not note:
-        return []
-    
-    # Combine both directions of links
-    all_links = note.links + note.linkedTo
-    return all_links
+    if created:
+        await note_cache.invalidate_links(*{note_id for pair in unique.values() for note_id in pair})
+        await graph_service.invalidate()
+    return created
 
-async def auto_link_notes(note_id: str, similarity_threshold=0.7):
+async def auto_link_notes(note_id: str, similarity_threshold=0.7, limit=10):
     """Automatically link semantically similar notes"""
-    note = await prisma.note.find_unique(where={"id": note_id})
+    note = await note_cache.get_note(note_id)
     if not note:
         return []
     
-    # Find similar notes
-    similar_notes = await vector_services.semantic_search(note.content, limit=10)
+    # Find similar notes using the stored embedding
+    similar_notes = await vector_services.semantic_search_by_note(note_id, limit=limit)
+    similar_notes = [
+        similar_note for similar_note in similar_notes
+        if similar_note["id"] != note_id
+        and vector_services.distance_to_similarity(similar_note["distance"]) >= similarity_threshold
+    ]
     
-    links_created = []
-    for similar_note in similar_notes:
-        # Skip the same note
-        if similar_note["id"] == note_id:
-            continue
-        
-        # Create bidirectional links
-        await create_link(note_id, similar_note["id"])
-        links_created.append(similar_note)
-    
-    return links_created
\ No newline at end of file
+    await upsert_links([(note_id, similar_note["id"]) for similar_note in similar_notes])
+    return similar_notes
+
+async def find_neighbours(after_id: str, since: str | None, k: int, max_distance: float, batch_size: int) -> tuple[list, str | None]:
+    """Top-k neighbours within max_distance for the next page of notes.
+
+    One query per page: a LATERAL subquery runs an ANN lookup per source
+    note against the stored embeddings. The distance bound is applied after
+    the LIMIT so each lookup can still be served by the vector index.
+    Returns the (source, target, distance) rows and the last source id seen.
+    """
+    sources = await prisma.query_raw(
+        f"""
+        SELECT n.id FROM "Note" n
+        WHERE n.id > $1 AND n.embedding IS NOT NULL
+          {'AND n."embeddedAt" > $3::timestamp' if since else ''}
+        ORDER BY n.id
+        LIMIT $2
+        """,
+        *([after_id, batch_size, since] if since else [after_id, batch_size])
+    )
+    if not sources:
+        return [], None
+
+    rows = await vector_services.query_vectors(
+        f"""
+        SELECT s.id AS source, t.id AS target, t.distance
+        FROM "Note" s
+        CROSS JOIN LATERAL (
+            SELECT n.id, n.embedding {vector_services.distance_operator()} s.embedding AS distance
+            FROM "Note" n
+            WHERE n.id <> s.id AND n.embedding IS NOT NULL
+            ORDER BY n.embedding {vector_services.distance_operator()} s.embedding
+            LIMIT $2
+        ) t
+        WHERE s.id IN (SELECT jsonb_array_elements_text($1::jsonb))
+          AND t.distance <= $3
+        """,
+        json.dumps([row["id"] for row in sources]),
+        k,
+        max_distance,
+        operation="auto_link_neighbours",
+    )
+    return rows, sources[-1]["id"]
+
+async def _auto_link_run() -> dict:
+    run = await _redis_service().redis.hgetall(AUTO_LINK_RUN_KEY)
+    return {key.decode(): value.decode() for key, value in run.items()}
+
+async def _enqueue_auto_link_page(page: int) -> bool:
+    redis_service = _redis_service()
+    return await redis_service.enqueue_task(redis_service.TASK_AUTO_LINK, {"page": page}, task_id="auto_link")
+
+async def start_auto_link(k: int = None, similarity_threshold: float = None, incremental: bool = False) -> dict:
+    """Queue a corpus-wide run linking every note to its top-k neighbours above the threshold.
+
+    The run goes one page of notes per task (see run_auto_link_page). While
+    one is in progress this resumes it, with its original parameters.
+    Incremental runs only visit notes embedded since the previous run began;
+    links are symmetric, so an unchanged note still gains links to new
+    neighbours through them.
+    """
+    redis = _redis_service().redis
+    run = await _auto_link_run()
+    if not run:
+        k = k or settings.auto_link_k
+        similarity_threshold = settings.auto_link_threshold if similarity_threshold is None else similarity_threshold
+        since = await redis.get(AUTO_LINK_SINCE_KEY) if incremental else None
+        # Taken from the database clock so it compares exactly with embeddedAt
+        started_at = (await prisma.query_raw("SELECT now()::timestamp(3)::text AS now"))[0]["now"]
+        run = {
+            "k": k,
+            "max_distance": vector_services.similarity_to_distance(similarity_threshold),
+            "incremental": int(incremental),
+            "since": since.decode() if since else "",
+            "started_at": started_at,
+            "started": time.time(),
+            "after_id": "",
+            "page": 0,
+            "notes_with_links": 0,
+            "links_created": 0,
+        }
+        await redis.hset(AUTO_LINK_RUN_KEY, mapping=run)
+
+    # A task for the current page may already be waiting or running; the
+    # page number lets the copy that comes second see it is stale
+    queued = await _enqueue_auto_link_page(int(run["page"]))
+    return {"queued": queued, "run": {key: str(value) for key, value in run.items()}}
+
+async def run_auto_link_page(page: int) -> dict | None:
+    """Worker entry point: link one page of notes, save the checkpoint, queue the next page"""
+    redis = _redis_service().redis
+    run = await _auto_link_run()
+    if not run or int(run["page"]) != page:
+        # Finished, or this page was already done by another copy of the task
+        return None
+
+    with tracing.span("links.auto_link_batch", after_id=run["after_id"]):
+        rows, last_id = await find_neighbours(
+            run["after_id"], run["since"] or None, int(run["k"]), float(run["max_distance"]),
+            settings.auto_link_batch_size,
+        )
+        if last_id is None:
+            return await _finish_auto_link(run)
+        created = await upsert_links([(row["source"], row["target"]) for row in rows])
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(AUTO_LINK_RUN_KEY, mapping={"after_id": last_id, "page": page + 1})
+        pipe.hincrby(AUTO_LINK_RUN_KEY, "notes_with_links", len({row["source"] for row in rows}))
+        pipe.hincrby(AUTO_LINK_RUN_KEY, "links_created", created)
+        await pipe.execute()
+    await _enqueue_auto_link_page(page + 1)
+    return None
+
+async def _finish_auto_link(run: dict) -> dict:
+    stats = {
+        "incremental": bool(int(run["incremental"])),
+        "since": run["since"],
+        "started_at": run["started_at"],
+        "notes_with_links": int(run["notes_with_links"]),
+        "links_created": int(run["links_created"]),
+        "duration_s": round(time.time() - float(run["started"]), 2),
+    }
+    async with _redis_service().redis.pipeline(transaction=True) as pipe:
+        pipe.set(AUTO_LINK_SINCE_KEY, run["started_at"])
+        pipe.delete(AUTO_LINK_STATUS_KEY, AUTO_LINK_RUN_KEY)
+        pipe.hset(AUTO_LINK_STATUS_KEY, mapping={key: str(value) for key, value in stats.items()})
+        await pipe.execute()
+    logger.info(
+        f"Auto-link run created {stats['links_created']} links ({stats['notes_with_links']} notes had neighbours)"
+    )
+    return stats
+
+async def auto_link_status() -> dict:
+    """Stats of the last completed run"""
+    status = await _redis_service().redis.hgetall(AUTO_LINK_STATUS_KEY)
+    return {key.decode(): value.decode() for key, value in status.items()}
@@ -0,0 +1,210 @@
+"""Read-through cache for notes and their link lists.
+
+Two tiers: a request-scoped identity map (a dict held in a context variable,
+installed per request by RequestScopeMiddleware) so one request never loads
+the same note twice, and a shared Redis tier with a TTL so hot notes are
+served without touching Postgres. Writes go through note_services and
+linking_service, which invalidate the affected keys; the TTL bounds
+staleness for the few columns written with raw SQL (embedding metadata,
+graph scores).
+
+Invalidation also bumps a per-key generation counter. A reader stores what
+it loaded only if the generation is still the one it saw before the load,
+so a slow read racing an update cannot put the old row back after the
+update invalidated it.
+"""
+
+import contextlib
+import json
+import logging
+from contextvars import ContextVar
+
+from prisma.models import Note
+from src.core.config import settings
+from src.core.database import prisma
+
+logger = logging.getLogger(__name__)
+
+_request_notes: ContextVar[dict | None] = ContextVar("request_notes", default=None)
+
+# Identity-map key for a note's link list, kept apart from note ids
+_LINKS = "links:"
+
+# Outlives any read-through load by far; a generation counter that expired
+# and restarted mid-load could otherwise match the reader's again
+GENERATION_TTL = 3600
+
+# KEYS: cache key and generation key pairs. ARGV: for each pair the
+# generation seen before loading and the value, then the TTL
+_SET_IF_CURRENT = """
+for i = 1, #KEYS, 2 do
+    local generation = redis.call('GET', KEYS[i + 1]) or ''
+    if generation == ARGV[i] then
+        redis.call('SET', KEYS[i], ARGV[i + 1], 'EX', ARGV[#ARGV])
+    end
+end
+"""
+
+
+def _note_key(note_id: str) -> str:
+    return f"note:{note_id}"
+
+
+def _links_key(note_id: str) -> str:
+    return f"note:{note_id}:links"
+
+
+def _generation_key(key: str) -> str:
+    return f"{key}:gen"
+
+
+def _redis():
+    # Imported lazily: redis_service imports services that import this module
+    from src.services import redis_service
+    return redis_service.redis
+
+
+@contextlib.contextmanager
+def request_scope():
+    """Give the enclosed code its own identity map"""
+    token = _request_notes.set({})
+    try:
+        yield
+    finally:
+        _request_notes.reset(token)
+
+
+class RequestScopeMiddleware:
+    """ASGI middleware wrapping every HTTP request in request_scope()"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_scope():
+            await self.app(scope, receive, send)
+
+
+async def _redis_get_many(keys: list[str]) -> tuple[list, list]:
+    """Cached values and current generations of `keys`"""
+    if not settings.note_cache_redis or not keys:
+        return [None] * len(keys), [None] * len(keys)
+    try:
+        found = await _redis().mget(keys + [_generation_key(key) for key in keys])
+    except Exception as e:
+        logger.warning(f"Note cache read failed: {str(e)}")
+        return [None] * len(keys), [None] * len(keys)
+    return found[:len(keys)], found[len(keys):]
+
+
+async def _redis_set_many(values: dict[str, str], generations: dict[str, bytes | None]):
+    """Store values whose key was not invalidated since `generations` was read"""
+    if not settings.note_cache_redis or not values:
+        return
+    keys, args = [], []
+    for key, value in values.items():
+        keys += [key, _generation_key(key)]
+        generation = generations.get(key)
+        args += [generation.decode() if generation else "", value]
+    try:
+        await _redis().eval(_SET_IF_CURRENT, len(keys), *keys, *args, settings.note_cache_ttl)
+    except Exception as e:
+        logger.warning(f"Note cache write failed: {str(e)}")
+
+
+async def get_notes(note_ids: list[str]) -> dict[str, Note]:
+    """Notes by id through both tiers; missing notes are left out"""
+    identity = _request_notes.get()
+    found = {}
+    wanted = []
+    for note_id in dict.fromkeys(note_ids):
+        if identity is not None and note_id in identity:
+            if identity[note_id] is not None:
+                found[note_id] = identity[note_id]
+        else:
+            wanted.append(note_id)
+
+    missing = []
+    keys = [_note_key(note_id) for note_id in wanted]
+    blobs, generations = await _redis_get_many(keys)
+    for note_id, blob in zip(wanted, blobs):
+        if blob:
+            found[note_id] = Note.parse_raw(blob)
+        else:
+            missing.append(note_id)
+
+    if missing:
+        loaded = await prisma.note.find_many(where={"id": {"in": missing}})
+        for note in loaded:
+            found[note.id] = note
+        await _redis_set_many(
+            {_note_key(note.id): note.json() for note in loaded},
+            dict(zip(keys, generations)),
+        )
+
+    if identity is not None:
+        for note_id in wanted:
+            identity[note_id] = found.get(note_id)
+    return found
+
+
+async def get_note(note_id: str) -> Note | None:
+    return (await get_notes([note_id])).get(note_id)
+
+
+async def get_link_ids(note_id: str) -> list[str]:
+    """Ids of the notes linked to a note, in either direction"""
+    identity = _request_notes.get()
+    if identity is not None and _LINKS + note_id in identity:
+        return identity[_LINKS + note_id]
+
+    blobs, generations = await _redis_get_many([_links_key(note_id)])
+    blob = blobs[0]
+    if blob:
+        link_ids = json.loads(blob)
+    else:
+        rows = await prisma.query_raw(
+            """
+            SELECT "B" AS id FROM "_NoteLinks" WHERE "A" = $1
+            UNION
+            SELECT "A" FROM "_NoteLinks" WHERE "B" = $1
+            """,
+            note_id
+        )
+        link_ids = [row["id"] for row in rows]
+        await _redis_set_many({_links_key(note_id): json.dumps(link_ids)}, {_links_key(note_id): generations[0]})
+
+    if identity is not None:
+        identity[_LINKS + note_id] = link_ids
+    return link_ids
+
+
+async def invalidate(*note_ids: str):
+    """Drop notes from both tiers after a write"""
+    await _drop([_note_key(note_id) for note_id in note_ids], note_ids)
+
+
+async def invalidate_links(*note_ids: str):
+    """Drop the link lists of every note whose links changed"""
+    await _drop([_links_key(note_id) for note_id in note_ids], [_LINKS + note_id for note_id in note_ids])
+
+
+async def _drop(redis_keys: list[str], identity_keys):
+    identity = _request_notes.get()
+    if identity is not None:
+        for key in identity_keys:
+            identity.pop(key, None)
+    if not settings.note_cache_redis or not redis_keys:
+        return
+    try:
+        async with _redis().pipeline(transaction=False) as pipe:
+            for key in redis_keys:
+                pipe.incr(_generation_key(key))
+                pipe.expire(_generation_key(key), GENERATION_TTL)
+            pipe.delete(*redis_keys)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Note cache invalidation failed: {str(e)}")
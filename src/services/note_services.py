@@ -1,7 +1,14 @@
+from src.core import tracing
+from src.core.config import settings
 from src.core.database import prisma
-from src.schemas.note import NoteCreate, NoteUpdate
-from src.services import vector_services
+from src.core.hashing import content_hash
+from src.schemas.note import NoteCreate, NoteUpdate, NoteSearchResult
+from src.services import audit_service, graph_analytics, graph_service, note_cache, related_service, vector_services
+import asyncio
+import base64
+import json
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -10,28 +17,123 @@ async def create_note(data: NoteCreate):
         note = await prisma.note.create(
             data={
                 "content": data.content,
-                "tags": data.tags
+                "tags": data.tags,
+                "title": data.title
             }
         )
         
-        # Create embedding for the new note
-        await vector_services.update_note_embedding(note.id, note.content)
+        # Embedding, related list and enrichment are built off the request
+        # path, once the first burst of edits settles
+        await schedule_note_processing(note.id)
+        await graph_service.invalidate()
+        await audit_service.log_note_change(note.id, "create", audit_service.snapshot(note))
         
         return note
     except Exception as e:
         logger.error(f"Error creating note: {str(e)}")
         raise
 
+# Rows per multi-row INSERT; keeps each statement's JSON payload bounded
+BULK_INSERT_BATCH = 1000
+
+async def bulk_create_notes(notes: list[NoteCreate], embed: bool = True) -> list[str]:
+    """Insert many notes with multi-row INSERTs and batched embeddings.
+
+    Returns the new note ids in input order. Enrichment is left to the
+    caller, like create_note.
+    """
+    created_ids = []
+    try:
+        for start in range(0, len(notes), BULK_INSERT_BATCH):
+            batch = notes[start:start + BULK_INSERT_BATCH]
+            rows = [
+                {"id": str(uuid.uuid4()), "content": note.content, "tags": note.tags, "title": note.title}
+                for note in batch
+            ]
+            await prisma.execute_raw(
+                """
+                INSERT INTO "Note" (id, content, tags, title, "createdAt", "updatedAt")
+                SELECT r.id, r.content,
+                       ARRAY(SELECT jsonb_array_elements_text(r.tags)),
+                       r.title, now(), now()
+                FROM jsonb_to_recordset($1::jsonb) AS r(id text, content text, tags jsonb, title text)
+                """,
+                json.dumps(rows)
+            )
+            batch_ids = [row["id"] for row in rows]
+
+            if embed:
+                model_name = await vector_services.active_model()
+                embeddings = await vector_services.create_embeddings(
+                    [note.content for note in batch], model_name
+                )
+                await vector_services.update_note_embeddings(
+                    batch_ids, embeddings, [content_hash(note.content) for note in batch], model_name
+                )
+                if settings.chunk_embeddings:
+                    await vector_services.update_note_chunks(
+                        batch_ids, [note.content for note in batch], model_name
+                    )
+
+            await audit_service.log_note_changes([
+                audit_service.make_event(note_id, "create", audit_service.snapshot(note.dict()), None)
+                for note_id, note in zip(batch_ids, batch)
+            ])
+            created_ids.extend(batch_ids)
+
+        await graph_service.invalidate()
+        return created_ids
+    except Exception as e:
+        logger.error(f"Error bulk creating notes ({len(created_ids)} created before failure): {str(e)}")
+        raise
+
 async def get_note(note_id: str):
     try:
-        return await prisma.note.find_unique(
-            where={"id": note_id}
-        )
+        # Read-through: request identity map, then Redis, then Postgres
+        return await note_cache.get_note(note_id)
     except Exception as e:
         logger.error(f"Error getting note {note_id}: {str(e)}")
         return None
 
-async def update_note(note_id: str, data: dict | NoteUpdate):
+async def schedule_note_processing(note_id: str):
+    """Queue re-embedding and enrichment of a note, debounced per note"""
+    # Imported lazily: redis_service dispatches tasks to this module
+    from src.services import redis_service
+
+    await redis_service.enqueue_debounced(
+        redis_service.TASK_UPDATE_EMBEDDING, note_id, settings.embedding_debounce
+    )
+    await redis_service.enqueue_debounced(
+        redis_service.TASK_PROCESS_NOTE, note_id, settings.enrichment_debounce
+    )
+
+async def embed_note(note_id: str):
+    """Embed a note's current content and refresh its related list.
+
+    Run from the queue after edits settle. Skips notes already embedded from
+    this content by the serving model; returns False when nothing was written.
+    """
+    note = await prisma.note.find_unique(where={"id": note_id})
+    if not note:
+        return None
+    model_name = await vector_services.active_model()
+    if note.embeddingHash == content_hash(note.content) and note.embeddingModel == model_name:
+        return False
+    if not await vector_services.update_note_embedding(note_id, note.content):
+        # Edited meanwhile (that edit queued another run), or our model was
+        # just promoted away (the promotion's repair pass re-embeds the note)
+        return False
+    # Build its related list, and add it to its neighbours' lists
+    await related_service.schedule_refresh([note_id])
+    return True
+
+async def update_note(note_id: str, data: dict | NoteUpdate, if_content: str = None):
+    """Apply an update and queue the work a content change needs.
+
+    With `if_content`, the update only applies while the note's content is
+    still that text (results computed from an older version are dropped) and
+    None is returned otherwise.
+    """
     try:
         # Check if data is a dictionary or a Pydantic model
         if isinstance(data, dict):
@@ -43,14 +145,44 @@ async def update_note(note_id: str, data: dict | NoteUpdate):
             else:
                 update_data = data.dict(exclude_unset=True)
         
-        note = await prisma.note.update(
-            where={"id": note_id},
-            data=update_data
+        # Only re-embed when the content actually changed. The previous
+        # version also feeds the audit diff
+        existing = None
+        if "content" in update_data or settings.audit_log:
+            existing = await note_cache.get_note(note_id)
+        content_changed = "content" in update_data and (
+            existing is None or existing.content != update_data["content"]
         )
         
-        # If content was updated, update the embedding
-        if "content" in update_data:
-            await vector_services.update_note_embedding(note_id, note.content)
+        if if_content is not None:
+            # Compare-and-set in one statement, so a concurrent edit cannot
+            # slip in between the check and the write
+            updated = await prisma.note.update_many(
+                where={"id": note_id, "content": if_content},
+                data=update_data
+            )
+            if not updated:
+                logger.info(f"Note {note_id} changed while it was processed, result discarded")
+                return None
+            note = await prisma.note.find_unique(where={"id": note_id})
+        else:
+            note = await prisma.note.update(
+                where={"id": note_id},
+                data=update_data
+            )
+        await note_cache.invalidate(note_id)
+        
+        # Autosaves arrive every few seconds: re-embed and re-enrich once
+        # they pause rather than on every save
+        if content_changed:
+            await schedule_note_processing(note_id)
+        # The graph version is left alone: autosaves would otherwise rebuild
+        # every process's adjacency cache. Labels and tags there catch up
+        # on the next link change
+        if existing is not None:
+            changes = audit_service.diff_fields(existing.dict(), note.dict())
+            if changes:
+                await audit_service.log_note_change(note_id, "update", changes)
         
         return note
     except Exception as e:
@@ -59,36 +191,233 @@ async def update_note(note_id: str, data: dict | NoteUpdate):
 
 async def delete_note(note_id: str):
     try:
-        return await prisma.note.delete(
+        note = await prisma.note.delete(
             where={"id": note_id}
         )
+        await note_cache.invalidate(note_id)
+        await note_cache.invalidate_links(note_id)
+        await related_service.forget(note_id)
+        await graph_service.invalidate()
+        await audit_service.log_note_change(note_id, "delete", {"title": note.title} if note.title else None)
+        return note
     except Exception as e:
         logger.error(f"Error deleting note {note_id}: {str(e)}")
         raise
 
-async def list_notes():
+# Columns read by list_notes for each projection. "summary" never touches
+# content, which is by far the largest column
+LIST_PROJECTIONS = {
+    "full": vector_services.NOTE_COLUMNS,
+    "summary": 'n.id, n.summary, n.tags, n.title, n."isArchived", n."isPinned", n."createdAt", n."updatedAt"',
+}
+
+def encode_cursor(row: dict) -> str:
+    """Opaque keyset cursor pointing just after the given row"""
+    raw = json.dumps([str(row["updatedAt"]), row["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
     try:
-        return await prisma.note.find_many(
-            order_by={"updatedAt": "desc"}
+        updated_at, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return updated_at, note_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+async def list_notes(
+    limit: int = 50,
+    cursor: str = None,
+    fields: str = "full",
+    tag: str = None,
+    archived: bool = None,
+    pinned: bool = None,
+) -> tuple[list, str | None]:
+    """List notes newest-first using keyset pagination on (updatedAt, id).
+
+    Returns the page and a cursor for the next one (None on the last page).
+    Raises ValueError for an unknown projection or malformed cursor.
+    """
+    if fields not in LIST_PROJECTIONS:
+        raise ValueError(f"Unknown projection: {fields}")
+
+    conditions = []
+    params = []
+    if cursor:
+        updated_at, note_id = decode_cursor(cursor)
+        params += [updated_at, note_id]
+        conditions.append(
+            f'(n."updatedAt", n.id) < (${len(params) - 1}::timestamptz AT TIME ZONE \'UTC\', ${len(params)})'
         )
-    except Exception as e:
-        logger.error(f"Error listing notes: {str(e)}")
-        return []
+    if tag is not None:
+        params.append(tag)
+        conditions.append(f"n.tags @> ARRAY[${len(params)}]::text[]")
+    if archived is not None:
+        params.append(archived)
+        conditions.append(f'n."isArchived" = ${len(params)}')
+    if pinned is not None:
+        params.append(pinned)
+        conditions.append(f'n."isPinned" = ${len(params)}')
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Fetch one extra row to know whether another page exists
+    params.append(limit + 1)
+
+    rows = await prisma.query_raw(
+        f"""
+        SELECT {LIST_PROJECTIONS[fields]}
+        FROM "Note" n
+        {where}
+        ORDER BY n."updatedAt" DESC, n.id DESC
+        LIMIT ${len(params)}
+        """,
+        *params
+    )
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+async def iter_notes(batch_size: int = 500, **filters):
+    """Yield every note matching the filters, one keyset page at a time"""
+    cursor = None
+    while True:
+        rows, cursor = await list_notes(limit=batch_size, cursor=cursor, **filters)
+        for row in rows:
+            yield row
+        if cursor is None:
+            break
+
+# Must match the expression of the GIN index created by scripts/migrate.py,
+# otherwise Postgres falls back to a sequential scan. Title matches weigh
+# more than body matches in ts_rank_cd
+FULL_TEXT_DOCUMENT = (
+    "(setweight(to_tsvector('english', coalesce(n.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(n.content, '') || ' ' || coalesce(n.summary, '')), 'B'))"
+)
+
+# Damping constant for reciprocal-rank fusion, 60 is the value from the
+# original RRF paper and works well without tuning
+RRF_K = 60
+
+def to_search_results(rows: list, scores: dict = None) -> list[NoteSearchResult]:
+    """Hydrate raw search rows into responses, keeping rank order"""
+    with tracing.span("notes.hydrate", rows=len(rows)):
+        return [
+            NoteSearchResult(
+                **row,
+                score=(
+                    scores[row["id"]] if scores is not None
+                    else vector_services.distance_to_similarity(row.get("distance"))
+                ),
+            )
+            for row in rows
+        ]
+
+async def keyword_search(query: str, limit=5):
+    """Full-text search over title, content and summary, ranked by ts_rank_cd"""
+    with tracing.span("notes.keyword_query"):
+        return await prisma.query_raw(
+            f"""
+            SELECT {vector_services.NOTE_COLUMNS},
+                   ts_rank_cd({FULL_TEXT_DOCUMENT}, q) as rank
+            FROM "Note" n, websearch_to_tsquery('english', $1) q
+            WHERE {FULL_TEXT_DOCUMENT} @@ q
+            ORDER BY rank DESC
+            LIMIT $2
+            """,
+            query,
+            limit
+        )
+
+def reciprocal_rank_fusion(*result_lists: list, k: int = RRF_K) -> tuple[list, dict]:
+    """Merge ranked result lists, scoring each note by sum(1 / (k + rank))"""
+    scores = {}
+    rows = {}
+    for results in result_lists:
+        for rank, row in enumerate(results, start=1):
+            scores[row["id"]] = scores.get(row["id"], 0.0) + 1.0 / (k + rank)
+            # Prefer the vector row so the distance is kept in the response
+            rows.setdefault(row["id"], row)
+            if row.get("distance") is not None:
+                rows[row["id"]] = row
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [rows[note_id] for note_id in ranked], scores
+
+async def rerank_by_centrality(results: list[NoteSearchResult], weight: float) -> list[NoteSearchResult]:
+    """Blend relevance with graph centrality (PageRank from graph_analytics).
 
-async def search_notes(query: str, limit=5):
+    Relevance is scaled to [0, 1] within the result set so every search
+    mode blends the same way: score = (1 - weight) * relevance + weight * centrality.
+    """
+    if not results or weight <= 0:
+        return results
+    with tracing.span("notes.centrality", results=len(results)):
+        centrality = await graph_analytics.centrality([result.id for result in results])
+
+    scores = [result.score or 0.0 for result in results]
+    low, high = min(scores), max(scores)
+    for result, score in zip(results, scores):
+        relevance = (score - low) / (high - low) if high > low else 1.0
+        result.score = (1.0 - weight) * relevance + weight * centrality.get(result.id, 0.0)
+    return sorted(results, key=lambda result: result.score, reverse=True)
+
+async def search_notes(
+    query: str,
+    limit=5,
+    mode: str = "semantic",
+    ef_search: int = None,
+    probes: int = None,
+    aggregate: str = "max",
+    centrality: float = 0.0,
+):
+    with tracing.span("notes.search", mode=mode, limit=limit):
+        try:
+            # Re-ranking by centrality needs candidates beyond the final page
+            fetch = max(limit * 3, 20) if centrality > 0 else limit
+
+            if mode == "chunk":
+                # Passage-level search, so long notes match beyond their opening
+                search_results = await vector_services.chunk_search(
+                    query, fetch, aggregate=aggregate, ef_search=ef_search, probes=probes
+                )
+                results = to_search_results(search_results)
+
+            elif mode == "keyword":
+                # Fast path: no encoder, served entirely by the GIN index
+                search_results = await keyword_search(query, fetch)
+                results = to_search_results(
+                    search_results, {row["id"]: row["rank"] for row in search_results}
+                )
+
+            elif mode == "hybrid":
+                # Over-fetch each leg so fusion has enough overlap to work with
+                candidates = max(fetch * 3, 20)
+                keyword_results, vector_results = await asyncio.gather(
+                    keyword_search(query, candidates),
+                    vector_services.semantic_search(
+                        query, candidates, ef_search=ef_search, probes=probes
+                    ),
+                )
+                fused, scores = reciprocal_rank_fusion(keyword_results, vector_results)
+                results = to_search_results(fused[:fetch], scores)
+
+            else:
+                # The vector query selects every response column
+                # (vector_services.NOTE_COLUMNS), so no per-result fetch is needed
+                search_results = await vector_services.semantic_search(
+                    query, fetch, ef_search=ef_search, probes=probes
+                )
+                results = to_search_results(search_results)
+
+            return (await rerank_by_centrality(results, centrality))[:limit]
+        except Exception as e:
+            logger.error(f"Error searching notes: {str(e)}")
+            return []
+
+async def find_related_notes(note_id: str, limit=5):
     try:
-        # Get search results from vector search
-        search_results = await vector_services.semantic_search(query, limit)
-        
-        # Fetch complete note data for each result
-        complete_notes = []
-        for result in search_results:
-            note_id = result["id"]
-            complete_note = await get_note(note_id)
-            if complete_note:
-                complete_notes.append(complete_note)
-        
-        return complete_notes
+        # Reuse the note's stored embedding instead of re-encoding its content
+        search_results = await vector_services.semantic_search_by_note(note_id, limit)
+        return to_search_results(search_results)
     except Exception as e:
-        logger.error(f"Error searching notes: {str(e)}")
-        return []
\ No newline at end of file
+        logger.error(f"Error finding notes related to {note_id}: {str(e)}")
+        return []
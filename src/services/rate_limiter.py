@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Refill and consume the request and token buckets in one atomic step, using
+# the Redis clock so every process shares the same notion of time. Returns
+# the number of milliseconds to wait (0 when the call may proceed) as a
+# string, since Lua numbers are truncated to integers on the way out.
+_ACQUIRE = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + tonumber(now_parts[2]) / 1000
+
+local cooldown = redis.call('PTTL', KEYS[3])
+if cooldown > 0 then
+    return tostring(cooldown)
+end
+
+local function level(key, capacity, rate)
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    return math.min(capacity, tokens + math.max(0, now - ts) * rate)
+end
+
+local request_capacity, request_rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local token_capacity, token_rate = tonumber(ARGV[3]), tonumber(ARGV[4])
+local cost = math.min(tonumber(ARGV[5]), token_capacity)
+
+local requests = level(KEYS[1], request_capacity, request_rate)
+local tokens = level(KEYS[2], token_capacity, token_rate)
+
+local wait = 0
+if requests < 1 then
+    wait = math.max(wait, (1 - requests) / request_rate)
+end
+if tokens < cost then
+    wait = math.max(wait, (cost - tokens) / token_rate)
+end
+if wait == 0 then
+    requests = requests - 1
+    tokens = tokens - cost
+end
+
+redis.call('HSET', KEYS[1], 'tokens', requests, 'ts', now)
+redis.call('HSET', KEYS[2], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+redis.call('PEXPIRE', KEYS[2], 120000)
+return tostring(wait)
+"""
+
+
+class RateLimited(Exception):
+    """The provider is throttling us; retry the work after `retry_after` seconds"""
+
+    def __init__(self, retry_after: float, message: str = None):
+        self.retry_after = retry_after
+        super().__init__(message or f"Rate limited, retry after {retry_after:.1f}s")
+
+
+class RateLimiter:
+    """Token-bucket limiter on requests/min and tokens/min, shared through Redis.
+
+    Every process calling the provider draws from the same buckets. When the
+    provider answers 429/503 anyway, `throttled()` opens a shared cooldown
+    that doubles with each consecutive throttle until a call succeeds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_wait: float = 10.0,
+        backoff_base: float = 2.0,
+        backoff_max: float = 120.0,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._requests_key = f"ratelimit:{name}:requests"
+        self._tokens_key = f"ratelimit:{name}:tokens"
+        self._cooldown_key = f"ratelimit:{name}:cooldown"
+        self._penalty_key = f"ratelimit:{name}:penalty"
+        self._recently_throttled = False
+
+    @staticmethod
+    def estimate_tokens(text_chars: int, output_tokens: int = 256) -> int:
+        """Rough token count for a prompt: ~4 characters per token plus the reply"""
+        return text_chars // 4 + output_tokens
+
+    async def _redis(self):
+        # Imported lazily: redis_service imports the LLM services
+        from src.services import redis_service
+        return redis_service.redis
+
+    async def acquire(self, tokens: int = 1):
+        """Wait until a call costing `tokens` may be made.
+
+        Raises RateLimited when that would take longer than `max_wait`, so
+        queued work can be deferred instead of holding a worker slot.
+        """
+        waited = 0.0
+        while True:
+            try:
+                redis = await self._redis()
+                wait_ms = float(await redis.eval(
+                    _ACQUIRE,
+                    3,
+                    self._requests_key,
+                    self._tokens_key,
+                    self._cooldown_key,
+                    self.requests_per_minute,
+                    self.requests_per_minute / 60000,
+                    self.tokens_per_minute,
+                    self.tokens_per_minute / 60000,
+                    tokens,
+                ))
+            except Exception as e:
+                # Fail open: the provider's own limits still apply
+                logger.warning(f"Rate limiter unavailable: {str(e)}")
+                return
+
+            if wait_ms <= 0:
+                return
+
+            wait = wait_ms / 1000
+            if waited + wait > self.max_wait:
+                raise RateLimited(wait)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def throttled(self) -> float:
+        """Record a provider 429/503 and return the shared cooldown in seconds"""
+        self._recently_throttled = True
+        try:
+            redis = await self._redis()
+            penalty = await redis.incr(self._penalty_key)
+            await redis.expire(self._penalty_key, int(self.backoff_max * 4))
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable: {str(e)}")
+            return self.backoff_base
+
+        cooldown = min(self.backoff_max, self.backoff_base * (2 ** (penalty - 1)))
+        await redis.set(self._cooldown_key, 1, px=int(cooldown * 1000))
+        logger.warning(f"LLM provider throttled us, cooling down for {cooldown:.1f}s")
+        return cooldown
+
+    async def succeeded(self):
+        """Reset the backoff after a successful call"""
+        if not self._recently_throttled:
+            return
+        self._recently_throttled = False
+        try:
+            redis = await self._redis()
+            await redis.delete(self._penalty_key)
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable: {str(e)}")
+
+
+llm_limiter = RateLimiter(
+    "llm",
+    requests_per_minute=settings.llm_requests_per_minute,
+    tokens_per_minute=settings.llm_tokens_per_minute,
+    max_wait=settings.llm_max_wait,
+    backoff_base=settings.llm_backoff_base,
+    backoff_max=settings.llm_backoff_max,
+)
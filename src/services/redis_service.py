@@ -1,53 +1,533 @@
 import json
+import os
+import random
+import socket
+import time
+import uuid
 import asyncio
+import logging
 from redis import asyncio as aioredis
+from redis.exceptions import ResponseError
+from src.core import metrics
 from src.core.config import settings
-from src.services import gemini_service, vector_services
+from src.services import (
+    audit_service, embedding_backfill, gemini_service, graph_analytics, linking_service, note_services,
+    related_service,
+)
+from src.services.rate_limiter import RateLimited
+
+logger = logging.getLogger(__name__)
 
 redis = aioredis.from_url(settings.redis_url)
 
+# Tasks live in a Redis stream read through a consumer group: a task stays in
+# the group's pending list until it is acknowledged, so a crashed worker's
+# tasks are reclaimed by another one after the visibility timeout. Running
+# tasks heartbeat (see _heartbeat), so however long a handler takes, only a
+# dead worker's tasks go idle that long.
+STREAM_KEY = "tasks:stream"
+GROUP_NAME = "workers"
+DELAYED_KEY = "tasks:delayed"
+DEAD_LETTER_KEY = "tasks:dead"
+DEDUPE_PREFIX = "tasks:dedupe:"
+LEGACY_QUEUE_KEY = "tasks"
+
+# Bound the stream so acknowledged history cannot grow without limit
+STREAM_MAXLEN = 100_000
+
 # Task types
 TASK_PROCESS_NOTE = "process_note"
 TASK_UPDATE_EMBEDDING = "update_embedding"
+TASK_ENRICH_BATCH = "enrich_batch"
+TASK_EMBEDDING_BACKFILL = "embedding_backfill"
+TASK_PROMOTE_MODEL = "promote_model"
+TASK_AUTO_LINK = "auto_link"
+TASK_GRAPH_ANALYTICS = "graph_analytics"
+TASK_REFRESH_RELATED = "refresh_related"
+
+CONSUMER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+
+_background_worker: asyncio.Task | None = None
+_background_stop: asyncio.Event | None = None
+
+# Atomically move due retries from the delayed set back onto the stream
+_PROMOTE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, task in ipairs(due) do
+    redis.call('ZREM', KEYS[1], task)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'task', task)
+end
+return #due
+"""
+
+# Schedule (or push back) a debounced task in the delayed set. Its dedupe key
+# holds the time of the first edit of the burst, which caps the delay. A task
+# already moved onto the stream is left alone: it reads the latest content
+# when it runs.
+_DEBOUNCE = """
+local first = redis.call('GET', KEYS[2])
+if first and not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+if not first then
+    first = ARGV[2]
+    redis.call('SET', KEYS[2], first, 'EX', ARGV[5])
+end
+local due = math.min(tonumber(ARGV[2]) + tonumber(ARGV[3]), tonumber(first) + tonumber(ARGV[4]))
+redis.call('ZADD', KEYS[1], due, ARGV[1])
+return 1
+"""
+
+def _dedupe_key(task_type: str, task_id: str) -> str:
+    return f"{DEDUPE_PREFIX}{task_type}:{task_id}"
+
+async def enqueue_task(task_type: str, payload: dict, task_id: str = None) -> bool:
+    """Add a task to the Redis queue.
+
+    Tasks with the same type and `task_id` (the note id for note tasks) are
+    collapsed while one is still waiting to run. Returns False when the
+    task was a duplicate.
+    """
+    task_id = task_id or payload.get("note_id")
+    if task_id is not None:
+        is_new = await redis.set(
+            _dedupe_key(task_type, task_id), 1, nx=True, ex=settings.task_dedupe_ttl
+        )
+        if not is_new:
+            return False
 
-async def enqueue_task(task_type: str, payload: dict):
-    """Add a task to the Redis queue"""
     task_data = {
+        "id": task_id or uuid.uuid4().hex,
         "type": task_type,
-        "payload": payload
+        "payload": payload,
+        "attempts": 0,
     }
-    await redis.lpush("tasks", json.dumps(task_data))
+    try:
+        await redis.xadd(
+            STREAM_KEY, {"task": json.dumps(task_data)}, maxlen=STREAM_MAXLEN, approximate=True
+        )
+    except Exception:
+        if task_id is not None:
+            await redis.delete(_dedupe_key(task_type, task_id))
+        raise
+    return True
+
+async def enqueue_tasks(task_type: str, payloads: list[dict], task_ids: list[str] = None) -> int:
+    """Enqueue many tasks in two pipelined round trips.
+
+    Deduplicates on `task_ids` (default: each payload's note id) like
+    enqueue_task. Returns the number enqueued.
+    """
+    if not payloads:
+        return 0
+
+    task_ids = task_ids or [payload.get("note_id") for payload in payloads]
+    async with redis.pipeline(transaction=False) as pipe:
+        for task_id in task_ids:
+            if task_id is not None:
+                pipe.set(_dedupe_key(task_type, task_id), 1, nx=True, ex=settings.task_dedupe_ttl)
+        claimed = iter(await pipe.execute())
+
+    async with redis.pipeline(transaction=False) as pipe:
+        enqueued = 0
+        for task_id, payload in zip(task_ids, payloads):
+            if task_id is not None and not next(claimed):
+                continue
+            task_data = {
+                "id": task_id or uuid.uuid4().hex,
+                "type": task_type,
+                "payload": payload,
+                "attempts": 0,
+            }
+            pipe.xadd(STREAM_KEY, {"task": json.dumps(task_data)}, maxlen=STREAM_MAXLEN, approximate=True)
+            enqueued += 1
+        await pipe.execute()
+    return enqueued
+
+async def enqueue_debounced(task_type: str, note_id: str, delay: float) -> bool:
+    """Queue a note task to run once the note's edits pause for `delay` seconds.
+
+    Each call pushes the run back, up to DEBOUNCE_MAX_WAIT after the first
+    call of the burst, so N saves in quick succession give one run on the
+    latest content. Returns False when a run is already waiting on the
+    stream, which will see this edit too.
+    """
+    if delay <= 0:
+        return await enqueue_task(task_type, {"note_id": note_id})
+    task_data = {
+        "id": note_id,
+        "type": task_type,
+        "payload": {"note_id": note_id},
+        "attempts": 0,
+    }
+    scheduled = await redis.eval(
+        _DEBOUNCE, 2, DELAYED_KEY, _dedupe_key(task_type, note_id),
+        json.dumps(task_data), time.time(), delay, settings.debounce_max_wait, settings.task_dedupe_ttl,
+    )
+    return bool(scheduled)
+
+async def handle_task(task_obj: dict):
+    """Dispatch a decoded task to its handler"""
+    task_type = task_obj.get("type")
+    payload = task_obj.get("payload", {})
+
+    if task_type == TASK_PROCESS_NOTE:
+        note_id = payload.get("note_id")
+        if note_id:
+            await gemini_service.process_note(note_id)
+
+    elif task_type == TASK_UPDATE_EMBEDDING:
+        note_id = payload.get("note_id")
+        if note_id:
+            await note_services.embed_note(note_id)
+
+    elif task_type == TASK_ENRICH_BATCH:
+        note_ids = payload.get("note_ids")
+        if note_ids:
+            await gemini_service.process_notes_bulk(note_ids)
+
+    elif task_type == TASK_EMBEDDING_BACKFILL:
+        model_name = payload.get("model")
+        if model_name:
+            await embedding_backfill.run_backfill_task(model_name)
+
+    elif task_type == TASK_PROMOTE_MODEL:
+        model_name = payload.get("model")
+        if model_name:
+            await embedding_backfill.run_promotion_task(model_name)
+
+    elif task_type == TASK_AUTO_LINK:
+        if "page" in payload:
+            await linking_service.run_auto_link_page(payload["page"])
+        else:
+            # Queued before runs were paged
+            await linking_service.start_auto_link(
+                k=payload.get("k"),
+                similarity_threshold=payload.get("threshold"),
+                incremental=payload.get("incremental", False),
+            )
+
+    elif task_type == TASK_GRAPH_ANALYTICS:
+        await graph_analytics.run_analytics(force=payload.get("force", False))
+
+    elif task_type == TASK_REFRESH_RELATED:
+        note_id = payload.get("note_id")
+        if note_id:
+            await related_service.refresh_related(note_id, cascade=payload.get("cascade", True))
+
+    else:
+        logger.warning(f"Unknown task type: {task_type}")
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter"""
+    delay = min(settings.task_retry_max_delay, settings.task_retry_base_delay * (2 ** attempts))
+    return random.uniform(delay / 2, delay)
+
+async def _ack(message_id):
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.xack(STREAM_KEY, GROUP_NAME, message_id)
+        pipe.xdel(STREAM_KEY, message_id)
+        await pipe.execute()
+
+async def _fail(message_id, task_obj: dict, error: str):
+    """Schedule a retry with backoff, or dead-letter the task"""
+    attempts = task_obj.get("attempts", 0) + 1
+    task_obj = {**task_obj, "attempts": attempts, "last_error": error}
+
+    async with redis.pipeline(transaction=True) as pipe:
+        if attempts >= settings.task_max_attempts:
+            logger.error(f"Task {task_obj.get('id')} failed {attempts} times, dead-lettering: {error}")
+            pipe.xadd(DEAD_LETTER_KEY, {"task": json.dumps(task_obj), "failed_at": time.time()},
+                      maxlen=STREAM_MAXLEN, approximate=True)
+        else:
+            delay = retry_delay(attempts)
+            logger.warning(f"Task {task_obj.get('id')} failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+            pipe.zadd(DELAYED_KEY, {json.dumps(task_obj): time.time() + delay})
+        pipe.xack(STREAM_KEY, GROUP_NAME, message_id)
+        pipe.xdel(STREAM_KEY, message_id)
+        await pipe.execute()
+
+async def _defer(message_id, task_obj: dict, delay: float):
+    """Put a task back on the queue after `delay` without counting an attempt"""
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zadd(DELAYED_KEY, {json.dumps(task_obj): time.time() + delay})
+        pipe.xack(STREAM_KEY, GROUP_NAME, message_id)
+        pipe.xdel(STREAM_KEY, message_id)
+        await pipe.execute()
+
+def _decode(fields: dict) -> dict:
+    raw = fields.get(b"task") or fields.get("task")
+    return json.loads(raw)
+
+async def _heartbeat(message_id):
+    """Re-claim a running task's message well within the visibility timeout.
+
+    XCLAIM with min-idle 0 resets the message's idle time without counting a
+    delivery, so _reclaim_expired never hands a task that is still running
+    to another worker.
+    """
+    interval = settings.task_visibility_timeout / 3
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await redis.xclaim(
+                STREAM_KEY, GROUP_NAME, CONSUMER_NAME, min_idle_time=0, message_ids=[message_id], justid=True
+            )
+        except Exception as e:
+            logger.warning(f"Task heartbeat failed: {str(e)}")
+
+async def _run_task(message_id, fields: dict, slots: asyncio.Semaphore):
+    task_obj = {}
+    outcome = "failed"
+    started = time.perf_counter()
+    try:
+        task_obj = _decode(fields)
+        if task_obj.get("id"):
+            # Allow the task to be enqueued again from here on: edits made
+            # while it runs must trigger another run
+            await redis.delete(_dedupe_key(task_obj["type"], task_obj["id"]))
+        heartbeat = asyncio.create_task(_heartbeat(message_id))
+        try:
+            await handle_task(task_obj)
+        finally:
+            heartbeat.cancel()
+        await _ack(message_id)
+        outcome = "ok"
+    except RateLimited as e:
+        outcome = "deferred"
+        logger.info(f"Task {task_obj.get('id')} deferred for {e.retry_after:.1f}s: {e}")
+        try:
+            await _defer(message_id, task_obj, e.retry_after)
+        except Exception as defer_error:
+            logger.error(f"Could not defer task: {defer_error}")
+    except Exception as e:
+        logger.exception(f"Error processing task: {e}")
+        try:
+            await _fail(message_id, task_obj, str(e))
+        except Exception as fail_error:
+            # Left pending, the visibility timeout will reclaim it
+            logger.error(f"Could not record task failure: {fail_error}")
+    finally:
+        task_type = task_obj.get("type", "unknown")
+        metrics.TASKS.labels(type=task_type, outcome=outcome).inc()
+        metrics.TASK_SECONDS.labels(type=task_type).observe(time.perf_counter() - started)
+        slots.release()
+
+async def ensure_consumer_group():
+    """Create the consumer group and drain the legacy list queue into it"""
+    try:
+        await redis.xgroup_create(STREAM_KEY, GROUP_NAME, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
 
-async def process_tasks():
-    """Process tasks from the Redis queue"""
     while True:
-        # Block until a task is available, timeout after 1 second
-        task = await redis.brpop("tasks", timeout=1)
-        
-        if task:
-            try:
-                _, task_data = task
-                task_obj = json.loads(task_data)
-                
-                task_type = task_obj.get("type")
-                payload = task_obj.get("payload", {})
-                
-                if task_type == TASK_PROCESS_NOTE:
-                    note_id = payload.get("note_id")
-                    if note_id:
-                        await gemini_service.process_note(note_id)
-                
-                elif task_type == TASK_UPDATE_EMBEDDING:
-                    note_id = payload.get("note_id")
-                    if note_id:
-                        await vector_services.update_note_embedding(note_id)
-                
-            except Exception as e:
-                print(f"Error processing task: {e}")
-        
-        # Small delay to prevent CPU spinning
-        await asyncio.sleep(0.1)
+        legacy = await redis.rpop(LEGACY_QUEUE_KEY, 100)
+        if not legacy:
+            break
+        for raw in legacy:
+            task_obj = json.loads(raw)
+            await enqueue_task(task_obj.get("type"), task_obj.get("payload", {}))
+
+async def promote_due_retries(limit: int = 100) -> int:
+    """Move retries whose backoff has elapsed back onto the stream"""
+    return await redis.eval(_PROMOTE_DUE, 2, DELAYED_KEY, STREAM_KEY, time.time(), limit, STREAM_MAXLEN)
+
+async def _reclaim_expired(count: int) -> list:
+    """Claim tasks whose consumer has held them past the visibility timeout"""
+    _, messages, *_ = await redis.xautoclaim(
+        STREAM_KEY,
+        GROUP_NAME,
+        CONSUMER_NAME,
+        min_idle_time=int(settings.task_visibility_timeout * 1000),
+        start_id="0-0",
+        count=count,
+    )
+    # Redis < 7 reports entries deleted in the meantime with empty fields
+    return [(message_id, fields) for message_id, fields in messages if fields]
+
+async def _read_tasks(count: int, block_ms: int = 1000) -> list:
+    """Read up to `count` new tasks, blocking briefly only when there are none"""
+    response = await redis.xreadgroup(
+        GROUP_NAME, CONSUMER_NAME, {STREAM_KEY: ">"}, count=count, block=block_ms
+    )
+    if not response:
+        return []
+    _, messages = response[0]
+    return messages
+
+async def _audit_maintenance():
+    # Kept apart from the queue reads: a failing audit flush must not stall tasks
+    try:
+        await audit_service.flush_due()
+        await audit_service.prune_due()
+    except Exception as e:
+        logger.error(f"Audit log maintenance failed: {e}")
+
+async def _record_queue_metrics():
+    try:
+        stats = await queue_stats()
+    except Exception as e:
+        logger.error(f"Could not sample queue metrics: {e}")
+        return
+    for state in ("queued", "in_progress", "delayed", "dead"):
+        metrics.QUEUE_DEPTH.labels(state=state).set(stats[state])
+    metrics.QUEUE_OLDEST_AGE.set(stats["oldest_age_s"])
+
+async def _maintain_queue(stop_event: asyncio.Event, batch_size: int):
+    """Once a second: retries due, scheduled jobs, audit upkeep, queue metrics
+    and expired tasks. Runs beside the read loop, so it keeps going while
+    every task slot is busy."""
+    next_queue_sample = 0.0
+    while not stop_event.is_set():
+        try:
+            await promote_due_retries()
+            await graph_analytics.schedule_analytics()
+            await _audit_maintenance()
+            if metrics.ENABLED and time.monotonic() >= next_queue_sample:
+                next_queue_sample = time.monotonic() + 5.0
+                await _record_queue_metrics()
+            for message_id, fields in await _reclaim_expired(batch_size):
+                # A worker died or stalled while holding this task
+                await _fail(message_id, _decode(fields), "visibility timeout expired")
+        except Exception as e:
+            logger.error(f"Queue maintenance failed: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+async def _acquire_slot(slots: asyncio.Semaphore, stop_event: asyncio.Event) -> bool:
+    """Wait for a free task slot, giving up as soon as `stop_event` is set.
+    True when a slot was taken."""
+    acquire = asyncio.create_task(slots.acquire())
+    stopped = asyncio.create_task(stop_event.wait())
+    try:
+        await asyncio.wait({acquire, stopped}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopped.cancel()
+        acquire.cancel()
+        # The slot may have been handed over just as the wait was cancelled
+        await asyncio.gather(acquire, stopped, return_exceptions=True)
+    if acquire.cancelled():
+        return False
+    if stop_event.is_set():
+        slots.release()
+        return False
+    return True
+
+async def process_tasks(
+    concurrency: int = None,
+    batch_size: int = None,
+    stop_event: asyncio.Event = None,
+    drain_timeout: float = None,
+):
+    """Process tasks from the Redis queue.
+
+    Up to `concurrency` tasks run at once. Tasks are read in batches sized
+    to the free slots, so a slow task never blocks the rest of the queue.
+    Every task is acknowledged only after it succeeds; failures are retried
+    with exponential backoff and dead-lettered after `task_max_attempts`.
+    When `stop_event` is set, no more tasks are read and in-flight ones are
+    given `drain_timeout` seconds to finish.
+    """
+    concurrency = concurrency or settings.worker_concurrency
+    batch_size = batch_size or settings.worker_batch_size
+    drain_timeout = settings.worker_drain_timeout if drain_timeout is None else drain_timeout
+    stop_event = stop_event or asyncio.Event()
+
+    await ensure_consumer_group()
+
+    slots = asyncio.Semaphore(concurrency)
+    in_flight: set[asyncio.Task] = set()
+    maintenance = asyncio.create_task(_maintain_queue(stop_event, batch_size))
+
+    while not stop_event.is_set():
+        # Wait for one free slot, then claim any others that are free
+        if not await _acquire_slot(slots, stop_event):
+            break
+        claimed = 1
+        while claimed < batch_size and not slots.locked():
+            await slots.acquire()
+            claimed += 1
+
+        if stop_event.is_set():
+            # Stopped while waiting for a slot: read nothing more
+            for _ in range(claimed):
+                slots.release()
+            break
+
+        messages = []
+        try:
+            messages = await _read_tasks(claimed)
+        except Exception as e:
+            logger.error(f"Error reading task queue: {e}")
+            await asyncio.sleep(1)
+
+        # Give back the slots we did not fill
+        for _ in range(claimed - len(messages)):
+            slots.release()
+
+        for message_id, fields in messages:
+            task = asyncio.create_task(_run_task(message_id, fields, slots))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+    # The maintenance loop and the in-flight tasks share one drain deadline
+    if in_flight:
+        logger.info(f"Draining {len(in_flight)} in-flight task(s)...")
+    _, pending = await asyncio.wait({maintenance, *in_flight}, timeout=drain_timeout)
+    for task in pending:
+        task.cancel()
+    pending.discard(maintenance)
+    if pending:
+        # Unacknowledged, they are picked up again after the visibility timeout
+        logger.warning(f"Cancelled {len(pending)} task(s) still running after {drain_timeout}s")
+
+    # Write out audit events queued since the last flush
+    try:
+        await audit_service.flush()
+    except Exception as e:
+        logger.error(f"Final audit flush failed: {e}")
+
+async def queue_stats() -> dict:
+    """Sizes of the live, pending, delayed and dead-letter queues, and the
+    age of the oldest task still on the stream"""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.xlen(STREAM_KEY)
+        pipe.zcard(DELAYED_KEY)
+        pipe.xlen(DEAD_LETTER_KEY)
+        pipe.xrange(STREAM_KEY, "-", "+", count=1)
+        stream_length, delayed, dead, oldest = await pipe.execute()
+    try:
+        pending = (await redis.xpending(STREAM_KEY, GROUP_NAME))["pending"]
+    except ResponseError:
+        pending = 0
+    return {
+        "queued": max(0, stream_length - pending),
+        "in_progress": pending,
+        "delayed": delayed,
+        "dead": dead,
+        "oldest_age_s": _entry_age(oldest[0][0]) if oldest else 0.0,
+    }
+
+def _entry_age(message_id) -> float:
+    # Stream IDs start with the millisecond timestamp of the XADD
+    if isinstance(message_id, bytes):
+        message_id = message_id.decode()
+    return max(0.0, time.time() - int(message_id.split("-")[0]) / 1000)
 
 async def start_background_worker():
     """Start the background worker to process tasks"""
-    asyncio.create_task(process_tasks())
\ No newline at end of file
+    global _background_worker, _background_stop
+    if not settings.embedded_worker:
+        return
+    _background_stop = asyncio.Event()
+    _background_worker = asyncio.create_task(process_tasks(stop_event=_background_stop))
+
+async def stop_background_worker():
+    """Stop the background worker, letting in-flight tasks finish"""
+    if _background_worker is None:
+        return
+    _background_stop.set()
+    await _background_worker
@@ -0,0 +1,121 @@
+"""Precomputed related-note lists.
+
+Each note's nearest neighbours are stored in Redis as ids and distances
+(`related:{id}`), so /notes/{id}/related is one GET plus a note-cache
+lookup instead of a vector query. A reverse index (`related:rev:{id}`, the
+notes whose lists contain `id`) tells the worker which lists to refresh
+when a note's embedding changes: its own, the ones it appears in, and the
+ones of its new neighbours. Lists older than `related_max_age` are
+recomputed on read, which bounds staleness if a refresh is missed.
+"""
+
+import json
+import logging
+import time
+
+from src.core.config import settings
+from src.schemas.note import NoteSearchResult
+from src.services import note_cache, vector_services
+
+logger = logging.getLogger(__name__)
+
+
+def _list_key(note_id: str) -> str:
+    return f"related:{note_id}"
+
+
+def _reverse_key(note_id: str) -> str:
+    return f"related:rev:{note_id}"
+
+
+def _redis_service():
+    # Imported lazily: redis_service dispatches refresh tasks to this module
+    from src.services import redis_service
+    return redis_service
+
+
+async def compute_related(note_id: str) -> dict:
+    """Run the vector query for a note and store its list, updating the reverse index"""
+    redis = _redis_service().redis
+    rows = await vector_services.semantic_search_by_note(note_id, limit=settings.related_list_size)
+    entry = {
+        "computed_at": time.time(),
+        "model": await vector_services.active_model(),
+        "items": [{"id": row["id"], "distance": float(row["distance"])} for row in rows],
+    }
+
+    previous = await redis.get(_list_key(note_id))
+    old_ids = {item["id"] for item in json.loads(previous)["items"]} if previous else set()
+    new_ids = {item["id"] for item in entry["items"]}
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(_list_key(note_id), json.dumps(entry))
+        for related_id in old_ids - new_ids:
+            pipe.srem(_reverse_key(related_id), note_id)
+        for related_id in new_ids - old_ids:
+            pipe.sadd(_reverse_key(related_id), note_id)
+        await pipe.execute()
+    return entry
+
+
+async def refresh_related(note_id: str, cascade: bool = True):
+    """Worker entry point: recompute a note's list and, if `cascade`, the lists it affects"""
+    redis = _redis_service().redis
+    affected = set(await redis.smembers(_reverse_key(note_id))) if cascade else set()
+    entry = await compute_related(note_id)
+    if not cascade:
+        return
+
+    affected = {member.decode() for member in affected}
+    affected.update(item["id"] for item in entry["items"])
+    affected.discard(note_id)
+    await schedule_refresh(sorted(affected), cascade=False)
+
+
+async def schedule_refresh(note_ids: list[str], cascade: bool = True) -> int:
+    """Queue list refreshes; a note already waiting for one is not queued twice.
+
+    Cascading refreshes dedupe separately, so one waiting without cascade
+    never swallows a request to also update the neighbours' lists.
+    """
+    redis_service = _redis_service()
+    return await redis_service.enqueue_tasks(
+        redis_service.TASK_REFRESH_RELATED,
+        [{"note_id": note_id, "cascade": cascade} for note_id in note_ids],
+        task_ids=[f"{note_id}:cascade" if cascade else note_id for note_id in note_ids],
+    )
+
+
+async def forget(note_id: str):
+    """Drop a deleted note's list and refresh the lists that pointed at it"""
+    redis = _redis_service().redis
+    pointing = [member.decode() for member in await redis.smembers(_reverse_key(note_id))]
+    await redis.delete(_list_key(note_id), _reverse_key(note_id))
+    await schedule_refresh(pointing, cascade=False)
+
+
+async def get_related_notes(note_id: str, limit: int = 5, fresh: bool = False) -> list[NoteSearchResult]:
+    """Related notes from the stored list, recomputing it only when missing, too old or `fresh`"""
+    entry = None
+    if not fresh:
+        stored = await _redis_service().redis.get(_list_key(note_id))
+        if stored:
+            entry = json.loads(stored)
+            too_old = time.time() - entry["computed_at"] > settings.related_max_age
+            if too_old or entry.get("model") != await vector_services.active_model():
+                entry = None
+
+    if entry is None:
+        entry = await compute_related(note_id)
+
+    items = entry["items"][:limit]
+    notes = await note_cache.get_notes([item["id"] for item in items])
+    return [
+        NoteSearchResult(
+            **notes[item["id"]].dict(),
+            distance=item["distance"],
+            score=vector_services.distance_to_similarity(item["distance"]),
+        )
+        for item in items
+        if item["id"] in notes
+    ]
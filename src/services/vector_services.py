@@ -1,69 +1,856 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from src.core import metrics, tracing
+from src.core.config import settings
+from src.core.hashing import content_hash
+from src.core import database
 from src.core.database import prisma
+from src.services.chunking import chunk_text
+
+logger = logging.getLogger(__name__)
+
+
+
+def load_encoder(model_name: str):
+    """Encoder for a model: a client of the shared embedding server if one is
+    configured, else the EMBEDDING_BACKEND model loaded into this process.
+
+    The inference libraries are imported there, not at module level, so
+    importing the app stays fast and processes that never embed never pay
+    for the weights.
+    """
+    if settings.embedding_server_socket:
+        from src.services.embedding_server import RemoteEncoder
+        return RemoteEncoder(settings.embedding_server_socket, model_name)
+
+    from src.services.embedding_backends import load_backend
+    return load_backend(model_name)
+
+
+class EmbeddingEngine:
+    """Runs model.encode off the event loop and coalesces concurrent calls.
+
+    Requests arriving within `max_wait_ms` of each other (or until
+    `max_batch_size` is reached) are encoded together in one forward pass on
+    a worker thread. The model releases the GIL inside torch, so a thread
+    pool keeps the loop responsive without copying the weights per process.
+    The encoder is loaded on first use, on a worker thread.
+    """
+
+    def __init__(self, model_name: str, max_batch_size: int = 32, max_wait_ms: float = 5.0, workers: int = 1):
+        self.model_name = model_name
+        self._encoder = None
+        self._dimension = None
+        self._load_lock = threading.Lock()
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="embedding")
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    @property
+    def ready(self) -> bool:
+        """Encoder loaded and answering (its dimension has been read)"""
+        return self._dimension is not None
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            with self._load_lock:
+                if self._encoder is None:
+                    self._encoder = load_encoder(self.model_name)
+        return self._encoder
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self.encoder.get_sentence_embedding_dimension()
+        return self._dimension
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        encoder = self.encoder
+        metrics.EMBEDDING_BATCH_SIZE.labels(model=self.model_name).observe(len(texts))
+        with metrics.timed(metrics.EMBEDDING_SECONDS, model=self.model_name):
+            vectors = encoder.encode(
+                texts,
+                batch_size=len(texts),
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a single text, sharing a forward pass with concurrent callers"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    async def embed_many(self, texts: list[str]) -> np.ndarray:
+        """Embed a list of texts directly, in chunks of max_batch_size"""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        loop = asyncio.get_running_loop()
+        # Chunk in length order so each forward pass pads to similar lengths
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        chunks = [
+            [texts[i] for i in order[start:start + self.max_batch_size]]
+            for start in range(0, len(texts), self.max_batch_size)
+        ]
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, self._encode, chunk) for chunk in chunks)
+        )
+        vectors = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.vstack(results)
+        return vectors
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: list[tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._encode, texts
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def shutdown(self):
+        """Stop the worker threads once in-flight batches complete"""
+        self._executor.shutdown(wait=True)
+
+
+class EmbeddingCache:
+    """Content-hash keyed embedding cache.
+
+    An in-process LRU bounded by `max_entries` sits in front of an optional
+    Redis tier that stores raw float32 bytes, so identical text is only ever
+    encoded once per model across API and worker processes.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 10000, use_redis: bool = True, redis_ttl: int = 0):
+        self.model_name = model_name
+        self.max_entries = max(0, max_entries)
+        self.use_redis = use_redis
+        self.redis_ttl = redis_ttl
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return f"embedding:{self.model_name}:{content_hash(text)}"
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if self.max_entries == 0:
+            return
+        vector.setflags(write=False)
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, text: str) -> np.ndarray | None:
+        key = self.key(text)
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+        if self.use_redis:
+            try:
+                # Imported lazily: redis_service imports this module
+                from src.services import redis_service
+                blob = await redis_service.redis.get(key)
+            except Exception as e:
+                logger.warning(f"Embedding cache read failed: {str(e)}")
+                blob = None
+            if blob:
+                vector = np.frombuffer(blob, dtype=np.float32).copy()
+                self._remember(key, vector)
+                self.redis_hits += 1
+                return vector
+
+        self.misses += 1
+        return None
+
+    async def put(self, text: str, vector: np.ndarray):
+        key = self.key(text)
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        self._remember(key, vector)
+
+        if self.use_redis:
+            try:
+                from src.services import redis_service
+                await redis_service.redis.set(key, vector.tobytes(), ex=self.redis_ttl or None)
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.redis_hits) / lookups if lookups else 0.0,
+        }
+
+
+# One engine and cache per embedding model, so a new model can be backfilled
+# while the current one keeps serving
+_engines: dict[str, EmbeddingEngine] = {}
+_caches: dict[str, EmbeddingCache] = {}
+
+
+def get_engine(model_name: str = None) -> EmbeddingEngine:
+    """Engine for the given model (default: the configured one), loading it on first use"""
+    model_name = model_name or settings.embedding_model
+    if model_name not in _engines:
+        _engines[model_name] = EmbeddingEngine(
+            model_name,
+            max_batch_size=settings.embedding_max_batch_size,
+            max_wait_ms=settings.embedding_max_wait_ms,
+            workers=settings.embedding_workers,
+        )
+    return _engines[model_name]
+
+
+def get_cache(model_name: str = None) -> EmbeddingCache:
+    model_name = model_name or settings.embedding_model
+    if model_name not in _caches:
+        _caches[model_name] = EmbeddingCache(
+            model_name,
+            max_entries=settings.embedding_cache_size,
+            use_redis=settings.embedding_cache_redis,
+            redis_ttl=settings.embedding_cache_ttl,
+        )
+    return _caches[model_name]
+
+
+engine = get_engine()
+cache = get_cache()
+
+
+def preload(model_name: str = None):
+    """Load a model now instead of on first use (e.g. before forking workers).
+
+    Reading the dimension also checks that a configured embedding server answers.
+    """
+    get_engine(model_name).dimension
+
+
+async def warm_up(model_name: str = None):
+    """Load a model on a worker thread so the event loop keeps serving"""
+    try:
+        await asyncio.to_thread(preload, model_name)
+    except Exception as e:
+        logger.error(f"Could not load embedding model: {str(e)}")
+
+
+def is_ready(model_name: str = None) -> bool:
+    return get_engine(model_name).ready
+
+# The serving model can be switched at runtime by promoting a backfilled one
+# (see embedding_backfill); processes pick the change up within the TTL
+ACTIVE_MODEL_KEY = "embedding:active_model"
+ACTIVE_MODEL_TTL = 10.0
+_active_model = (settings.embedding_model, 0.0)
+
+
+# Model whose vectors Note.embedding holds, recorded as the column comment
+# by embedding_backfill's swap (NULL until the first promotion). Writes
+# check it, so a process that has not yet seen a promotion cannot store
+# old-model vectors under the new model's column.
+SQL_COLUMN_MODEL = """
+    col_description('"Note"'::regclass, (
+        SELECT attnum FROM pg_attribute
+        WHERE attrelid = '"Note"'::regclass AND attname = 'embedding'
+    ))
+"""
+
+
+async def active_model() -> str:
+    """Name of the model whose vectors are currently stored in Note.embedding"""
+    global _active_model
+    name, checked_at = _active_model
+    now = asyncio.get_running_loop().time()
+    if now - checked_at < ACTIVE_MODEL_TTL:
+        return name
+
+    try:
+        # Imported lazily: redis_service imports this module
+        from src.services import redis_service
+        stored = await redis_service.redis.get(ACTIVE_MODEL_KEY)
+        if stored:
+            name = stored.decode()
+        else:
+            # The key is gone (flushed or evicted): the column comment still
+            # records the promoted model, so restore the key from it
+            rows = await prisma.query_raw(f"SELECT {SQL_COLUMN_MODEL} AS model")
+            name = rows[0]["model"] if rows and rows[0]["model"] else settings.embedding_model
+            await redis_service.redis.set(ACTIVE_MODEL_KEY, name, nx=True)
+    except Exception as e:
+        logger.warning(f"Could not read active embedding model: {str(e)}")
+    _active_model = (name, now)
+    return name
+
+
+def set_active_model(name: str):
+    """Switch this process to a new serving model immediately"""
+    global _active_model
+    _active_model = (name, 0.0)
+
+
+def to_vector_literal(embedding) -> str:
+    """Turn an embedding into the '[0.1,0.2,…]' literal Postgres expects"""
+    return f"[{','.join(str(float(x)) for x in embedding)}]"
+
+
+async def create_embedding(text: str, model_name: str = None) -> np.ndarray:
+    """Create a float32 vector embedding for the given text"""
+    model_name = model_name or await active_model()
+    model_cache = get_cache(model_name)
+    with tracing.span("embedding.create", model=model_name):
+        vector = await model_cache.get(text)
+        if vector is None:
+            vector = await get_engine(model_name).embed(text)
+            await model_cache.put(text, vector)
+    return vector
+
+
+async def create_embeddings(texts: list[str], model_name: str = None) -> np.ndarray:
+    """Create float32 embeddings for many texts, one row per text"""
+    model_name = model_name or await active_model()
+    model_engine = get_engine(model_name)
+    model_cache = get_cache(model_name)
+    if not texts:
+        return await model_engine.embed_many([])
+
+    cached = await asyncio.gather(*(model_cache.get(text) for text in texts))
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+
+    fresh = {}
+    if missing:
+        with tracing.span("embedding.create_many", model=model_name, texts=len(missing)):
+            vectors = await model_engine.embed_many(missing)
+        for text, vector in zip(missing, vectors):
+            await model_cache.put(text, vector)
+            fresh[text] = vector
+
+    return np.vstack([
+        vector if vector is not None else fresh[text]
+        for text, vector in zip(texts, cached)
+    ])
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for the embedding caches, per model"""
+    return {name: model_cache.stats() for name, model_cache in _caches.items()}
+
+
+async def write_embedding(note_id: str, embedding: np.ndarray, text_hash: str, model_name: str) -> bool:
+    """Store one note embedding with the model and content hash that produced it.
+
+    The write only applies while the note still holds the content that was
+    embedded, so a slow run never overwrites the vector of a newer edit, and
+    while `model_name` is still the one serving. Returns False when it was
+    discarded. Uses the binary asyncpg path when the pool is available.
+    """
+    # Same digest as src.core.hashing.content_hash
+    sql = f'''
+        UPDATE "Note"
+        SET embedding = $1::vector,
+            "embeddingModel" = $3,
+            "embeddingHash" = $4,
+            "embeddedAt" = now()
+        WHERE id = $2 AND encode(sha256(convert_to(content, 'UTF8')), 'hex') = $4
+          AND coalesce({SQL_COLUMN_MODEL}, $3) = $3
+    '''
+    if database.pg_pool is not None:
+        result = await database.pg_pool.execute(
+            sql, np.asarray(embedding, dtype=np.float32), note_id, model_name, text_hash
+        )
+        return int(result.split()[-1]) > 0
+
+    return await prisma.execute_raw(sql, to_vector_literal(embedding), note_id, model_name, text_hash) > 0
+
+
+async def write_staged_embeddings(note_ids: list[str], embeddings: np.ndarray, text_hashes: list[str], model_name: str):
+    """Upsert vectors for a model that is not serving yet into NoteEmbedding"""
+    if not note_ids:
+        return
+
+    if database.pg_pool is not None:
+        await database.pg_pool.executemany(
+            '''
+            INSERT INTO "NoteEmbedding" ("noteId", model, "contentHash", embedding, "updatedAt")
+            VALUES ($1, $2, $3, $4, now())
+            ON CONFLICT ("noteId", model) DO UPDATE
+            SET "contentHash" = EXCLUDED."contentHash",
+                embedding = EXCLUDED.embedding,
+                "updatedAt" = now()
+            ''',
+            [
+                (note_id, model_name, text_hash, np.asarray(embedding, dtype=np.float32))
+                for note_id, embedding, text_hash in zip(note_ids, embeddings, text_hashes)
+            ],
+        )
+        return
 
-# Initialize the sentence transformer model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+    rows = [
+        {"noteId": note_id, "contentHash": text_hash, "embedding": to_vector_literal(embedding)}
+        for note_id, embedding, text_hash in zip(note_ids, embeddings, text_hashes)
+    ]
+    await prisma.execute_raw(
+        '''
+        INSERT INTO "NoteEmbedding" ("noteId", model, "contentHash", embedding, "updatedAt")
+        SELECT v."noteId", $2, v."contentHash", v.embedding::vector, now()
+        FROM jsonb_to_recordset($1::jsonb) AS v("noteId" text, "contentHash" text, embedding text)
+        ON CONFLICT ("noteId", model) DO UPDATE
+        SET "contentHash" = EXCLUDED."contentHash",
+            embedding = EXCLUDED.embedding,
+            "updatedAt" = now()
+        ''',
+        json.dumps(rows),
+        model_name,
+    )
 
-async def create_embedding(text: str):
-    """Create a vector embedding for the given text"""
-    return model.encode(text).tolist()
 
 async def update_note_embedding(note_id: str, text: str = None):
-    """Update the embedding for a note"""
+    """Update the embedding for a note.
+
+    Returns False when the note's content changed while it was embedded, or
+    a promotion replaced this process's serving model meanwhile.
+    """
     if text is None:
         note = await prisma.note.find_unique(where={"id": note_id})
         if not note:
             return None
         text = note.content
-    
-    embedding = await create_embedding(text)
-    
-    # turn embedding into the '[0.1,0.2,…]' literal Postgres expects
-    vector_literal = f"[{','.join(str(x) for x in embedding)}]"
-    
-    
-    # return await prisma.note.update(
-    #     where={"id": note_id},
-    #     data={"embedding": embedding}
-    # )
-    
-    await prisma.execute_raw(
+
+    text_hash = content_hash(text)
+    model_name = await active_model()
+    embedding = await create_embedding(text, model_name)
+    if not await write_embedding(note_id, embedding, text_hash, model_name):
+        return False
+
+    # Keep a model being backfilled current, so its backfill never falls behind
+    target = settings.embedding_target_model
+    if target and target != model_name:
+        staged = await create_embedding(text, target)
+        await write_staged_embeddings([note_id], [staged], [text_hash], target)
+        if settings.chunk_embeddings:
+            await update_note_chunks([note_id], [text], target)
+
+    if settings.chunk_embeddings:
+        await update_note_chunks([note_id], [text], model_name)
+
+    return True
+
+
+async def update_note_embeddings(note_ids: list[str], embeddings: np.ndarray, text_hashes: list[str], model_name: str):
+    """Write many note embeddings in a single UPDATE.
+
+    Like write_embedding, a row is only written while the note still holds
+    the content its vector was computed from and `model_name` is still the
+    one serving. Returns the number of notes written.
+    """
+    if not note_ids:
+        return 0
+
+    if database.pg_pool is not None:
+        # COPY the binary vectors into a scratch table, then apply them in
+        # one UPDATE ... FROM
+        async with database.pg_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    'CREATE TEMP TABLE note_embedding_batch (id text, "contentHash" text, embedding vector) ON COMMIT DROP'
+                )
+                await conn.copy_records_to_table(
+                    "note_embedding_batch",
+                    records=zip(note_ids, text_hashes, np.asarray(embeddings, dtype=np.float32)),
+                    columns=["id", "contentHash", "embedding"],
+                )
+                result = await conn.execute(
+                    f'''
+                    UPDATE "Note" n
+                    SET embedding = v.embedding,
+                        "embeddingModel" = $1,
+                        "embeddingHash" = v."contentHash",
+                        "embeddedAt" = now()
+                    FROM note_embedding_batch v
+                    WHERE n.id = v.id
+                      AND encode(sha256(convert_to(n.content, 'UTF8')), 'hex') = v."contentHash"
+                      AND coalesce({SQL_COLUMN_MODEL}, $1) = $1
+                    ''',
+                    model_name,
+                )
+        return int(result.split()[-1])
+
+    rows = [
+        {"id": note_id, "contentHash": text_hash, "embedding": to_vector_literal(embedding)}
+        for note_id, embedding, text_hash in zip(note_ids, embeddings, text_hashes)
+    ]
+    return await prisma.execute_raw(
+        f'''
+        UPDATE "Note" n
+        SET embedding = v.embedding::vector,
+            "embeddingModel" = $2,
+            "embeddingHash" = v."contentHash",
+            "embeddedAt" = now()
+        FROM jsonb_to_recordset($1::jsonb) AS v(id text, "contentHash" text, embedding text)
+        WHERE n.id = v.id
+          AND encode(sha256(convert_to(n.content, 'UTF8')), 'hex') = v."contentHash"
+          AND coalesce({SQL_COLUMN_MODEL}, $2) = $2
+        ''',
+        json.dumps(rows),
+        model_name,
+    )
+
+
+# Replaces a set of notes' chunks for one model in one statement; a model
+# being backfilled keeps its own chunks next to the serving model's. Chunks
+# arriving without a vector keep the one stored for identical text, so only
+# edited passages are ever re-encoded.
+_REPLACE_CHUNKS_SQL = '''
+    WITH incoming AS ({source}),
+    removed AS (
+        DELETE FROM "NoteChunk" c
+        WHERE c."noteId" IN (SELECT jsonb_array_elements_text($1::jsonb)) AND c.model = $2
+        RETURNING c."noteId", c."contentHash", c.model, c.embedding
+    )
+    INSERT INTO "NoteChunk" (id, "noteId", ord, content, "contentHash", "startOffset", "endOffset", embedding, model, "updatedAt")
+    SELECT gen_random_uuid()::text, i."noteId", i.ord, i.content, i."contentHash", i."startOffset", i."endOffset",
+           COALESCE(i.embedding, (
+               SELECT r.embedding FROM removed r
+               WHERE r."noteId" = i."noteId" AND r."contentHash" = i."contentHash" AND r.model = $2
+               LIMIT 1
+           )),
+           $2, now()
+    FROM incoming i
+'''
+
+
+async def update_note_chunks(note_ids: list[str], texts: list[str], model_name: str = None) -> int:
+    """Re-chunk notes and embed only the chunks whose text is new.
+
+    Returns the number of chunks that had to be encoded.
+    """
+    if not note_ids:
+        return 0
+    model_name = model_name or await active_model()
+
+    chunks = [
+        (note_id, chunk)
+        for note_id, text in zip(note_ids, texts)
+        for chunk in chunk_text(text, settings.chunk_max_chars, settings.chunk_overlap_chars)
+    ]
+    stored = await prisma.query_raw(
         '''
-        UPDATE "Note"
-        SET embedding = $1::vector
-        WHERE id = $2
+        SELECT DISTINCT "noteId", "contentHash" FROM "NoteChunk"
+        WHERE "noteId" IN (SELECT jsonb_array_elements_text($1::jsonb))
+          AND model = $2 AND embedding IS NOT NULL
         ''',
-        vector_literal,
-        note_id,
+        json.dumps(note_ids),
+        model_name,
     )
+    stored = {(row["noteId"], row["contentHash"]) for row in stored}
+
+    changed = [
+        index for index, (note_id, chunk) in enumerate(chunks)
+        if (note_id, chunk.hash) not in stored
+    ]
+    vectors = dict(zip(changed, await create_embeddings([chunks[i][1].text for i in changed], model_name)))
+
+    if database.pg_pool is not None:
+        async with database.pg_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    '''
+                    CREATE TEMP TABLE note_chunk_batch (
+                        "noteId" text, ord int, content text, "contentHash" text,
+                        "startOffset" int, "endOffset" int, embedding vector
+                    ) ON COMMIT DROP
+                    '''
+                )
+                await conn.copy_records_to_table(
+                    "note_chunk_batch",
+                    records=[
+                        (note_id, chunk.ord, chunk.text, chunk.hash, chunk.start, chunk.end, vectors.get(index))
+                        for index, (note_id, chunk) in enumerate(chunks)
+                    ],
+                    columns=["noteId", "ord", "content", "contentHash", "startOffset", "endOffset", "embedding"],
+                )
+                await conn.execute(
+                    _REPLACE_CHUNKS_SQL.format(source="SELECT * FROM note_chunk_batch"),
+                    json.dumps(note_ids),
+                    model_name,
+                )
+        return len(changed)
+
+    rows = [
+        {
+            "noteId": note_id,
+            "ord": chunk.ord,
+            "content": chunk.text,
+            "contentHash": chunk.hash,
+            "startOffset": chunk.start,
+            "endOffset": chunk.end,
+            "embedding": to_vector_literal(vectors[index]) if index in vectors else None,
+        }
+        for index, (note_id, chunk) in enumerate(chunks)
+    ]
+    await prisma.execute_raw(
+        _REPLACE_CHUNKS_SQL.format(source='''
+            SELECT r."noteId", r.ord, r.content, r."contentHash", r."startOffset", r."endOffset",
+                   r.embedding::vector AS embedding
+            FROM jsonb_to_recordset($3::jsonb) AS r(
+                "noteId" text, ord int, content text, "contentHash" text,
+                "startOffset" int, "endOffset" int, embedding text
+            )
+        '''),
+        json.dumps(note_ids),
+        model_name,
+        json.dumps(rows),
+    )
+    return len(changed)
+
+
+# Every NoteResponse column of a "Note" n row. Search queries and list_notes'
+# full projection all select exactly these, so results carry the same fields
+# whichever path produced them
+NOTE_COLUMNS = 'n.id, n.content, n.summary, n.tags, n.title, n."isArchived", n."isPinned", n."createdAt", n."updatedAt"'
+
+# pgvector operators and operator classes for each supported metric. MiniLM
+# embeddings are unit-normalised, so cosine and L2 rank identically, but the
+# operator used in queries must match the index opclass for it to be used.
+DISTANCE_OPERATORS = {"cosine": "<=>", "l2": "<->"}
+OPERATOR_CLASSES = {"cosine": "vector_cosine_ops", "l2": "vector_l2_ops"}
+
+
+def distance_operator(metric: str | None = None) -> str:
+    metric = metric or settings.vector_metric
+    if metric not in DISTANCE_OPERATORS:
+        raise ValueError(f"Unsupported vector metric: {metric}")
+    return DISTANCE_OPERATORS[metric]
+
+
+def distance_to_similarity(distance: float, metric: str | None = None) -> float:
+    """Convert a pgvector distance into a [-1, 1] similarity for unit vectors"""
+    if distance is None:
+        return None
+    if (metric or settings.vector_metric) == "l2":
+        return 1.0 - (float(distance) ** 2) / 2.0
+    return 1.0 - float(distance)
 
-    return True
 
+def similarity_to_distance(similarity: float, metric: str | None = None) -> float:
+    """Inverse of distance_to_similarity, for turning a threshold into a distance bound"""
+    if (metric or settings.vector_metric) == "l2":
+        return (2.0 * max(0.0, 1.0 - float(similarity))) ** 0.5
+    return 1.0 - float(similarity)
 
-async def semantic_search(query: str, limit=5):
+
+async def query_vectors(sql: str, *args, ef_search: int = None, probes: int = None, operation: str = "query"):
+    """Run a vector query, applying per-query ANN tuning when requested.
+
+    NumPy arguments are sent through pgvector's binary codec when the
+    asyncpg pool is available, and as text literals through Prisma otherwise.
+    Returns a list of dicts either way. `operation` labels the query in
+    metrics and traces.
+    """
+    with tracing.span("vector.query", operation=operation), \
+            metrics.timed(metrics.VECTOR_QUERY_SECONDS, operation=operation):
+        return await _query_vectors(sql, *args, ef_search=ef_search, probes=probes)
+
+
+async def _query_vectors(sql: str, *args, ef_search: int = None, probes: int = None):
+    if database.pg_pool is not None:
+        async with database.pg_pool.acquire() as conn:
+            # SET LOCAL only lasts for the transaction, so the tuning cannot
+            # leak into other queries sharing the pooled connection
+            async with conn.transaction():
+                if ef_search is not None:
+                    await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+                if probes is not None:
+                    await conn.execute(f"SET LOCAL ivfflat.probes = {int(probes)}")
+                rows = await conn.fetch(sql, *args)
+        return [dict(row) for row in rows]
+
+    args = [to_vector_literal(arg) if isinstance(arg, np.ndarray) else arg for arg in args]
+    if ef_search is None and probes is None:
+        return await prisma.query_raw(sql, *args)
+
+    async with prisma.tx() as tx:
+        if ef_search is not None:
+            await tx.execute_raw(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+        if probes is not None:
+            await tx.execute_raw(f"SET LOCAL ivfflat.probes = {int(probes)}")
+        return await tx.query_raw(sql, *args)
+
+
+async def semantic_search(query: str, limit=5, ef_search: int = None, probes: int = None):
     """Find notes semantically similar to the query"""
-    
+
     # Get embedding for query
     query_embedding = await create_embedding(query)
-    
-    # Make sure query_embedding is a list of numbers
-    if not query_embedding or not isinstance(query_embedding, list):
+
+    if query_embedding is None or query_embedding.size == 0:
         return []
-    
-    # Convert the list to a string format PostgreSQL can use for vector type
-    vector_str = f"[{','.join(str(x) for x in query_embedding)}]"
-    
+
     # Raw SQL for vector search since Prisma doesn't directly support vector operations
-    results = await prisma.query_raw(
-        """
-        SELECT n.id, n.content, n.summary, n.tags,
-               n.embedding <-> $1::vector as distance
+    results = await query_vectors(
+        f"""
+        SELECT {NOTE_COLUMNS},
+               n.embedding {distance_operator()} $1::vector as distance
+        FROM "Note" n
+        WHERE n.embedding IS NOT NULL
+        ORDER BY distance
+        LIMIT $2
+        """,
+        query_embedding,
+        limit,
+        ef_search=ef_search,
+        probes=probes,
+        operation="semantic_search",
+    )
+
+    return results
+
+
+async def semantic_search_by_note(note_id: str, limit=5, ef_search: int = None, probes: int = None):
+    """Find notes similar to an existing note using its stored embedding"""
+    # The source embedding is a scalar subquery so the planner evaluates it
+    # once and can still drive the ANN index with it
+    results = await query_vectors(
+        f"""
+        SELECT {NOTE_COLUMNS},
+               n.embedding {distance_operator()} (
+                   SELECT embedding FROM "Note" WHERE id = $1
+               ) as distance
         FROM "Note" n
+        WHERE n.id <> $1
+          AND n.embedding IS NOT NULL
+          AND EXISTS (SELECT 1 FROM "Note" WHERE id = $1 AND embedding IS NOT NULL)
         ORDER BY distance
         LIMIT $2
         """,
-        vector_str,
-        limit
+        note_id,
+        limit,
+        ef_search=ef_search,
+        probes=probes,
+        operation="similar_notes",
     )
-    
-    return results
\ No newline at end of file
+    if results:
+        return results
+
+    note = await prisma.note.find_unique(where={"id": note_id})
+    if not note:
+        return []
+
+    embedded = await prisma.query_raw(
+        'SELECT 1 FROM "Note" WHERE id = $1 AND embedding IS NOT NULL',
+        note_id,
+    )
+    if embedded:
+        return []
+
+    # The note has not been embedded yet, fall back to encoding its content
+    results = await semantic_search(note.content, limit + 1, ef_search=ef_search, probes=probes)
+    return [r for r in results if r["id"] != note_id][:limit]
+
+
+# How chunk distances are combined into one note score
+CHUNK_AGGREGATES = {"max": "min(h.distance)", "mean": "avg(h.distance)"}
+
+
+async def chunk_search(query: str, limit=5, aggregate: str = "max", ef_search: int = None, probes: int = None):
+    """Search note passages and rank notes by their matching chunks.
+
+    `max` scores a note by its best passage, `mean` by the average of its
+    passages among the nearest hits (favouring notes that match throughout).
+    Each row carries the best matching passage and its offsets.
+    """
+    if aggregate not in CHUNK_AGGREGATES:
+        raise ValueError(f"Unknown chunk aggregate: {aggregate}")
+
+    # While a new model is being backfilled, its chunks sit next to the
+    # serving model's; query one model's with its own query vector
+    model_name = await active_model()
+    query_embedding = await create_embedding(query, model_name)
+    if query_embedding is None or query_embedding.size == 0:
+        return []
+
+    # Over-fetch chunks so notes with several matching passages still yield
+    # `limit` distinct notes
+    candidates = max(limit * settings.chunk_search_candidates, limit)
+    return await query_vectors(
+        f"""
+        WITH hits AS (
+            SELECT c."noteId", c.content, c."startOffset", c."endOffset",
+                   c.embedding {distance_operator()} $1::vector AS distance
+            FROM "NoteChunk" c
+            WHERE c.embedding IS NOT NULL AND c.model = $4
+            ORDER BY distance
+            LIMIT $2
+        ),
+        notes AS (
+            SELECT h."noteId",
+                   {CHUNK_AGGREGATES[aggregate]} AS distance,
+                   (array_agg(h.content ORDER BY h.distance))[1] AS passage,
+                   (array_agg(h."startOffset" ORDER BY h.distance))[1] AS "passageStart",
+                   (array_agg(h."endOffset" ORDER BY h.distance))[1] AS "passageEnd"
+            FROM hits h
+            GROUP BY h."noteId"
+        )
+        SELECT {NOTE_COLUMNS},
+               m.distance, m.passage, m."passageStart", m."passageEnd"
+        FROM notes m
+        JOIN "Note" n ON n.id = m."noteId"
+        ORDER BY m.distance
+        LIMIT $3
+        """,
+        query_embedding,
+        candidates,
+        limit,
+        model_name,
+        ef_search=ef_search,
+        probes=probes,
+        operation="chunk_search",
+    )
+
+
+def shutdown():
+    """Release the embedding worker threads"""
+    for model_engine in _engines.values():
+        model_engine.shutdown()
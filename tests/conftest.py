@@ -0,0 +1,6 @@
+import os
+
+# Settings require these at import; unit tests never connect to anything
+os.environ.setdefault("DATABASE_URL", "postgresql://test@localhost:5432/test")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
+os.environ.setdefault("GEMINI_API_KEY", "test")
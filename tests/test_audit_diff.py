@@ -0,0 +1,44 @@
+from src.services.audit_service import PATCH_MIN_CHARS, apply_patch, diff_fields, snapshot
+
+
+def long_text(lines):
+    return "".join(f"Line {i}: {'words ' * 8}\n" for i in lines)
+
+
+def test_unchanged_fields_are_left_out():
+    note = {"title": "T", "content": "c", "tags": ["a"], "isPinned": False}
+    assert diff_fields(note, dict(note)) == {}
+
+
+def test_short_fields_store_old_and_new():
+    changes = diff_fields(
+        {"title": "Old", "tags": ["a"], "isPinned": False},
+        {"title": "New", "tags": ["a", "b"], "isPinned": True},
+    )
+    assert changes == {"title": ["Old", "New"], "tags": [["a"], ["a", "b"]], "isPinned": [False, True]}
+
+
+def test_only_audited_fields_are_diffed():
+    assert diff_fields({"embeddingHash": "x"}, {"embeddingHash": "y"}) == {}
+
+
+def test_long_text_is_stored_as_a_patch_that_replays():
+    old = long_text(range(20))
+    new = long_text([0, 1, 2, 99, 4, 5]) + long_text(range(8, 20)) + "A new last line without newline"
+    assert len(old) > PATCH_MIN_CHARS
+
+    patch = diff_fields({"content": old}, {"content": new})["content"]["patch"]
+    assert apply_patch(old, patch) == new
+    # Only the edited lines are stored
+    assert sum(len(replacement) for _, _, replacement in patch) < len(new) // 2
+
+
+def test_patch_from_and_to_empty_text():
+    text = long_text(range(10))
+    for old, new in ((text, ""), ("x" * (PATCH_MIN_CHARS + 1), text)):
+        patch = diff_fields({"content": old}, {"content": new})["content"]["patch"]
+        assert apply_patch(old, patch) == new
+
+
+def test_snapshot_skips_empty_fields():
+    assert snapshot({"title": "", "content": "c", "tags": [], "metadata": {}, "summary": None}) == {"content": "c"}
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from src.services import linking_service
+
+
+class FakeRedis:
+    """Strings and hashes, enough for the auto-link run state"""
+
+    def __init__(self):
+        self.data = {}
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def hgetall(self, key):
+        return {field.encode(): value for field, value in self.data.get(key, {}).items()}
+
+    async def set(self, key, value):
+        self.data[key] = self._encode(value)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({field: self._encode(value) for field, value in mapping.items()})
+
+    async def hincrby(self, key, field, amount):
+        current = int(self.data.setdefault(key, {}).get(field, b"0"))
+        self.data[key][field] = self._encode(current + amount)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands and applies them on execute"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+        return lambda *args, **kwargs: self.calls.append(method(*args, **kwargs))
+
+    async def execute(self):
+        return [await call for call in self.calls]
+
+
+@pytest.fixture
+def corpus(monkeypatch):
+    """Six notes, two per page, each with one neighbour"""
+    redis = FakeRedis()
+    queued = []
+    ids = [f"n{i}" for i in range(6)]
+
+    async def find_neighbours(after_id, since, k, max_distance, batch_size):
+        page = [note_id for note_id in ids if note_id > after_id][:2]
+        if not page:
+            return [], None
+        return [{"source": note_id, "target": "n0", "distance": 0.1} for note_id in page], page[-1]
+
+    async def upsert_links(pairs):
+        return len(pairs)
+
+    async def enqueue(page):
+        queued.append(page)
+        return True
+
+    async def query_raw(sql, *params):
+        return [{"now": "2025-06-01 12:00:00.000"}]
+
+    monkeypatch.setattr(linking_service, "_redis_service", lambda: type("R", (), {"redis": redis}))
+    monkeypatch.setattr(linking_service, "find_neighbours", find_neighbours)
+    monkeypatch.setattr(linking_service, "upsert_links", upsert_links)
+    monkeypatch.setattr(linking_service, "_enqueue_auto_link_page", enqueue)
+    monkeypatch.setattr(linking_service.prisma, "query_raw", query_raw, raising=False)
+    return redis, queued
+
+
+def test_runs_one_page_per_task_and_saves_the_checkpoint(corpus):
+    redis, queued = corpus
+
+    async def run():
+        await linking_service.start_auto_link(k=3, similarity_threshold=0.5)
+        while queued:
+            page = queued.pop(0)
+            stats = await linking_service.run_auto_link_page(page)
+            if stats:
+                return stats
+            run = await linking_service._auto_link_run()
+            assert run["page"] == str(page + 1) and run["after_id"] == f"n{2 * page + 1}"
+
+    stats = asyncio.run(run())
+    assert stats["notes_with_links"] == 6 and stats["links_created"] == 6
+    assert linking_service.AUTO_LINK_RUN_KEY not in redis.data
+    assert redis.data[linking_service.AUTO_LINK_SINCE_KEY] == b"2025-06-01 12:00:00.000"
+
+
+def test_a_second_copy_of_a_page_does_nothing(corpus):
+    redis, queued = corpus
+
+    async def run():
+        await linking_service.start_auto_link()
+        await linking_service.run_auto_link_page(0)
+        # Redelivered or enqueued again by a resume while page 0 ran
+        await linking_service.run_auto_link_page(0)
+        return await linking_service._auto_link_run()
+
+    run = asyncio.run(run())
+    assert run["page"] == "1" and run["links_created"] == "2"
+    assert queued == [0, 1]
+
+
+def test_starting_again_resumes_the_run_in_progress(corpus):
+    redis, queued = corpus
+
+    async def run():
+        await linking_service.start_auto_link(k=3)
+        await linking_service.run_auto_link_page(0)
+        return await linking_service.start_auto_link(k=10)
+
+    started = asyncio.run(run())
+    assert started["run"]["k"] == "3" and started["run"]["page"] == "1"
+    assert queued == [0, 1, 1]
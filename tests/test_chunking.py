@@ -0,0 +1,59 @@
+from src.core.hashing import content_hash
+from src.services.chunking import chunk_text
+
+SENTENCE = "Linked notes surface ideas that a folder hierarchy would bury. "
+
+
+def check_offsets(text, chunks):
+    assert [chunk.ord for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert chunk.text == chunk.text.strip()
+
+
+def test_short_text_is_one_chunk():
+    text = "  A short note.\n\nWith two paragraphs.  "
+    chunks = chunk_text(text, max_chars=1000)
+    assert [chunk.text for chunk in chunks] == ["A short note.\n\nWith two paragraphs."]
+    check_offsets(text, chunks)
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("") == []
+    assert chunk_text(" \n\n ") == []
+
+
+def test_headings_start_new_chunks():
+    text = "# One\nFirst section.\n\n## Two\nSecond section.\nStill two.\n# Three\nThird."
+    chunks = chunk_text(text, max_chars=1000)
+    assert [chunk.text.splitlines()[0] for chunk in chunks] == ["# One", "## Two", "# Three"]
+    check_offsets(text, chunks)
+
+
+def test_long_paragraphs_split_at_sentences_with_overlap():
+    text = SENTENCE * 40
+    chunks = chunk_text(text, max_chars=300, overlap_chars=80)
+    assert len(chunks) > 1
+    check_offsets(text, chunks)
+    for chunk in chunks:
+        assert len(chunk.text) <= 300 + 80
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # Overlapping, and every chunk adds new text
+        assert chunk.start < previous.end < chunk.end
+        # Cut at sentence ends and word boundaries
+        assert previous.text.endswith(".")
+        assert text[chunk.start - 1].isspace()
+
+
+def test_chunks_cover_the_whole_text():
+    text = "\n\n".join(f"Paragraph {i}. " + SENTENCE * (i % 5 + 1) for i in range(30))
+    chunks = chunk_text(text, max_chars=400, overlap_chars=0)
+    check_offsets(text, chunks)
+    assert chunks[0].start == 0 and chunks[-1].end == len(text.rstrip())
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert text[previous.end:chunk.start].strip() == ""
+
+
+def test_chunk_hash_matches_content_hash():
+    chunk = chunk_text("Some passage.")[0]
+    assert chunk.hash == content_hash("Some passage.")
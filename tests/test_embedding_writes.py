@@ -0,0 +1,134 @@
+import asyncio
+import json
+import re
+
+import numpy as np
+import pytest
+
+from src.core import database
+from src.core.hashing import content_hash
+from src.services import vector_services
+
+# The guards every note embedding write must carry: the note still holds the
+# content that was embedded, and the model is still the serving one
+CONTENT_GUARD = re.compile(r"""encode\(sha256\(convert_to\(n\.content, 'UTF8'\)\), 'hex'\) = v\."contentHash\"""")
+
+
+class FakePrisma:
+    def __init__(self, written=1):
+        self.calls = []
+        self.written = written
+
+    async def execute_raw(self, sql, *params):
+        self.calls.append((sql, params))
+        return self.written
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+
+    def transaction(self):
+        connection = self
+
+        class Transaction:
+            async def __aenter__(self):
+                return connection
+
+            async def __aexit__(self, *exc):
+                return False
+        return Transaction()
+
+    async def execute(self, sql, *params):
+        self.statements.append((sql, params))
+        return "UPDATE 2"
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copied = [dict(zip(columns, record)) for record in records]
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+
+    def acquire(self):
+        connection = self.connection
+
+        class Acquire:
+            async def __aenter__(self):
+                return connection
+
+            async def __aexit__(self, *exc):
+                return False
+        return Acquire()
+
+
+@pytest.fixture
+def batch():
+    texts = ["first note", "second note"]
+    return ["a", "b"], np.ones((2, 4), dtype=np.float32), [content_hash(text) for text in texts]
+
+
+def test_batched_write_skips_notes_edited_since_they_were_read(monkeypatch, batch):
+    fake = FakePrisma(written=1)
+    monkeypatch.setattr(database, "pg_pool", None)
+    monkeypatch.setattr(vector_services, "prisma", fake)
+
+    note_ids, embeddings, hashes = batch
+    written = asyncio.run(vector_services.update_note_embeddings(note_ids, embeddings, hashes, "model"))
+
+    sql, (rows, model_name) = fake.calls[0]
+    assert CONTENT_GUARD.search(sql)
+    assert [row["contentHash"] for row in json.loads(rows)] == hashes
+    assert model_name == "model"
+    # One note was edited meanwhile: only the other counts as written
+    assert written == 1
+
+
+def test_batched_write_through_the_pool_checks_content_too(monkeypatch, batch):
+    pool = FakePool()
+    monkeypatch.setattr(database, "pg_pool", pool)
+
+    note_ids, embeddings, hashes = batch
+    written = asyncio.run(vector_services.update_note_embeddings(note_ids, embeddings, hashes, "model"))
+
+    update = pool.connection.statements[-1][0]
+    assert CONTENT_GUARD.search(update)
+    assert [row["contentHash"] for row in pool.connection.copied] == hashes
+    assert written == 2
+
+
+def test_empty_batch_writes_nothing(monkeypatch):
+    fake = FakePrisma()
+    monkeypatch.setattr(vector_services, "prisma", fake)
+    assert asyncio.run(vector_services.update_note_embeddings([], np.empty((0, 4)), [], "model")) == 0
+    assert fake.calls == []
+
+
+def test_lost_active_model_key_falls_back_to_the_column_comment(monkeypatch):
+    from src.services import redis_service
+
+    class FakeRedis:
+        def __init__(self):
+            self.data = {}
+
+        async def get(self, key):
+            return self.data.get(key)
+
+        async def set(self, key, value, nx=False):
+            if not (nx and key in self.data):
+                self.data[key] = value.encode()
+
+    class ColumnComment:
+        async def query_raw(self, sql, *params):
+            assert vector_services.SQL_COLUMN_MODEL in sql
+            return [{"model": "promoted-model"}]
+
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_service, "redis", fake)
+    monkeypatch.setattr(vector_services, "prisma", ColumnComment())
+    monkeypatch.setattr(vector_services, "_active_model", ("configured-model", float("-inf")))
+
+    assert asyncio.run(vector_services.active_model()) == "promoted-model"
+    assert fake.data[vector_services.ACTIVE_MODEL_KEY] == b"promoted-model"
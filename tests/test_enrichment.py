@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.config import settings
+from src.services.gemini_service import normalize_tags, pack_notes
+
+
+def test_normalize_tags_from_a_comma_separated_reply():
+    assert normalize_tags(" Machine Learning, zettelkasten ,, Note Taking ") == [
+        "machine_learning", "zettelkasten", "note_taking",
+    ]
+
+
+def test_normalize_tags_from_a_list_caps_at_five():
+    assert normalize_tags(["A", "b", "", "  ", "c", "d", "e", "f"]) == ["a", "b", "c", "d", "e"]
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "bulk_enrichment_max_note_chars", 100)
+    monkeypatch.setattr(settings, "bulk_enrichment_max_batch_chars", 250)
+
+
+def notes(*sizes):
+    return [SimpleNamespace(id=str(i), content="x" * size) for i, size in enumerate(sizes)]
+
+
+def test_pack_notes_fills_batches_up_to_the_limit(limits):
+    batches = pack_notes(notes(80, 80, 80, 80))
+    assert [[note.id for note in batch] for batch in batches] == [["0", "1", "2"], ["3"]]
+
+
+def test_pack_notes_sends_long_notes_alone(limits):
+    batches = pack_notes(notes(50, 500, 50))
+    assert [[note.id for note in batch] for batch in batches] == [["1"], ["0", "2"]]
+
+
+def test_pack_notes_keeps_every_note_once(limits):
+    given = notes(*range(1, 120, 7))
+    packed = [note for batch in pack_notes(given) for note in batch]
+    assert sorted(note.id for note in packed) == sorted(note.id for note in given)
+    assert pack_notes([]) == []
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from src.services.graph_analytics import compute, label_propagation, pagerank
+
+
+def graph(size, edges):
+    """Symmetric adjacency matrix for undirected (a, b) edges"""
+    rows = [a for a, b in edges] + [b for a, b in edges]
+    cols = [b for a, b in edges] + [a for a, b in edges]
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(size, size))
+
+
+def clique(nodes):
+    return [(a, b) for i, a in enumerate(nodes) for b in nodes[i + 1:]]
+
+
+def test_pagerank_of_a_ring_is_uniform():
+    scores, _ = pagerank(graph(5, [(i, (i + 1) % 5) for i in range(5)]))
+    assert scores == pytest.approx(np.full(5, 0.2))
+
+
+def test_pagerank_favours_the_hub_and_sums_to_one():
+    # A star, plus an isolated note whose rank is spread over the graph
+    scores, iterations = pagerank(graph(6, [(0, 1), (0, 2), (0, 3), (0, 4)]))
+    assert scores.sum() == pytest.approx(1.0)
+    assert scores.argmax() == 0
+    assert scores[1] == pytest.approx(scores[4])
+    assert scores[5] < scores[1]
+    assert iterations >= 1
+
+
+def test_pagerank_warm_start_converges_to_the_same_scores():
+    adjacency = graph(4, [(0, 1), (1, 2), (2, 3), (3, 1)])
+    cold, cold_iterations = pagerank(adjacency)
+    warm, warm_iterations = pagerank(adjacency, start=cold)
+    assert warm == pytest.approx(cold, abs=1e-6)
+    assert warm_iterations <= cold_iterations
+
+
+def test_pagerank_of_an_empty_graph():
+    scores, iterations = pagerank(graph(0, []))
+    assert len(scores) == 0 and iterations == 0
+
+
+def test_label_propagation_finds_two_cliques():
+    edges = clique([0, 1, 2, 3, 4]) + clique([5, 6, 7, 8, 9]) + [(4, 5)]
+    labels, _ = label_propagation(graph(10, edges), start=np.arange(10) * 10)
+    assert len(set(labels[:5])) == 1
+    assert len(set(labels[5:])) == 1
+    assert labels[0] != labels[9]
+    # Labels are copied from the starting ones, never invented
+    assert set(labels) <= set(np.arange(10) * 10)
+
+
+def test_label_propagation_leaves_isolated_notes_alone():
+    labels, iterations = label_propagation(graph(3, []), start=np.array([7, 8, 9]))
+    assert list(labels) == [7, 8, 9] and iterations == 0
+
+
+def test_compute_components_and_fresh_communities():
+    adjacency = graph(6, [(0, 1), (1, 2), (3, 4)])
+    previous = {
+        "pagerank": np.zeros(6),
+        "degree": np.full(6, -1),
+        "component": np.full(6, -1),
+        "community": np.array([3, 3, 3, -1, -1, -1]),
+    }
+    result = compute(adjacency, previous)
+    assert result["component_count"] == 3
+    assert result["components"][0] == result["components"][2] != result["components"][3]
+    assert list(result["degrees"]) == [1, 2, 1, 1, 1, 0]
+    assert list(result["fresh"]) == [False, False, False, True, True, True]
+    assert set(result["communities"][:3]) == {3}
+    assert result["communities"][3] == result["communities"][4] != 3
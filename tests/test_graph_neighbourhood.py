@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from src.services import graph_service
+
+
+class FakeGraph:
+    """Answers get_neighbourhood's queries from an in-memory link list"""
+
+    def __init__(self, notes, links):
+        self.notes = notes
+        self.links = links
+        self.hop_rows = []
+
+    def neighbours(self, note_id):
+        return [b for a, b in self.links if a == note_id] + [a for a, b in self.links if b == note_id]
+
+    async def query_raw(self, sql, *params):
+        if sql is graph_service.SQL_NEXT_HOP:
+            frontier, fan_out, visited, limit = json.loads(params[0]), params[1], json.loads(params[2]), params[3]
+            reached = {
+                neighbour
+                for note_id in frontier
+                for neighbour in self.neighbours(note_id)[:fan_out]
+                if neighbour not in visited
+            }
+            self.hop_rows.append(len(reached))
+            return [{"id": note_id} for note_id in sorted(reached)[:limit]]
+        if "FROM \"Note\" n" in sql:
+            ids = json.loads(params[0])
+            return [{"id": note_id, "label": note_id} for note_id in self.notes if note_id in ids]
+        return [
+            {"source": a, "target": b}
+            for a, b in self.links
+            if a in json.loads(params[0]) and b in json.loads(params[0])
+        ]
+
+
+def neighbourhood(monkeypatch, notes, links, **kwargs):
+    fake = FakeGraph(notes, links)
+    monkeypatch.setattr(graph_service, "prisma", fake)
+    return asyncio.run(graph_service.get_neighbourhood("a", **kwargs)), fake
+
+
+def test_each_note_is_reached_once_at_its_shortest_distance(monkeypatch):
+    # A clique: every note links to every other, so paths revisit notes
+    notes = ["a", "b", "c", "d", "e"]
+    links = [(x, y) for i, x in enumerate(notes) for y in notes[i + 1:]]
+    graph, fake = neighbourhood(monkeypatch, notes, links, depth=4)
+    assert [(node["id"], node["depth"]) for node in graph["nodes"]] == [
+        ("a", 0), ("b", 1), ("c", 1), ("d", 1), ("e", 1)
+    ]
+    # Nothing is left to visit after the first hop
+    assert fake.hop_rows == [4, 0]
+
+
+def test_walk_stops_at_max_nodes(monkeypatch):
+    notes = ["a", "b", "c", "d", "e", "f"]
+    links = [("a", "b"), ("a", "c"), ("b", "d"), ("c", "e"), ("e", "f")]
+    graph, fake = neighbourhood(monkeypatch, notes, links, depth=3, max_nodes=4)
+    assert [node["id"] for node in graph["nodes"]] == ["a", "b", "c", "d"]
+    assert len(fake.hop_rows) == 2
+
+
+def test_missing_note(monkeypatch):
+    graph, _ = neighbourhood(monkeypatch, ["b"], [])
+    assert graph is None
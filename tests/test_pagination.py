@@ -0,0 +1,22 @@
+from datetime import datetime
+
+import pytest
+
+from src.services.note_services import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    row = {"id": "8c1d2a4e-1f1b-4c8e-9a55-0d3f3e1c2b7a", "updatedAt": datetime(2025, 6, 1, 12, 30, 0, 250000)}
+    assert decode_cursor(encode_cursor(row)) == ("2025-06-01 12:30:00.250000", row["id"])
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor({"id": "?" * 40, "updatedAt": "2025-06-01T12:30:00"})
+    assert not set(cursor) & set("+/")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "bm90IGpzb24=", "WzFd"])
+def test_malformed_cursor_is_rejected(cursor):
+    # "bm90IGpzb24=" is "not json", "WzFd" is "[1]"
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
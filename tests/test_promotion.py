@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from src.core.config import settings
+from src.services import embedding_backfill
+
+HNSW = "Note_embeddingNext_hnsw_idx"
+IVFFLAT = "Note_embeddingNext_ivfflat_idx"
+
+
+class FakePrisma:
+    """Answers the shadow-index lookup from a script of states"""
+
+    def __init__(self, *states):
+        self.states = list(states)
+        self.statements = []
+
+    async def query_raw(self, sql, *params):
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+    async def execute_raw(self, sql, *params):
+        self.statements.append(" ".join(sql.split()))
+        return 0
+
+
+def index(name, valid=True, building=False, opclass="vector_cosine_ops"):
+    return {"name": name, "valid": valid, "building": building,
+            "definition": f'CREATE INDEX "{name}" ON "Note" USING hnsw ("embeddingNext" {opclass})'}
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+    monkeypatch.setattr(settings, "vector_metric", "cosine")
+    monkeypatch.setattr(embedding_backfill, "INDEX_BUILD_POLL", 0)
+
+    def install(*states):
+        prisma = FakePrisma(*states)
+        monkeypatch.setattr(embedding_backfill, "prisma", prisma)
+        return prisma
+    return install
+
+
+def build(prisma):
+    assert asyncio.run(embedding_backfill._build_index("model", {})) == "swap"
+    return prisma.statements
+
+
+def test_builds_the_index_when_there_is_none(fake):
+    statements = build(fake([]))
+    assert len(statements) == 1
+    assert statements[0].startswith(f'CREATE INDEX CONCURRENTLY "{HNSW}"')
+
+
+def test_keeps_a_valid_index_from_an_interrupted_promotion(fake):
+    assert build(fake([index(HNSW)])) == []
+
+
+def test_waits_for_a_build_still_running_instead_of_dropping_it(fake):
+    statements = build(fake([index(HNSW, valid=False, building=True)], [index(HNSW)]))
+    assert statements == []
+
+
+def test_rebuilds_invalid_or_mismatched_indexes(fake):
+    statements = build(fake([index(HNSW, valid=False), index(IVFFLAT)]))
+    assert statements[:2] == [
+        f'DROP INDEX CONCURRENTLY IF EXISTS "{HNSW}"',
+        f'DROP INDEX CONCURRENTLY IF EXISTS "{IVFFLAT}"',
+    ]
+    assert statements[2].startswith(f'CREATE INDEX CONCURRENTLY "{HNSW}"')
+
+    statements = build(fake([index(HNSW, opclass="vector_l2_ops")]))
+    assert statements[0] == f'DROP INDEX CONCURRENTLY IF EXISTS "{HNSW}"'
+    assert statements[1].startswith("CREATE INDEX CONCURRENTLY")
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from src.services.rate_limiter import RateLimited, RateLimiter
+
+
+class FakeRedis:
+    """The few commands RateLimiter uses; eval answers with queued waits in ms"""
+
+    def __init__(self, waits=()):
+        self.waits = list(waits)
+        self.values = {}
+
+    async def eval(self, *args):
+        return str(self.waits.pop(0)) if self.waits else "0"
+
+    async def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def set(self, key, value, px=None):
+        self.values[key] = value
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+
+def limiter(redis, **options) -> RateLimiter:
+    limiter = RateLimiter("test", requests_per_minute=60, tokens_per_minute=1000, **options)
+
+    async def _redis():
+        return redis
+    limiter._redis = _redis
+    return limiter
+
+
+def test_acquire_waits_out_short_refills():
+    redis = FakeRedis(waits=[20, 30])
+    asyncio.run(limiter(redis, max_wait=1.0).acquire(10))
+    assert redis.waits == []
+
+
+def test_acquire_defers_long_waits():
+    with pytest.raises(RateLimited) as raised:
+        asyncio.run(limiter(FakeRedis(waits=[5000]), max_wait=1.0).acquire())
+    assert raised.value.retry_after == pytest.approx(5.0)
+
+
+def test_acquire_fails_open_without_redis():
+    class Down:
+        async def eval(self, *args):
+            raise ConnectionError("down")
+    asyncio.run(limiter(Down()).acquire())
+
+
+def test_cooldown_doubles_until_a_call_succeeds():
+    subject = limiter(FakeRedis(), backoff_base=2.0, backoff_max=10.0)
+
+    async def run():
+        cooldowns = [await subject.throttled() for _ in range(4)]
+        await subject.succeeded()
+        return cooldowns, await subject.throttled()
+
+    cooldowns, after_success = asyncio.run(run())
+    assert cooldowns == [2.0, 4.0, 8.0, 10.0]
+    assert after_success == 2.0
+
+
+def test_estimate_tokens():
+    assert RateLimiter.estimate_tokens(4000, output_tokens=100) == 1100
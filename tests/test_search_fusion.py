@@ -0,0 +1,75 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.services.note_services import RRF_K, reciprocal_rank_fusion
+
+
+def rows(*ids, distance=None):
+    return [{"id": note_id, "distance": distance} for note_id in ids]
+
+
+def test_single_list_keeps_its_order():
+    ranked, scores = reciprocal_rank_fusion(rows("a", "b", "c"))
+    assert [row["id"] for row in ranked] == ["a", "b", "c"]
+    assert scores["a"] == pytest.approx(1 / (RRF_K + 1))
+    assert scores["c"] == pytest.approx(1 / (RRF_K + 3))
+
+
+def test_notes_found_by_both_searches_rank_first():
+    ranked, scores = reciprocal_rank_fusion(rows("a", "b"), rows("b", "c"))
+    assert [row["id"] for row in ranked] == ["b", "a", "c"]
+    assert scores["b"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+
+
+def test_k_flattens_the_rank_curve():
+    _, sharp = reciprocal_rank_fusion(rows("a", "b"), k=1)
+    _, flat = reciprocal_rank_fusion(rows("a", "b"), k=1000)
+    assert sharp["a"] / sharp["b"] > flat["a"] / flat["b"]
+
+
+def test_vector_row_is_kept_for_its_distance():
+    keyword = [{"id": "a", "rank": 0.5}]
+    semantic = rows("a", distance=0.25)
+    ranked, _ = reciprocal_rank_fusion(keyword, semantic)
+    assert ranked[0]["distance"] == 0.25
+
+
+def test_empty_inputs():
+    assert reciprocal_rank_fusion() == ([], {})
+    assert reciprocal_rank_fusion([], []) == ([], {})
+
+
+def test_every_search_selects_each_response_column(monkeypatch):
+    from src.schemas.note import NoteResponse
+    from src.services import note_services, vector_services
+
+    queries = []
+
+    async def capture(sql, *args, **kwargs):
+        queries.append(sql)
+        return [{"id": "n2"}]
+
+    async def embed(text, model_name=None):
+        return np.ones(4)
+
+    async def active_model():
+        return "model"
+
+    monkeypatch.setattr(vector_services, "query_vectors", capture)
+    monkeypatch.setattr(vector_services, "create_embedding", embed)
+    monkeypatch.setattr(vector_services, "active_model", active_model)
+    monkeypatch.setattr(note_services.prisma, "query_raw", capture, raising=False)
+
+    async def run():
+        await vector_services.semantic_search("query")
+        await vector_services.semantic_search_by_note("n1")
+        await vector_services.chunk_search("query")
+        await note_services.keyword_search("query")
+
+    asyncio.run(run())
+    assert len(queries) == 4
+    for sql in queries:
+        for field in NoteResponse.__fields__:
+            assert f'n."{field}"' in sql or f"n.{field}" in sql, field
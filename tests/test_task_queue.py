@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+
+from src.core.config import settings
+from src.services import redis_service
+from src.services.redis_service import retry_delay
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    monkeypatch.setattr(settings, "task_retry_base_delay", 2.0)
+    monkeypatch.setattr(settings, "task_retry_max_delay", 60.0)
+
+
+@pytest.mark.parametrize("attempts, ceiling", [(0, 2.0), (1, 4.0), (3, 16.0), (5, 60.0), (20, 60.0)])
+def test_retry_delay_is_jittered_exponential_backoff(backoff, attempts, ceiling):
+    delays = [retry_delay(attempts) for _ in range(200)]
+    assert all(ceiling / 2 <= delay <= ceiling for delay in delays)
+    assert len(set(delays)) > 1
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, command):
+        return lambda *args, **kwargs: self.redis.commands.append((command, args))
+
+    async def execute(self):
+        return []
+
+
+class FakeRedis:
+    def __init__(self):
+        self.commands = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def delete(self, *keys):
+        self.commands.append(("delete", keys))
+
+    async def xclaim(self, *args, **kwargs):
+        self.commands.append(("xclaim", kwargs["message_ids"]))
+        return kwargs["message_ids"]
+
+
+def test_running_tasks_heartbeat_until_acknowledged(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_service, "redis", fake)
+    monkeypatch.setattr(settings, "task_visibility_timeout", 0.03)
+
+    async def slow_handler(task_obj):
+        await asyncio.sleep(0.1)
+    monkeypatch.setattr(redis_service, "handle_task", slow_handler)
+
+    async def run():
+        slots = asyncio.Semaphore(1)
+        await slots.acquire()
+        task = {"id": "n1", "type": "process_note", "payload": {"note_id": "n1"}, "attempts": 0}
+        await redis_service._run_task("1-0", {b"task": json.dumps(task).encode()}, slots)
+        # No heartbeat outlives the task
+        await asyncio.sleep(0.05)
+        return slots.locked()
+
+    assert asyncio.run(run()) is False
+    commands = [command for command, _ in fake.commands]
+    assert commands.count("xclaim") >= 2
+    assert commands.index("xack") > max(i for i, command in enumerate(commands) if command == "xclaim")
+
+
+def test_stopping_does_not_wait_for_a_free_slot(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_service, "redis", fake)
+    reads = []
+
+    async def noop(*args):
+        pass
+
+    async def read_tasks(count, block_ms=1000):
+        reads.append(count)
+        task = {"id": f"n{len(reads)}", "type": "process_note", "payload": {}, "attempts": 0}
+        return [(f"{len(reads)}-0", {b"task": json.dumps(task).encode()})]
+
+    async def stuck_handler(task_obj):
+        await asyncio.Event().wait()
+
+    async def maintain_queue(stop_event, batch_size):
+        await stop_event.wait()
+
+    monkeypatch.setattr(redis_service, "ensure_consumer_group", noop)
+    monkeypatch.setattr(redis_service, "_read_tasks", read_tasks)
+    monkeypatch.setattr(redis_service, "_maintain_queue", maintain_queue)
+    monkeypatch.setattr(redis_service, "handle_task", stuck_handler)
+    monkeypatch.setattr(redis_service.audit_service, "flush", noop)
+
+    async def run():
+        stop_event = asyncio.Event()
+        worker = asyncio.create_task(
+            redis_service.process_tasks(concurrency=1, batch_size=1, stop_event=stop_event, drain_timeout=0.05)
+        )
+        # The only slot is now held by a task that never finishes
+        await asyncio.sleep(0.05)
+        stop_event.set()
+        await asyncio.wait_for(worker, timeout=1.0)
+
+    asyncio.run(run())
+    assert reads == [1]
@@ -1,24 +1,97 @@
 #!/usr/bin/env python3
 """
 Background worker to process Redis tasks
-Run this separately: python worker.py
+Run this separately: python worker.py [--processes N] [--concurrency C]
 """
 
+import argparse
 import asyncio
 import logging
-from src.services.redis_service import process_tasks
+import multiprocessing
+import os
+import signal
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def main():
-    logger.info("Starting background worker...")
+async def main(concurrency: int = None, batch_size: int = None, index: int = 0):
+    # Imported here so each spawned child process imports the app itself
+    from src.core import database, metrics, tracing
+    from src.core.config import settings
+    from src.services import redis_service, vector_services
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    logger.info(f"Starting background worker (pid {os.getpid()})...")
+    tracing.setup("pkos-worker")
+    if settings.metrics_worker_port:
+        metrics.start_exporter(settings.metrics_worker_port + index)
+    await database.connect_db()
+    # Tasks that need the model wait for it; the others start right away
+    warm_up = asyncio.create_task(vector_services.warm_up()) if settings.embedding_warmup else None
     try:
-        await process_tasks()
-    except KeyboardInterrupt:
-        logger.info("Worker stopped by user")
+        await redis_service.process_tasks(
+            concurrency=concurrency,
+            batch_size=batch_size,
+            stop_event=stop_event,
+        )
     except Exception as e:
         logger.error(f"Worker error: {e}")
+    finally:
+        if warm_up is not None:
+            await warm_up
+        await database.disconnect_db()
+        vector_services.shutdown()
+        logger.info(f"Worker {os.getpid()} stopped")
+
+def run(concurrency: int = None, batch_size: int = None, index: int = 0):
+    asyncio.run(main(concurrency, batch_size, index))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Process tasks from the Redis queue")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Worker processes to run (0 = one per CPU core)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Tasks run concurrently per process (default WORKER_CONCURRENCY)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Tasks popped per Redis round trip (default WORKER_BATCH_SIZE)")
+    parser.add_argument("--preload", action="store_true",
+                        help="Load the embedding model once and fork the processes from it, "
+                             "sharing its weights copy-on-write")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    processes = args.processes or os.cpu_count() or 1
+
+    if args.preload:
+        # Only the weights are loaded here: no event loop, connections or
+        # inference threads exist yet, so forking afterwards is safe
+        from src.services import vector_services
+        vector_services.preload()
+
+    if processes == 1:
+        run(args.concurrency, args.batch_size)
+    else:
+        # Children handle SIGINT/SIGTERM themselves and drain before exiting.
+        # Forked children inherit the preloaded model; spawned ones load their own
+        context = multiprocessing.get_context("fork" if args.preload else "spawn")
+        children = [
+            context.Process(target=run, args=(args.concurrency, args.batch_size, i), name=f"worker-{i}")
+            for i in range(processes)
+        ]
+        for child in children:
+            child.start()
+
+        def forward(signum, frame):
+            for child in children:
+                if child.is_alive():
+                    os.kill(child.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGINT, forward)
+        signal.signal(signal.SIGTERM, forward)
+        for child in children:
+            child.join()